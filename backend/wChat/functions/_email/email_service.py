@@ -4,6 +4,7 @@ import boto3
 import logging
 from botocore.exceptions import ClientError
 from functions.auth_layer.auth import authenticate
+from functions.notifications.python.notification_service import NotificationService
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
@@ -28,9 +29,9 @@ def get_db_connection():
 
 class EmailTemplate:
     @staticmethod
-    def new_user(user_name, temp_password):
+    def new_user(user_name, set_password_link):
         logger.info("new_user template function called")  # Log A
-        logger.info(f"Parameters received - user_name: {user_name}, temp_password: {temp_password}")  # Log B
+        logger.info(f"Parameters received - user_name: {user_name}")  # Log B
 
         email_content = {
             'subject': 'Welcome to WorkChat - Your Account Details',
@@ -39,10 +40,11 @@ class EmailTemplate:
 
             Welcome to WorkChat! Your account has been created successfully.
 
-            Please log into WorkChat using the following temporary password:
-            {temp_password}
+            Please choose your password using the link below:
+            {set_password_link}
 
-            You can log in at: {os.environ.get('APP_URL', '[WorkChat URL]')}
+            This link will expire in 72 hours. You can log in at:
+            {os.environ.get('APP_URL', '[WorkChat URL]')}
 
             If you did not request this account, please contact your administrator 
             immediately at {os.environ.get('SUPPORT_EMAIL', 'support@workchat.com')}.
@@ -61,7 +63,7 @@ class EmailTemplate:
     def validate_template_data(template_type, template_data):
         """Validate that all required fields for a template are present."""
         template_requirements = {
-            'new_user': ['user_name', 'temp_password'],
+            'new_user': ['user_name', 'set_password_link'],
             'shift_assignment': ['user_name', 'shift_date', 'start_time', 'end_time', 'department'],
             'shift_exchange_request': ['requester_name', 'shift_date', 'start_time', 'end_time']
         }
@@ -203,13 +205,9 @@ def send_email(event, cur):
             
             # Store notification in database
             logger.info("Storing notification in database")  # Log 16
-            cur.execute("""
-                INSERT INTO notification (content, time_stamp, user_id)
-                VALUES (%s, CURRENT_TIMESTAMP, %s)
-                RETURNING id
-            """, (f"Email sent: {email_content['subject']}", email_data['recipient_id']))
-            
-            notification_id = cur.fetchone()['id']
+            notification_id = NotificationService(cur).create_notification(
+                email_data['recipient_id'], f"Email sent: {email_content['subject']}"
+            )
             cur.connection.commit()
             
             logger.info(f"Email sent successfully to user ID: {email_data['recipient_id']}")
@@ -4,7 +4,7 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
 from datetime import datetime, date
-from functions.notifications.python.notification_service import NotificationService
+from functions.notifications.python import outbox
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
@@ -144,10 +144,8 @@ def create_time_off_request(event, cur):
         ))
         
         new_request_id = cur.fetchone()['id']
-        cur.connection.commit()
         
-        # Send notification to managers
-        notification_service = NotificationService()
+        # Queue notification to managers, sent once the request is committed
         start_date = datetime.strptime(request_data['start_date'], '%Y-%m-%d').strftime('%B %d, %Y')
         end_date = datetime.strptime(request_data['end_date'], '%Y-%m-%d').strftime('%B %d, %Y')
         
@@ -156,7 +154,8 @@ def create_time_off_request(event, cur):
         else:
             notification_content = f"New time off request from {user['full_name']} ({start_date} to {end_date})"
         
-        notification_service.notify_managers(notification_content)
+        outbox.enqueue(cur, outbox.NOTIFY_MANAGERS, {'content': notification_content})
+        cur.connection.commit()
         
         return response(201, {'id': new_request_id})
         
@@ -211,11 +210,9 @@ def update_time_off_request(event, cur):
         """, tuple(update_values))
         
         updated_request = cur.fetchone()
-        cur.connection.commit()
         
         if updated_request and 'status' in request_data:
-            # Send notification to the requesting user
-            notification_service = NotificationService()
+            # Queue notification to the requesting user
             start_date = request['start_date'].strftime('%B %d, %Y')
             end_date = request['end_date'].strftime('%B %d, %Y')
             
@@ -224,10 +221,15 @@ def update_time_off_request(event, cur):
             else:
                 notification_content = f"Your time off request for {start_date} to {end_date} has been {request_data['status']}"
             
-            notification_service.create_notification(request['user_id'], notification_content)
+            outbox.enqueue(cur, outbox.NOTIFICATION, {
+                'user_id': request['user_id'],
+                'content': notification_content
+            })
+            cur.connection.commit()
             
             return response(200, {'message': 'Time off request updated successfully'})
         elif updated_request:
+            cur.connection.commit()
             return response(200, {'message': 'Time off request updated successfully'})
         else:
             return response(404, {'error': 'Time off request not found'})
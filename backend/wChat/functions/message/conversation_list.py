@@ -68,49 +68,47 @@ def lambda_handler(event, context):
 def list_conversations(event, cur):
     user_id = get_user_id_from_token(event)
     
+    # Latest message per conversation, plus how many messages from the other user
+    # are newer than the reader's last-read watermark for that conversation and
+    # whether the other user is online
     cur.execute("""
-        SELECT DISTINCT
-            CASE 
-                WHEN m.sent_by_user_id = %s THEN m.received_by_user_id
-                ELSE m.sent_by_user_id
-            END AS other_user_id,
+        WITH latest AS (
+            SELECT DISTINCT ON (other_user_id) other_user_id, content, time_stamp
+            FROM (
+                SELECT 
+                    CASE 
+                        WHEN sent_by_user_id = %(user_id)s THEN received_by_user_id
+                        ELSE sent_by_user_id
+                    END AS other_user_id,
+                    content,
+                    time_stamp
+                FROM message
+                WHERE sent_by_user_id = %(user_id)s OR received_by_user_id = %(user_id)s
+            ) m
+            ORDER BY other_user_id, time_stamp DESC
+        ), unread AS (
+            SELECT m.sent_by_user_id AS other_user_id, COUNT(*) AS unread_count
+            FROM message m
+            LEFT JOIN conversation_read cr
+                ON cr.reader_id = %(user_id)s AND cr.other_user_id = m.sent_by_user_id
+            WHERE m.received_by_user_id = %(user_id)s
+            AND m.id > COALESCE(cr.last_read_message_id, 0)
+            GROUP BY m.sent_by_user_id
+        )
+        SELECT
+            l.other_user_id,
             u.first_name,
             u.last_name,
-            m2.content AS last_message,
-            m2.time_stamp AS last_message_time
-        FROM message m
-        JOIN "user" u ON 
-            CASE 
-                WHEN m.sent_by_user_id = %s THEN u.id = m.received_by_user_id
-                ELSE u.id = m.sent_by_user_id
-            END
-        JOIN (
-            SELECT 
-                CASE 
-                    WHEN sent_by_user_id = %s THEN received_by_user_id
-                    ELSE sent_by_user_id
-                END AS other_user_id,
-                content,
-                time_stamp,
-                ROW_NUMBER() OVER (
-                    PARTITION BY 
-                        CASE 
-                            WHEN sent_by_user_id = %s THEN received_by_user_id
-                            ELSE sent_by_user_id
-                        END
-                    ORDER BY time_stamp DESC
-                ) AS rn
-            FROM message
-            WHERE sent_by_user_id = %s OR received_by_user_id = %s
-        ) m2 ON m2.other_user_id = 
-            CASE 
-                WHEN m.sent_by_user_id = %s THEN m.received_by_user_id
-                ELSE m.sent_by_user_id
-            END
-        WHERE (m.sent_by_user_id = %s OR m.received_by_user_id = %s)
-        AND m2.rn = 1
-        ORDER BY m2.time_stamp DESC
-    """, (user_id,) * 9)
+            l.content AS last_message,
+            l.time_stamp AS last_message_time,
+            COALESCE(un.unread_count, 0) AS unread_count,
+            o.user_id IS NOT NULL AS is_online
+        FROM latest l
+        JOIN "user" u ON u.id = l.other_user_id
+        LEFT JOIN unread un ON un.other_user_id = l.other_user_id
+        LEFT JOIN online_user o ON o.user_id = l.other_user_id
+        ORDER BY l.time_stamp DESC
+    """, {'user_id': user_id})
     
     conversations = cur.fetchall()
     return response(200, conversations)
@@ -1,10 +1,10 @@
 import json
 import os
-import boto3
 import psycopg2
 import jwt
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
+from functions.notifications.python import outbox
 from datetime import datetime
 
 # Database connection parameters
@@ -13,6 +13,21 @@ DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 JWT_SECRET = os.environ['JWT_SECRET']
 
+# Both directions of one conversation with both users' names, oldest first
+CONVERSATION_MESSAGES = """
+    SELECT m.*, 
+        u_sender.first_name AS sender_first_name, 
+        u_sender.last_name AS sender_last_name,
+        u_receiver.first_name AS receiver_first_name, 
+        u_receiver.last_name AS receiver_last_name
+    FROM message m
+    JOIN "user" u_sender ON m.sent_by_user_id = u_sender.id
+    JOIN "user" u_receiver ON m.received_by_user_id = u_receiver.id
+    WHERE (m.sent_by_user_id = %s AND m.received_by_user_id = %s)
+    OR (m.sent_by_user_id = %s AND m.received_by_user_id = %s)
+    ORDER BY m.time_stamp ASC
+"""
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -48,9 +63,6 @@ def datetime_handler(obj):
         return obj.isoformat()
     raise TypeError(f'Object of type {type(obj)} is not JSON serializable')
 
-def get_websocket_endpoint():
-    return f"https://{os.environ.get('WEBSOCKET_API_DOMAIN')}/{os.environ.get('WEBSOCKET_API_STAGE')}"
-
 def lambda_handler(event, context):
     if event['httpMethod'] == 'OPTIONS':
         return response(200, 'OK')
@@ -78,19 +90,7 @@ def get_messages(event, cur):
     user_id = get_user_id_from_token(event)
     other_user_id = event['pathParameters']['id']
     
-    cur.execute("""
-        SELECT m.*, 
-            u_sender.first_name AS sender_first_name, 
-            u_sender.last_name AS sender_last_name,
-            u_receiver.first_name AS receiver_first_name, 
-            u_receiver.last_name AS receiver_last_name
-        FROM message m
-        JOIN "user" u_sender ON m.sent_by_user_id = u_sender.id
-        JOIN "user" u_receiver ON m.received_by_user_id = u_receiver.id
-        WHERE (m.sent_by_user_id = %s AND m.received_by_user_id = %s)
-        OR (m.sent_by_user_id = %s AND m.received_by_user_id = %s)
-        ORDER BY m.time_stamp ASC
-    """, (user_id, other_user_id, other_user_id, user_id))
+    cur.execute(CONVERSATION_MESSAGES, (user_id, other_user_id, other_user_id, user_id))
     
     messages = cur.fetchall()
     return response(200, messages)
@@ -104,53 +104,81 @@ def send_message(event, cur):
     if not all(field in message_data for field in required_fields):
         return response(400, {'error': 'Missing required fields'})
     
+    # Optional idempotency key; a retry with the same key returns the original message
+    client_key = message_data.get('client_key')
+    if client_key is not None and (not isinstance(client_key, str) or not 0 < len(client_key) <= 64):
+        return response(400, {'error': 'client_key must be a string of at most 64 characters'})
+    
     try:
-        # Insert the new message
+        # Insert the new message, or find the one already sent with this key, with the sender's name
         cur.execute("""
-            INSERT INTO message (content, time_stamp, sent_by_user_id, received_by_user_id)
-            VALUES (%s, CURRENT_TIMESTAMP, %s, %s)
-            RETURNING id, time_stamp
-        """, (message_data['content'], user_id, message_data['received_by_user_id']))
-        
+            WITH inserted AS (
+                INSERT INTO message (content, time_stamp, sent_by_user_id, received_by_user_id, client_key)
+                VALUES (%(content)s, CURRENT_TIMESTAMP, %(user_id)s, %(received_by_user_id)s, %(client_key)s)
+                ON CONFLICT (sent_by_user_id, client_key) WHERE client_key IS NOT NULL DO NOTHING
+                RETURNING id, content, time_stamp, received_by_user_id, true AS created
+            )
+            SELECT m.*, u.first_name AS sender_first_name, u.last_name AS sender_last_name
+            FROM (
+                SELECT * FROM inserted
+                UNION ALL
+                SELECT id, content, time_stamp, received_by_user_id, false AS created
+                FROM message
+                WHERE sent_by_user_id = %(user_id)s AND client_key = %(client_key)s
+                AND NOT EXISTS (SELECT 1 FROM inserted)
+            ) m
+            JOIN "user" u ON u.id = %(user_id)s
+        """, {
+            'content': message_data['content'],
+            'user_id': user_id,
+            'received_by_user_id': message_data['received_by_user_id'],
+            'client_key': client_key
+        })
         new_message = cur.fetchone()
         
-        # Get sender details
-        cur.execute("""
-            SELECT first_name, last_name
-            FROM "user"
-            WHERE id = %s
-        """, (user_id,))
-        sender = cur.fetchone()
+        if new_message is None:
+            # The original was committed by a concurrent retry after this statement's
+            # snapshot was taken; it is visible to a new statement
+            cur.execute("""
+                SELECT m.id, m.content, m.time_stamp, m.received_by_user_id, false AS created,
+                       u.first_name AS sender_first_name, u.last_name AS sender_last_name
+                FROM message m
+                JOIN "user" u ON u.id = m.sent_by_user_id
+                WHERE m.sent_by_user_id = %s AND m.client_key = %s
+            """, (user_id, client_key))
+            new_message = cur.fetchone()
         
-        # Prepare WebSocket message payload
-        websocket_message = {
-            'type': 'new_message',
-            'message': {
-                'id': new_message['id'],
-                'content': message_data['content'],
-                'time_stamp': new_message['time_stamp'].isoformat(),
-                'sent_by_user_id': user_id,
-                'sender_first_name': sender['first_name'],
-                'sender_last_name': sender['last_name'],
-                'received_by_user_id': message_data['received_by_user_id']
-            }
+        if not new_message['created'] and (
+                new_message['content'] != message_data['content']
+                or int(new_message['received_by_user_id']) != int(message_data['received_by_user_id'])):
+            cur.connection.rollback()
+            return response(409, {'error': 'client_key was already used for a different message'})
+        
+        message = {
+            'id': new_message['id'],
+            'content': new_message['content'],
+            'time_stamp': new_message['time_stamp'].isoformat(),
+            'sent_by_user_id': user_id,
+            'sender_first_name': new_message['sender_first_name'],
+            'sender_last_name': new_message['sender_last_name'],
+            'received_by_user_id': new_message['received_by_user_id']
         }
         
-        # Send WebSocket message
-        send_websocket_message(message_data['received_by_user_id'], websocket_message)
+        if not new_message['created']:
+            # A retry: no new row and no second push
+            cur.connection.rollback()
+            return response(200, message)
+        
+        # Queue the WebSocket push; it is only sent once the message is committed
+        outbox.enqueue_websocket(cur, new_message['received_by_user_id'], {
+            'type': 'new_message',
+            'message': message
+        })
         
         # Commit the transaction
         cur.connection.commit()
         
-        return response(201, {
-                'id': new_message['id'],
-                'content': message_data['content'],
-                'time_stamp': new_message['time_stamp'].isoformat(),
-                'sent_by_user_id': user_id,
-                'sender_first_name': sender['first_name'],
-                'sender_last_name': sender['last_name'],
-                'received_by_user_id': message_data['received_by_user_id']
-            })
+        return response(201, message)
     
     except Exception as e:
         cur.connection.rollback()
@@ -199,8 +227,8 @@ def update_message(event, cur):
                 }
             }
             
-            # Send WebSocket message
-            send_websocket_message(updated_message['received_by_user_id'], websocket_message)
+            # Queue the WebSocket push
+            outbox.enqueue_websocket(cur, updated_message['received_by_user_id'], websocket_message)
             
             cur.connection.commit()
             return response(200, {'message': 'Message updated successfully'})
@@ -242,8 +270,8 @@ def delete_message(event, cur):
                 }
             }
             
-            # Send WebSocket message
-            send_websocket_message(message['received_by_user_id'], websocket_message)
+            # Queue the WebSocket push
+            outbox.enqueue_websocket(cur, message['received_by_user_id'], websocket_message)
             
             cur.connection.commit()
             return response(200, {'message': 'Message deleted successfully'})
@@ -255,46 +283,6 @@ def delete_message(event, cur):
         print(f"Error in delete_message: {str(e)}")
         return response(500, {'error': 'An error occurred while deleting the message'})
 
-def send_websocket_message(recipient_id, message_data):
-    try:
-        # Get active connections for the recipient
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT connection_id
-                FROM connections
-                WHERE user_id = %s
-            """, (recipient_id,))
-            connections = cur.fetchall()
-
-        # Initialize API Gateway Management API client
-        api_client = boto3.client('apigatewaymanagementapi', 
-                                endpoint_url=get_websocket_endpoint())
-
-        # Send message to all active connections
-        for connection in connections:
-            try:
-                api_client.post_to_connection(
-                    ConnectionId=connection['connection_id'],
-                    Data=json.dumps(message_data).encode('utf-8')
-                )
-            except Exception as e:
-                if 'GoneException' in str(e):
-                    # Remove stale connection
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                            DELETE FROM connections
-                            WHERE connection_id = %s
-                        """, (connection['connection_id'],))
-                        conn.commit()
-                else:
-                    print(f"Error sending message to connection {connection['connection_id']}: {str(e)}")
-    except Exception as e:
-        print(f"Error in send_websocket_message: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
-
 def response(status_code, body):
     return {
         'statusCode': status_code,
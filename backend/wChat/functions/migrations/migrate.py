@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import psycopg2
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Migrations live next to this file as NNNN_description.sql and are applied in order
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'versions')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# Files starting with this marker run outside a transaction, one statement at a time.
+# Required for CREATE INDEX CONCURRENTLY, which Postgres refuses inside a transaction block.
+NO_TRANSACTION_MARKER = '-- migrate:no-transaction'
+CONCURRENT_INDEX_PATTERN = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE)
+
+# Arbitrary key so two deploys can't apply migrations at the same time
+MIGRATION_LOCK_KEY = 720_001
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    event = event or {}
+    target = event.get('target')
+
+    conn = get_db_connection()
+    try:
+        applied = migrate(conn, target=int(target) if target is not None else None)
+        return {'statusCode': 200, 'body': json.dumps({'applied': applied})}
+    except Exception as e:
+        print(f"Migration failed: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
+
+def load_migrations():
+    """Return [(version, name, sql)] for every migration file, ordered by version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+
+    migrations.sort(key=lambda m: m[0])
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError('Duplicate migration version numbers found')
+    return migrations
+
+def split_statements(sql):
+    """Split a migration file into individual statements on end-of-line semicolons"""
+    statements = []
+    for chunk in re.split(r';\s*$', sql, flags=re.MULTILINE):
+        lines = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith('--')]
+        if lines:
+            statements.append(chunk.strip())
+    return statements
+
+def ensure_migrations_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+def get_applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cur.fetchall()}
+
+def drop_invalid_indexes(conn, sql):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, and
+    # IF NOT EXISTS would then silently skip it on the retry. Only the indexes
+    # this migration creates are touched; one being built by someone else right
+    # now is invalid too.
+    index_names = CONCURRENT_INDEX_PATTERN.findall(sql)
+    if not index_names:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT quote_ident(n.nspname) || '.' || quote_ident(c.relname)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE NOT i.indisvalid
+            AND n.nspname = current_schema()
+            AND c.relname = ANY(%s)
+        """, (index_names,))
+        for (index_name,) in cur.fetchall():
+            print(f"Dropping invalid index {index_name}")
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+def apply_migration(conn, version, name, sql):
+    if sql.lstrip().startswith(NO_TRANSACTION_MARKER):
+        conn.autocommit = True
+        try:
+            drop_invalid_indexes(conn, sql)
+            with conn.cursor() as cur:
+                for statement in split_statements(sql):
+                    cur.execute(statement)
+                cur.execute("""
+                    INSERT INTO schema_migrations (version, name)
+                    VALUES (%s, %s)
+                """, (version, name))
+        finally:
+            conn.autocommit = False
+    else:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute("""
+                    INSERT INTO schema_migrations (version, name)
+                    VALUES (%s, %s)
+                """, (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def migrate(conn, target=None):
+    """Apply all pending migrations up to and including target (default: latest)"""
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        ensure_migrations_table(conn)
+        applied_versions = get_applied_versions(conn)
+        conn.autocommit = False
+
+        applied = []
+        for version, name, sql in load_migrations():
+            if version in applied_versions:
+                continue
+            if target is not None and version > target:
+                break
+            print(f"Applying migration {version:04d}_{name}")
+            apply_migration(conn, version, name, sql)
+            applied.append(f"{version:04d}_{name}")
+
+        return applied
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        conn.autocommit = False
+
+if __name__ == '__main__':
+    connection = get_db_connection()
+    try:
+        for migration in migrate(connection):
+            print(f"Applied {migration}")
+    finally:
+        connection.close()
@@ -0,0 +1,101 @@
+-- Baseline schema as used by the handlers. Every statement is IF NOT EXISTS so
+-- this can be recorded against the existing database without touching it.
+
+CREATE TABLE IF NOT EXISTS role (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS department (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS "user" (
+    id SERIAL PRIMARY KEY,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    phone_number VARCHAR(20),
+    hourly_rate NUMERIC(10, 2),
+    role_id INTEGER REFERENCES role(id),
+    is_manager BOOLEAN NOT NULL DEFAULT false,
+    full_time BOOLEAN NOT NULL DEFAULT true,
+    password VARCHAR(255) NOT NULL,
+    profile_picture BYTEA,
+    profile_picture_content_type VARCHAR(50),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS department_group (
+    department_id INTEGER NOT NULL REFERENCES department(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    PRIMARY KEY (department_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS shift (
+    id SERIAL PRIMARY KEY,
+    start_time TIMESTAMPTZ NOT NULL,
+    end_time TIMESTAMPTZ NOT NULL,
+    scheduled_by_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL,
+    department_id INTEGER NOT NULL REFERENCES department(id),
+    user_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL,
+    status VARCHAR(30) NOT NULL DEFAULT 'scheduled',
+    CHECK (end_time > start_time)
+);
+
+CREATE TABLE IF NOT EXISTS availability (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    day SMALLINT NOT NULL CHECK (day BETWEEN 0 AND 6),
+    is_available BOOLEAN NOT NULL DEFAULT false,
+    start_time TIME,
+    end_time TIME
+);
+
+CREATE TABLE IF NOT EXISTS time_off_request (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    request_type VARCHAR(20) NOT NULL,
+    reason TEXT,
+    notes TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    requested_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    responded_at TIMESTAMPTZ,
+    responded_by_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS message (
+    id SERIAL PRIMARY KEY,
+    content TEXT NOT NULL,
+    time_stamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_by_user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    received_by_user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS notification (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    time_stamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN NOT NULL DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS connections (
+    connection_id VARCHAR(128) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    token VARCHAR(255) NOT NULL UNIQUE,
+    expires_at TIMESTAMPTZ NOT NULL,
+    used_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
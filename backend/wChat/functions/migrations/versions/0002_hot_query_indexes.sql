@@ -0,0 +1,36 @@
+-- migrate:no-transaction
+-- Indexes for the queries that run on every request. Built CONCURRENTLY so
+-- applying them to the live database never blocks writes.
+
+-- message_functions.get_messages: one conversation in both directions, by time
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_message_sender_receiver_time
+    ON message (sent_by_user_id, received_by_user_id, time_stamp);
+
+-- conversation_list: the received side of "sent_by = me OR received_by = me"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_message_receiver_time
+    ON message (received_by_user_id, time_stamp);
+
+-- get_notifications: newest first for one user
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notification_user_time
+    ON notification (user_id, time_stamp DESC);
+
+-- unreadOnly=true and "mark all read" only ever look at unread rows
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notification_user_unread_time
+    ON notification (user_id, time_stamp DESC)
+    WHERE is_read = false;
+
+-- user_shifts, next_shift and the pickup conflict check
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_user_start
+    ON shift (user_id, start_time);
+
+-- all_shifts filters and shift_exchange available shifts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_department_status_start
+    ON shift (department_id, status, start_time);
+
+-- WebSocket fan-out: connections for a user
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_connections_user
+    ON connections (user_id);
+
+-- Department membership by user (the primary key leads with department_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_department_group_user
+    ON department_group (user_id);
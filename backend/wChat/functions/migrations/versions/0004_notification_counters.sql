@@ -0,0 +1,19 @@
+-- Per-user notification totals so badge and pagination counts are a primary key
+-- lookup instead of a COUNT(*) over the user's whole notification history.
+-- Kept in step by NotificationService and mark_notifications_read; the
+-- notification counter repair job corrects any drift.
+
+CREATE TABLE IF NOT EXISTS notification_counter (
+    user_id INTEGER PRIMARY KEY REFERENCES "user"(id) ON DELETE CASCADE,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Writes made between this backfill and the new code going live are picked up
+-- by the next repair run
+INSERT INTO notification_counter (user_id, total_count, unread_count)
+SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE is_read = false)
+FROM notification
+GROUP BY user_id
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,31 @@
+-- Department-wide notifications are stored once in notification_broadcast, with a
+-- narrow notification_delivery row per recipient carrying only the read flag.
+-- Broadcast ids come from the notification id sequence so the two tables share one
+-- id space and clients can treat them as a single notification feed.
+
+CREATE TABLE IF NOT EXISTS notification_broadcast (
+    id INTEGER PRIMARY KEY DEFAULT nextval('notification_id_seq'),
+    department_id INTEGER NOT NULL REFERENCES department(id) ON DELETE CASCADE,
+    -- Broadcasts of the same kind to the same department are coalesced for a short window
+    kind VARCHAR(50),
+    content TEXT NOT NULL,
+    item_count INTEGER NOT NULL DEFAULT 1,
+    time_stamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Looking up the open coalescing window for a department
+CREATE INDEX IF NOT EXISTS idx_notification_broadcast_department_kind_created
+    ON notification_broadcast (department_id, kind, created_at DESC);
+
+-- A coalesced broadcast takes a fresh id so it sorts as new; deliveries follow it
+CREATE TABLE IF NOT EXISTS notification_delivery (
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    broadcast_id INTEGER NOT NULL REFERENCES notification_broadcast(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    is_read BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (user_id, broadcast_id)
+);
+
+-- ON UPDATE CASCADE and retention deletes find deliveries by broadcast
+CREATE INDEX IF NOT EXISTS idx_notification_delivery_broadcast
+    ON notification_delivery (broadcast_id);
@@ -0,0 +1,71 @@
+-- Range-partition notification by month of time_stamp. Reads bounded by time only
+-- touch the recent partitions, and old months can be detached whole by the
+-- notification retention job instead of being deleted row by row.
+-- Existing rows are copied across in this transaction.
+
+ALTER TABLE notification RENAME TO notification_unpartitioned;
+ALTER INDEX notification_pkey RENAME TO notification_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_notification_user_time;
+DROP INDEX IF EXISTS idx_notification_user_unread_time;
+-- The id sequence is shared with notification_broadcast and must outlive the old table
+ALTER SEQUENCE notification_id_seq OWNED BY NONE;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE notification (
+    id INTEGER NOT NULL DEFAULT nextval('notification_id_seq'),
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    time_stamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (id, time_stamp)
+) PARTITION BY RANGE (time_stamp);
+
+-- Detached partitions are moved here when the retention action is 'archive'
+CREATE SCHEMA IF NOT EXISTS notification_archive;
+
+-- Create the monthly partitions (UTC months) from first_month to last_month that
+-- don't exist yet. Returns the number created.
+CREATE OR REPLACE FUNCTION ensure_notification_partitions(first_month DATE, last_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition_month DATE := date_trunc('month', first_month);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE partition_month <= last_month LOOP
+        partition_name := 'notification_' || to_char(partition_month, 'YYYY_MM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF notification FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                partition_month::timestamp AT TIME ZONE 'UTC',
+                (partition_month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        partition_month := partition_month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Every month that has data, plus three months ahead
+SELECT ensure_notification_partitions(
+    COALESCE((SELECT MIN(time_stamp AT TIME ZONE 'UTC')::date FROM notification_unpartitioned), CURRENT_DATE),
+    (CURRENT_TIMESTAMP AT TIME ZONE 'UTC' + interval '3 months')::date
+);
+
+INSERT INTO notification (id, user_id, content, time_stamp, is_read)
+SELECT id, user_id, content, time_stamp, is_read
+FROM notification_unpartitioned;
+
+DROP TABLE notification_unpartitioned;
+ALTER SEQUENCE notification_id_seq OWNED BY notification.id;
+
+-- Same indexes as before, now created on every partition
+CREATE INDEX idx_notification_user_time
+    ON notification (user_id, time_stamp DESC);
+
+CREATE INDEX idx_notification_user_unread_time
+    ON notification (user_id, time_stamp DESC)
+    WHERE is_read = false;
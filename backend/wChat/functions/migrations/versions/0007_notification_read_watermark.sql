@@ -0,0 +1,5 @@
+-- "Read up to id X": every notification or broadcast delivery with an id at or
+-- below a user's watermark counts as read without its row being updated.
+
+ALTER TABLE notification_counter
+    ADD COLUMN IF NOT EXISTS read_watermark INTEGER NOT NULL DEFAULT 0;
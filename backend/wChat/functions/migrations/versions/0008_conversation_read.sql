@@ -0,0 +1,12 @@
+-- Read state for direct messages: one row per reader and conversation holding the
+-- newest message id the reader has seen. Everything the other user sent with an id
+-- at or below it is read, so a read receipt is a single upsert and unread counts
+-- come from comparing message ids against it.
+
+CREATE TABLE IF NOT EXISTS conversation_read (
+    reader_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    other_user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    last_read_message_id INTEGER NOT NULL,
+    read_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (reader_id, other_user_id)
+);
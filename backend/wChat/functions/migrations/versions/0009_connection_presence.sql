@@ -0,0 +1,19 @@
+-- Presence for WebSocket connections. Clients send a heartbeat about once a minute
+-- which moves last_seen forward; a user is online while any of their connections
+-- was seen within the presence window, and the presence sweeper deletes
+-- connections that have gone quiet for much longer than that in batches.
+
+ALTER TABLE connections
+    ADD COLUMN IF NOT EXISTS connected_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS last_seen TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Serves both the online lookup (recent end) and the sweeper (old end)
+CREATE INDEX IF NOT EXISTS idx_connections_last_seen
+    ON connections (last_seen);
+
+-- Users with a live connection; the presence window is two and a half heartbeats
+CREATE OR REPLACE VIEW online_user AS
+SELECT user_id, MAX(last_seen) AS last_seen
+FROM connections
+WHERE last_seen > CURRENT_TIMESTAMP - interval '150 seconds'
+GROUP BY user_id;
@@ -0,0 +1,21 @@
+-- Per-user delivery sequence for WebSocket pushes. Every message, edit, delete and
+-- notification frame gets the next sequence number of its recipient and is kept
+-- in delivery_log for a few days, so a reconnecting client can ask for everything
+-- after the last sequence it saw instead of reloading whole histories.
+
+CREATE TABLE IF NOT EXISTS delivery_sequence (
+    user_id INTEGER PRIMARY KEY REFERENCES "user"(id) ON DELETE CASCADE,
+    last_seq BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS delivery_log (
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    seq BIGINT NOT NULL,
+    message JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, seq)
+);
+
+-- Retention deletes from the old end
+CREATE INDEX IF NOT EXISTS idx_delivery_log_created
+    ON delivery_log (created_at);
@@ -0,0 +1,76 @@
+-- Channel subscriptions for WebSocket connections: 'department:<id>' for each of
+-- the user's departments and 'managers' for managers. Rows are written on $connect
+-- and kept in step with department membership and the manager flag by triggers,
+-- so a channel broadcast reads only its own subscribers off the primary key.
+
+CREATE TABLE IF NOT EXISTS connection_channel (
+    channel VARCHAR(64) NOT NULL,
+    connection_id VARCHAR(128) NOT NULL REFERENCES connections(connection_id) ON DELETE CASCADE,
+    PRIMARY KEY (channel, connection_id)
+);
+
+-- Lets the cascade from connections find a connection's subscriptions
+CREATE INDEX IF NOT EXISTS idx_connection_channel_connection
+    ON connection_channel (connection_id);
+
+CREATE OR REPLACE FUNCTION sync_department_channel() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO connection_channel (channel, connection_id)
+        SELECT 'department:' || NEW.department_id, connection_id
+        FROM connections
+        WHERE user_id = NEW.user_id
+        ON CONFLICT DO NOTHING;
+    ELSE
+        DELETE FROM connection_channel cc
+        USING connections c
+        WHERE c.user_id = OLD.user_id
+        AND cc.connection_id = c.connection_id
+        AND cc.channel = 'department:' || OLD.department_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS department_group_channel ON department_group;
+CREATE TRIGGER department_group_channel
+    AFTER INSERT OR DELETE ON department_group
+    FOR EACH ROW EXECUTE FUNCTION sync_department_channel();
+
+CREATE OR REPLACE FUNCTION sync_manager_channel() RETURNS trigger AS $$
+BEGIN
+    IF NEW.is_manager THEN
+        INSERT INTO connection_channel (channel, connection_id)
+        SELECT 'managers', connection_id
+        FROM connections
+        WHERE user_id = NEW.id
+        ON CONFLICT DO NOTHING;
+    ELSE
+        DELETE FROM connection_channel cc
+        USING connections c
+        WHERE c.user_id = NEW.id
+        AND cc.connection_id = c.connection_id
+        AND cc.channel = 'managers';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_manager_channel ON "user";
+CREATE TRIGGER user_manager_channel
+    AFTER UPDATE OF is_manager ON "user"
+    FOR EACH ROW
+    WHEN (OLD.is_manager IS DISTINCT FROM NEW.is_manager)
+    EXECUTE FUNCTION sync_manager_channel();
+
+-- Subscribe the connections that are already open
+INSERT INTO connection_channel (channel, connection_id)
+SELECT 'department:' || g.department_id, c.connection_id
+FROM connections c
+JOIN department_group g ON g.user_id = c.user_id
+UNION ALL
+SELECT 'managers', c.connection_id
+FROM connections c
+JOIN "user" u ON u.id = c.user_id
+WHERE u.is_manager = true
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,5 @@
+-- Frame encoding the client asked for on $connect: 'json', or 'compact' for
+-- short keys (see COMPACT_KEYS in websocket_service)
+
+ALTER TABLE connections
+    ADD COLUMN IF NOT EXISTS encoding VARCHAR(10) NOT NULL DEFAULT 'json';
@@ -0,0 +1,11 @@
+-- migrate:no-transaction
+-- Optional idempotency key a client sends with a message. A retried send with
+-- the same key finds the original row through the unique index instead of
+-- inserting (and pushing) the message again. Built CONCURRENTLY since message
+-- is one of the largest tables.
+
+ALTER TABLE message ADD COLUMN IF NOT EXISTS client_key VARCHAR(64);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_message_sender_client_key
+    ON message (sent_by_user_id, client_key)
+    WHERE client_key IS NOT NULL;
@@ -0,0 +1,65 @@
+-- Recurring shift templates ("Mon-Fri 09:00-17:00 in Kitchen, two people") and the
+-- expansion that turns them into shift rows for a date range. Every materialized
+-- shift remembers its template and slot (1..headcount), so expanding the same range
+-- again skips what already exists; see 0015 for the unique index behind that.
+
+CREATE TABLE IF NOT EXISTS shift_template (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100),
+    department_id INTEGER NOT NULL REFERENCES department(id) ON DELETE CASCADE,
+    role_id INTEGER REFERENCES role(id) ON DELETE SET NULL,
+    -- ISO weekdays, 1 = Monday ... 7 = Sunday
+    weekdays SMALLINT[] NOT NULL,
+    -- Wall-clock times in time_zone; an end at or before the start ends the next day
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    time_zone VARCHAR(64) NOT NULL DEFAULT 'UTC',
+    headcount SMALLINT NOT NULL DEFAULT 1 CHECK (headcount BETWEEN 1 AND 50),
+    valid_from DATE NOT NULL DEFAULT CURRENT_DATE,
+    valid_until DATE,
+    is_active BOOLEAN NOT NULL DEFAULT true,
+    created_by_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CHECK (weekdays <@ ARRAY[1, 2, 3, 4, 5, 6, 7]::SMALLINT[] AND cardinality(weekdays) > 0),
+    CHECK (valid_until IS NULL OR valid_until >= valid_from)
+);
+
+CREATE INDEX IF NOT EXISTS idx_shift_template_department
+    ON shift_template (department_id)
+    WHERE is_active = true;
+
+ALTER TABLE shift
+    ADD COLUMN IF NOT EXISTS role_id INTEGER REFERENCES role(id) ON DELETE SET NULL,
+    ADD COLUMN IF NOT EXISTS template_id INTEGER REFERENCES shift_template(id) ON DELETE SET NULL,
+    ADD COLUMN IF NOT EXISTS template_slot SMALLINT;
+
+-- Materialize the active templates (or just one) for first_day..last_day with a
+-- single INSERT ... SELECT over generate_series. Slots that already have a shift
+-- are skipped. Returns the shifts created.
+CREATE OR REPLACE FUNCTION expand_shift_templates(first_day DATE, last_day DATE, only_template_id INTEGER DEFAULT NULL)
+RETURNS TABLE (id INTEGER, template_id INTEGER, department_id INTEGER, start_time TIMESTAMPTZ, end_time TIMESTAMPTZ) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH created AS (
+        INSERT INTO shift AS s (start_time, end_time, scheduled_by_id, department_id, role_id, status, template_id, template_slot)
+        SELECT (day + t.start_time) AT TIME ZONE t.time_zone,
+               (day + t.end_time + CASE WHEN t.end_time <= t.start_time THEN interval '1 day' ELSE interval '0' END)
+                   AT TIME ZONE t.time_zone,
+               t.created_by_id, t.department_id, t.role_id, 'scheduled', t.id, slot
+        FROM shift_template t
+        CROSS JOIN LATERAL generate_series(
+            GREATEST(first_day, t.valid_from)::timestamp,
+            LEAST(last_day, COALESCE(t.valid_until, last_day))::timestamp,
+            interval '1 day'
+        ) AS day
+        CROSS JOIN LATERAL generate_series(1, t.headcount) AS slot
+        WHERE t.is_active = true
+        AND (only_template_id IS NULL OR t.id = only_template_id)
+        AND EXTRACT(ISODOW FROM day)::SMALLINT = ANY(t.weekdays)
+        ON CONFLICT (template_id, start_time, template_slot) WHERE template_id IS NOT NULL DO NOTHING
+        RETURNING s.id, s.template_id, s.department_id, s.start_time, s.end_time
+    )
+    SELECT * FROM created;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- migrate:no-transaction
+-- One shift per template slot and start time: what makes template expansion
+-- idempotent. Built CONCURRENTLY so the shift table stays writable.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_template_slot
+    ON shift (template_id, start_time, template_slot)
+    WHERE template_id IS NOT NULL;
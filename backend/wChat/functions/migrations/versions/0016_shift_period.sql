@@ -0,0 +1,22 @@
+-- Shifts carry their time as a range so overlap checks are a single && probe on
+-- a GiST index instead of pairwise start/end comparisons. The exclusion
+-- constraint keeps a user from holding two overlapping shifts that are still on
+-- their schedule (including ones offered for exchange), whichever code path
+-- assigns them. Ranges are half-open, so back-to-back shifts do not overlap.
+--
+-- Adding the constraint fails if existing data already has overlapping
+-- assignments; the error names the conflicting pair, which has to be resolved
+-- before the migration can be applied.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE shift
+    ADD COLUMN IF NOT EXISTS period TSTZRANGE
+        GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED;
+
+-- The constraint's index also serves the conflict probes:
+-- user_id = ? AND period && ? AND status IN ('scheduled', 'available_for_exchange')
+ALTER TABLE shift
+    ADD CONSTRAINT shift_user_no_overlap
+    EXCLUDE USING gist (user_id WITH =, period WITH &&)
+    WHERE (user_id IS NOT NULL AND status IN ('scheduled', 'available_for_exchange'));
@@ -0,0 +1,74 @@
+-- Shift pickup as a single server-side call. The shift row is claimed with
+-- FOR UPDATE SKIP LOCKED, so when many employees race for the same open shift
+-- the first one holds it and everyone else is told at once ('contended') instead
+-- of queueing behind the lock. Returns one row with the outcome:
+--   picked_up         the shift is now the picker's
+--   not_found         no such shift
+--   contended         another pickup holds the shift right now
+--   not_available     the shift is not open or offered for exchange
+--   own_shift         the picker already holds the shift
+--   not_in_department the picker is not a member of the shift's department
+--   conflict          the shift overlaps one on the picker's schedule
+CREATE OR REPLACE FUNCTION pickup_shift(target_shift_id INTEGER, picker_id INTEGER)
+RETURNS TABLE (outcome TEXT, shift_id INTEGER, department_id INTEGER, start_time TIMESTAMPTZ,
+               end_time TIMESTAMPTZ, previous_user_id INTEGER, conflicting_shift_id INTEGER) AS $$
+#variable_conflict use_column
+DECLARE
+    claimed shift%ROWTYPE;
+    conflict_id INTEGER;
+BEGIN
+    SELECT * INTO claimed
+    FROM shift
+    WHERE id = target_shift_id
+    FOR UPDATE SKIP LOCKED;
+
+    IF NOT FOUND THEN
+        IF EXISTS (SELECT 1 FROM shift WHERE id = target_shift_id) THEN
+            RETURN QUERY SELECT 'contended', target_shift_id, NULL::INTEGER, NULL::TIMESTAMPTZ,
+                                NULL::TIMESTAMPTZ, NULL::INTEGER, NULL::INTEGER;
+        ELSE
+            RETURN QUERY SELECT 'not_found', target_shift_id, NULL::INTEGER, NULL::TIMESTAMPTZ,
+                                NULL::TIMESTAMPTZ, NULL::INTEGER, NULL::INTEGER;
+        END IF;
+        RETURN;
+    END IF;
+
+    outcome := CASE
+        WHEN claimed.user_id = picker_id THEN 'own_shift'
+        WHEN NOT (claimed.status = 'available_for_exchange'
+                  OR (claimed.status = 'scheduled' AND claimed.user_id IS NULL)) THEN 'not_available'
+        WHEN NOT EXISTS (
+            SELECT 1
+            FROM department_group
+            WHERE user_id = picker_id AND department_id = claimed.department_id
+        ) THEN 'not_in_department'
+    END;
+
+    IF outcome IS NULL THEN
+        SELECT id INTO conflict_id
+        FROM shift
+        WHERE user_id = picker_id
+        AND status IN ('scheduled', 'available_for_exchange')
+        AND period && claimed.period
+        LIMIT 1;
+
+        IF conflict_id IS NOT NULL THEN
+            outcome := 'conflict';
+        ELSE
+            BEGIN
+                UPDATE shift
+                SET user_id = picker_id,
+                    status = 'scheduled'
+                WHERE id = claimed.id;
+                outcome := 'picked_up';
+            EXCEPTION WHEN exclusion_violation THEN
+                -- An overlapping pickup by the same user committed in between
+                outcome := 'conflict';
+            END;
+        END IF;
+    END IF;
+
+    RETURN QUERY SELECT outcome, claimed.id, claimed.department_id, claimed.start_time,
+                        claimed.end_time, claimed.user_id, conflict_id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,9 @@
+-- migrate:no-transaction
+-- The open-shift board: shifts nobody holds or that are offered for exchange.
+-- They are a small slice of the table, so a partial index keeps each
+-- department's upcoming open shifts together. Queries must repeat the predicate
+-- as written for the planner to use it.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_open
+    ON shift (department_id, start_time)
+    WHERE status = 'available_for_exchange' OR user_id IS NULL;
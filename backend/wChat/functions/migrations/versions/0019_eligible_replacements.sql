@@ -0,0 +1,64 @@
+-- Ranks who could cover a shift, in one query. Candidates are members of the
+-- shift's department other than its current holder who
+--   * are available for the whole shift on that weekday, or have recorded no
+--     availability for it,
+--   * have no approved time off on the shift's dates, and
+--   * hold no overlapping shift.
+-- Those who recorded matching availability come first, then whoever has the
+-- fewest hours scheduled in the shift's week. Dates, weekdays and weeks are
+-- taken in time_zone, since availability and time off are wall-clock values.
+CREATE OR REPLACE FUNCTION eligible_replacements(target_shift_id INTEGER, time_zone TEXT DEFAULT 'UTC',
+                                                 max_candidates INTEGER DEFAULT 5)
+RETURNS TABLE (user_id INTEGER, first_name VARCHAR, last_name VARCHAR, week_hours NUMERIC,
+               availability_recorded BOOLEAN) AS $$
+    WITH target AS (
+        SELECT s.id, s.department_id, s.user_id, s.period,
+               s.start_time AT TIME ZONE eligible_replacements.time_zone AS local_start,
+               s.end_time AT TIME ZONE eligible_replacements.time_zone AS local_end
+        FROM shift s
+        WHERE s.id = target_shift_id
+    ), week AS (
+        SELECT tstzrange(date_trunc('week', t.local_start) AT TIME ZONE eligible_replacements.time_zone,
+                         (date_trunc('week', t.local_start) + interval '7 days') AT TIME ZONE eligible_replacements.time_zone,
+                         '[)') AS period
+        FROM target t
+    )
+    SELECT u.id, u.first_name, u.last_name, COALESCE(hours.week_hours, 0), day_availability.covers IS NOT NULL
+    FROM target t
+    CROSS JOIN week w
+    JOIN department_group g ON g.department_id = t.department_id
+    JOIN "user" u ON u.id = g.user_id
+    LEFT JOIN LATERAL (
+        SELECT bool_or(a.is_available
+                       AND a.start_time <= t.local_start::time
+                       AND a.end_time >= CASE WHEN t.local_end::date > t.local_start::date
+                                              THEN time '23:59' ELSE t.local_end::time END) AS covers
+        FROM availability a
+        WHERE a.user_id = u.id AND a.day = EXTRACT(DOW FROM t.local_start)
+        HAVING COUNT(*) > 0
+    ) day_availability ON true
+    LEFT JOIN LATERAL (
+        SELECT round(SUM(EXTRACT(EPOCH FROM upper(s.period * w.period) - lower(s.period * w.period))) / 3600, 1) AS week_hours
+        FROM shift s
+        WHERE s.user_id = u.id
+        AND s.status IN ('scheduled', 'available_for_exchange')
+        AND s.period && w.period
+    ) hours ON true
+    WHERE u.id IS DISTINCT FROM t.user_id
+    AND COALESCE(day_availability.covers, true)
+    AND NOT EXISTS (
+        SELECT 1
+        FROM time_off_request r
+        WHERE r.user_id = u.id AND r.status = 'approved'
+        AND r.start_date <= t.local_end::date AND r.end_date >= t.local_start::date
+    )
+    AND NOT EXISTS (
+        SELECT 1
+        FROM shift s
+        WHERE s.user_id = u.id
+        AND s.status IN ('scheduled', 'available_for_exchange')
+        AND s.period && t.period
+    )
+    ORDER BY day_availability.covers IS NOT NULL DESC, COALESCE(hours.week_hours, 0), u.id
+    LIMIT max_candidates;
+$$ LANGUAGE sql STABLE;
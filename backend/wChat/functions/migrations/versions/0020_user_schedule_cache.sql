@@ -0,0 +1,95 @@
+-- Per-user cache of what the home screen shows: the next shift and this week's
+-- shifts (ISO week, UTC). Reads go through cached_user_schedule(), which serves
+-- the row while it is fresh and rebuilds it otherwise. A row expires after a
+-- short TTL, when its next shift starts or when the week ends, whichever is
+-- first, and any write to one of the user's shifts drops it straight away.
+
+CREATE TABLE IF NOT EXISTS user_schedule_cache (
+    user_id INTEGER PRIMARY KEY REFERENCES "user"(id) ON DELETE CASCADE,
+    next_shift JSONB,
+    week_start DATE NOT NULL,
+    week_shifts JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION invalidate_user_schedule_cache() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        DELETE FROM user_schedule_cache WHERE user_id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL
+       AND NEW.user_id IS DISTINCT FROM (CASE WHEN TG_OP = 'UPDATE' THEN OLD.user_id END) THEN
+        DELETE FROM user_schedule_cache WHERE user_id = NEW.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS shift_invalidate_user_schedule_cache ON shift;
+CREATE TRIGGER shift_invalidate_user_schedule_cache
+    AFTER INSERT OR UPDATE OR DELETE ON shift
+    FOR EACH ROW EXECUTE FUNCTION invalidate_user_schedule_cache();
+
+-- The user's cached schedule, rebuilt first if missing or expired. Returns no
+-- row for an unknown user. It writes, so callers commit afterwards.
+CREATE OR REPLACE FUNCTION cached_user_schedule(target_user_id INTEGER, ttl_seconds INTEGER DEFAULT 60)
+RETURNS SETOF user_schedule_cache AS $$
+DECLARE
+    cached user_schedule_cache%ROWTYPE;
+    current_week_start DATE := date_trunc('week', CURRENT_TIMESTAMP AT TIME ZONE 'UTC')::DATE;
+    week_period TSTZRANGE := tstzrange(current_week_start::TIMESTAMP AT TIME ZONE 'UTC',
+                                       (current_week_start + 7)::TIMESTAMP AT TIME ZONE 'UTC', '[)');
+BEGIN
+    SELECT * INTO cached
+    FROM user_schedule_cache
+    WHERE user_id = target_user_id AND expires_at > CURRENT_TIMESTAMP;
+
+    IF NOT FOUND THEN
+        IF NOT EXISTS (SELECT 1 FROM "user" WHERE id = target_user_id) THEN
+            RETURN;
+        END IF;
+
+        cached.user_id := target_user_id;
+        cached.week_start := current_week_start;
+
+        SELECT jsonb_build_object(
+            'id', s.id,
+            'start_time', s.start_time,
+            'end_time', s.end_time,
+            'status', s.status,
+            'department_name', d.name
+        ) INTO cached.next_shift
+        FROM shift s
+        JOIN department d ON s.department_id = d.id
+        WHERE s.user_id = target_user_id AND s.start_time > CURRENT_TIMESTAMP
+        ORDER BY s.start_time ASC
+        LIMIT 1;
+
+        SELECT COALESCE(jsonb_agg(jsonb_build_object(
+            'id', s.id,
+            'start_time', s.start_time,
+            'end_time', s.end_time,
+            'status', s.status,
+            'department_name', d.name
+        ) ORDER BY s.start_time, s.id), '[]'::jsonb) INTO cached.week_shifts
+        FROM shift s
+        LEFT JOIN department d ON s.department_id = d.id
+        WHERE s.user_id = target_user_id
+        AND s.start_time >= lower(week_period) AND s.start_time < upper(week_period);
+
+        cached.expires_at := LEAST(CURRENT_TIMESTAMP + make_interval(secs => ttl_seconds),
+                                   (cached.next_shift->>'start_time')::TIMESTAMPTZ,
+                                   upper(week_period));
+
+        INSERT INTO user_schedule_cache
+        VALUES (cached.*)
+        ON CONFLICT (user_id) DO UPDATE
+        SET next_shift = EXCLUDED.next_shift,
+            week_start = EXCLUDED.week_start,
+            week_shifts = EXCLUDED.week_shifts,
+            expires_at = EXCLUDED.expires_at;
+    END IF;
+
+    RETURN NEXT cached;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,6 @@
+-- migrate:no-transaction
+-- A department's shifts in start order, whatever their status. Rebuilding a
+-- department-week schedule document reads one week of one department.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_department_start
+    ON shift (department_id, start_time);
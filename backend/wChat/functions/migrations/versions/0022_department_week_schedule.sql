@@ -0,0 +1,179 @@
+-- The schedule grid of one department for one ISO week (UTC), kept as a ready
+-- JSON document with its ETag so a view is a single key lookup. Every statement
+-- that writes shifts rebuilds the buckets it touched, both before and after the
+-- change, in the same transaction. Renaming a user or a department drops the
+-- documents that show them; a bucket without a document is built the next time
+-- it is read.
+
+CREATE TABLE IF NOT EXISTS department_week_schedule (
+    department_id INTEGER NOT NULL REFERENCES department(id) ON DELETE CASCADE,
+    week_start DATE NOT NULL,
+    document TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (department_id, week_start)
+);
+
+-- Rebuilds one bucket. The bucket row is locked before the shifts are read, so
+-- concurrent writers to the same week take turns and the last one to commit
+-- has seen every other writer's shifts.
+CREATE OR REPLACE FUNCTION refresh_department_week_schedule(target_department_id INTEGER, target_week_start DATE)
+RETURNS department_week_schedule AS $$
+DECLARE
+    refreshed department_week_schedule%ROWTYPE;
+BEGIN
+    INSERT INTO department_week_schedule (department_id, week_start, document, etag)
+    VALUES (target_department_id, target_week_start, '', '')
+    ON CONFLICT (department_id, week_start) DO UPDATE
+    SET updated_at = CURRENT_TIMESTAMP;
+
+    UPDATE department_week_schedule w
+    SET document = built.document,
+        etag = md5(built.document),
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT jsonb_build_object(
+            'department_id', d.id,
+            'department_name', d.name,
+            'week_start', target_week_start,
+            'shifts', COALESCE(jsonb_agg(jsonb_build_object(
+                'id', s.id,
+                'start_time', s.start_time,
+                'end_time', s.end_time,
+                'status', s.status,
+                'role', r.name,
+                'user_id', s.user_id,
+                'user_first_name', u.first_name,
+                'user_last_name', u.last_name,
+                'scheduled_by_id', s.scheduled_by_id,
+                'scheduled_by_first_name', sb.first_name,
+                'scheduled_by_last_name', sb.last_name
+            ) ORDER BY s.start_time, s.id) FILTER (WHERE s.id IS NOT NULL), '[]'::jsonb)
+        )::text AS document
+        FROM department d
+        LEFT JOIN shift s ON s.department_id = d.id
+            AND s.start_time >= target_week_start::TIMESTAMP AT TIME ZONE 'UTC'
+            AND s.start_time < (target_week_start + 7)::TIMESTAMP AT TIME ZONE 'UTC'
+        LEFT JOIN role r ON r.id = s.role_id
+        LEFT JOIN "user" u ON u.id = s.user_id
+        LEFT JOIN "user" sb ON sb.id = s.scheduled_by_id
+        WHERE d.id = target_department_id
+        GROUP BY d.id, d.name
+    ) built
+    WHERE w.department_id = target_department_id AND w.week_start = target_week_start
+    RETURNING w.* INTO refreshed;
+
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The bucket's document, built first if there is none yet. Returns no row for
+-- an unknown department.
+CREATE OR REPLACE FUNCTION cached_department_week_schedule(target_department_id INTEGER, target_week_start DATE)
+RETURNS SETOF department_week_schedule AS $$
+DECLARE
+    cached department_week_schedule%ROWTYPE;
+BEGIN
+    SELECT * INTO cached
+    FROM department_week_schedule
+    WHERE department_id = target_department_id AND week_start = target_week_start;
+
+    IF NOT FOUND THEN
+        IF NOT EXISTS (SELECT 1 FROM department WHERE id = target_department_id) THEN
+            RETURN;
+        END IF;
+        cached := refresh_department_week_schedule(target_department_id, target_week_start);
+    END IF;
+
+    RETURN NEXT cached;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, so a bulk insert or a cloned week rebuilds each bucket once.
+-- Buckets are locked in a fixed order to keep concurrent writers from
+-- deadlocking on each other.
+CREATE OR REPLACE FUNCTION refresh_shift_department_weeks() RETURNS trigger AS $$
+DECLARE
+    bucket RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR bucket IN
+            SELECT DISTINCT department_id, date_trunc('week', start_time AT TIME ZONE 'UTC')::DATE AS week_start
+            FROM new_shifts
+            ORDER BY 1, 2
+        LOOP
+            PERFORM refresh_department_week_schedule(bucket.department_id, bucket.week_start);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR bucket IN
+            SELECT department_id, date_trunc('week', start_time AT TIME ZONE 'UTC')::DATE AS week_start
+            FROM new_shifts
+            UNION
+            SELECT department_id, date_trunc('week', start_time AT TIME ZONE 'UTC')::DATE
+            FROM old_shifts
+            ORDER BY 1, 2
+        LOOP
+            PERFORM refresh_department_week_schedule(bucket.department_id, bucket.week_start);
+        END LOOP;
+    ELSE
+        FOR bucket IN
+            SELECT DISTINCT department_id, date_trunc('week', start_time AT TIME ZONE 'UTC')::DATE AS week_start
+            FROM old_shifts
+            ORDER BY 1, 2
+        LOOP
+            PERFORM refresh_department_week_schedule(bucket.department_id, bucket.week_start);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS shift_insert_department_week_schedule ON shift;
+CREATE TRIGGER shift_insert_department_week_schedule
+    AFTER INSERT ON shift
+    REFERENCING NEW TABLE AS new_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_shift_department_weeks();
+
+DROP TRIGGER IF EXISTS shift_update_department_week_schedule ON shift;
+CREATE TRIGGER shift_update_department_week_schedule
+    AFTER UPDATE ON shift
+    REFERENCING OLD TABLE AS old_shifts NEW TABLE AS new_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_shift_department_weeks();
+
+DROP TRIGGER IF EXISTS shift_delete_department_week_schedule ON shift;
+CREATE TRIGGER shift_delete_department_week_schedule
+    AFTER DELETE ON shift
+    REFERENCING OLD TABLE AS old_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_shift_department_weeks();
+
+CREATE OR REPLACE FUNCTION drop_user_department_week_schedules() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM department_week_schedule w
+    USING shift s
+    WHERE (s.user_id = NEW.id OR s.scheduled_by_id = NEW.id)
+    AND w.department_id = s.department_id
+    AND w.week_start = date_trunc('week', s.start_time AT TIME ZONE 'UTC')::DATE;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_rename_department_week_schedule ON "user";
+CREATE TRIGGER user_rename_department_week_schedule
+    AFTER UPDATE OF first_name, last_name ON "user"
+    FOR EACH ROW
+    WHEN (OLD.first_name IS DISTINCT FROM NEW.first_name OR OLD.last_name IS DISTINCT FROM NEW.last_name)
+    EXECUTE FUNCTION drop_user_department_week_schedules();
+
+CREATE OR REPLACE FUNCTION drop_department_week_schedules() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM department_week_schedule WHERE department_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS department_rename_department_week_schedule ON department;
+CREATE TRIGGER department_rename_department_week_schedule
+    AFTER UPDATE OF name ON department
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION drop_department_week_schedules();
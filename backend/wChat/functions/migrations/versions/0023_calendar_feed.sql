@@ -0,0 +1,67 @@
+-- Subscribable iCalendar feeds of users' shifts. Each user may hold one secret
+-- feed token; calendar apps fetch the feed by token alone. shifts_changed_at
+-- moves whenever the feed's content may have changed, so a poll is answered
+-- with 304 from this row without reading any shifts.
+
+CREATE TABLE IF NOT EXISTS calendar_feed (
+    user_id INTEGER PRIMARY KEY REFERENCES "user"(id) ON DELETE CASCADE,
+    token TEXT NOT NULL UNIQUE,
+    shifts_changed_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Statement-level, so a bulk write touches each holder's feed once. The old
+-- holder of a reassigned shift loses it from their feed, so both sides count.
+CREATE OR REPLACE FUNCTION touch_shift_calendar_feeds() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE calendar_feed
+        SET shifts_changed_at = clock_timestamp()
+        WHERE user_id IN (SELECT user_id FROM new_shifts);
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE calendar_feed
+        SET shifts_changed_at = clock_timestamp()
+        WHERE user_id IN (SELECT user_id FROM new_shifts UNION SELECT user_id FROM old_shifts);
+    ELSE
+        UPDATE calendar_feed
+        SET shifts_changed_at = clock_timestamp()
+        WHERE user_id IN (SELECT user_id FROM old_shifts);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS shift_insert_calendar_feed ON shift;
+CREATE TRIGGER shift_insert_calendar_feed
+    AFTER INSERT ON shift
+    REFERENCING NEW TABLE AS new_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_shift_calendar_feeds();
+
+DROP TRIGGER IF EXISTS shift_update_calendar_feed ON shift;
+CREATE TRIGGER shift_update_calendar_feed
+    AFTER UPDATE ON shift
+    REFERENCING OLD TABLE AS old_shifts NEW TABLE AS new_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_shift_calendar_feeds();
+
+DROP TRIGGER IF EXISTS shift_delete_calendar_feed ON shift;
+CREATE TRIGGER shift_delete_calendar_feed
+    AFTER DELETE ON shift
+    REFERENCING OLD TABLE AS old_shifts
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_shift_calendar_feeds();
+
+-- Feed events are titled with the department's name
+CREATE OR REPLACE FUNCTION touch_department_calendar_feeds() RETURNS trigger AS $$
+BEGIN
+    UPDATE calendar_feed
+    SET shifts_changed_at = clock_timestamp()
+    WHERE user_id IN (SELECT user_id FROM shift WHERE department_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS department_rename_calendar_feed ON department;
+CREATE TRIGGER department_rename_calendar_feed
+    AFTER UPDATE OF name ON department
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION touch_department_calendar_feeds();
@@ -0,0 +1,8 @@
+-- Welcome emails used to carry the new user's temporary password in the outbox
+-- payload, and rows that kept failing stay in the table. They now get a
+-- set-password link at send time instead, so the stored passwords can go.
+
+UPDATE outbox
+SET payload = payload #- '{template_data,temp_password}'
+WHERE event_type = 'email'
+AND payload->'template_data' ? 'temp_password';
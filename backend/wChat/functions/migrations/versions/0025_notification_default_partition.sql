@@ -0,0 +1,68 @@
+-- A notification whose month has no partition (a timestamp past the months
+-- created ahead, or in a month already retired) used to fail to insert. It now
+-- lands in a DEFAULT partition, and the retention job moves such rows into
+-- their monthly partitions.
+
+CREATE TABLE IF NOT EXISTS notification_default PARTITION OF notification DEFAULT;
+
+-- Create the monthly partitions (UTC months) from first_month to last_month that
+-- don't exist yet. Returns the number created. Postgres refuses a new partition
+-- while the default partition holds rows in its range, so those rows are moved
+-- into the new table before it is attached.
+CREATE OR REPLACE FUNCTION ensure_notification_partitions(first_month DATE, last_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    partition_month DATE := date_trunc('month', first_month);
+    partition_name TEXT;
+    range_start TIMESTAMPTZ;
+    range_end TIMESTAMPTZ;
+    created INTEGER := 0;
+BEGIN
+    WHILE partition_month <= last_month LOOP
+        partition_name := 'notification_' || to_char(partition_month, 'YYYY_MM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            range_start := partition_month::timestamp AT TIME ZONE 'UTC';
+            range_end := (partition_month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+            EXECUTE format(
+                'CREATE TABLE public.%I (LIKE notification INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            EXECUTE format(
+                'WITH moved AS (
+                     DELETE FROM notification_default
+                     WHERE time_stamp >= %L AND time_stamp < %L
+                     RETURNING *
+                 )
+                 INSERT INTO public.%I SELECT * FROM moved',
+                range_start, range_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE notification ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, range_start, range_end
+            );
+            created := created + 1;
+        END IF;
+        partition_month := partition_month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Give every month found in the default partition its own partition, which
+-- empties the default. Returns the number of rows moved.
+CREATE OR REPLACE FUNCTION drain_notification_default()
+RETURNS INTEGER AS $$
+DECLARE
+    default_month DATE;
+    moved INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO moved FROM notification_default;
+    FOR default_month IN
+        SELECT DISTINCT date_trunc('month', time_stamp AT TIME ZONE 'UTC')::date
+        FROM notification_default
+    LOOP
+        PERFORM ensure_notification_partitions(default_month, default_month);
+    END LOOP;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,57 @@
+-- Template expansion used to skip a slot only while its shift still sat at the
+-- generated start time, so a shift a manager deleted came back on the next run
+-- and one whose start was edited got a duplicate. Each template now records the
+-- last day it has been materialized for, and expansion only generates the days
+-- after it; what happens to a materialized shift afterwards is left alone.
+
+ALTER TABLE shift_template
+    ADD COLUMN IF NOT EXISTS materialized_through DATE;
+
+-- Templates already expanded continue after the last day they have shifts for
+UPDATE shift_template t
+SET materialized_through = (
+    SELECT MAX((s.start_time AT TIME ZONE t.time_zone)::date)
+    FROM shift s
+    WHERE s.template_id = t.id
+)
+WHERE t.materialized_through IS NULL;
+
+-- Materialize the active templates (or just one) for first_day..last_day with a
+-- single INSERT ... SELECT over generate_series, skipping the days up to each
+-- template's materialized_through and advancing it. The template rows are
+-- locked, so concurrent expansions don't both create a day. Returns the shifts
+-- created.
+CREATE OR REPLACE FUNCTION expand_shift_templates(first_day DATE, last_day DATE, only_template_id INTEGER DEFAULT NULL)
+RETURNS TABLE (id INTEGER, template_id INTEGER, department_id INTEGER, start_time TIMESTAMPTZ, end_time TIMESTAMPTZ) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH scope AS (
+        SELECT t.*,
+               GREATEST(first_day, t.valid_from, t.materialized_through + 1) AS from_day,
+               LEAST(last_day, COALESCE(t.valid_until, last_day)) AS until_day
+        FROM shift_template t
+        WHERE t.is_active = true
+        AND (only_template_id IS NULL OR t.id = only_template_id)
+        FOR UPDATE
+    ), advanced AS (
+        UPDATE shift_template t
+        SET materialized_through = scope.until_day
+        FROM scope
+        WHERE t.id = scope.id AND scope.from_day <= scope.until_day
+    ), created AS (
+        INSERT INTO shift AS s (start_time, end_time, scheduled_by_id, department_id, role_id, status, template_id, template_slot)
+        SELECT (day + t.start_time) AT TIME ZONE t.time_zone,
+               (day + t.end_time + CASE WHEN t.end_time <= t.start_time THEN interval '1 day' ELSE interval '0' END)
+                   AT TIME ZONE t.time_zone,
+               t.created_by_id, t.department_id, t.role_id, 'scheduled', t.id, slot
+        FROM scope t
+        CROSS JOIN LATERAL generate_series(t.from_day::timestamp, t.until_day::timestamp, interval '1 day') AS day
+        CROSS JOIN LATERAL generate_series(1, t.headcount) AS slot
+        WHERE EXTRACT(ISODOW FROM day)::SMALLINT = ANY(t.weekdays)
+        ON CONFLICT (template_id, start_time, template_slot) WHERE template_id IS NOT NULL DO NOTHING
+        RETURNING s.id, s.template_id, s.department_id, s.start_time, s.end_time
+    )
+    SELECT * FROM created;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,6 @@
+-- Copies made by the schedule clone remember the shift they were copied from,
+-- so cloning the same range to the same dates again skips what already exists;
+-- see 0028 for the unique index behind that.
+
+ALTER TABLE shift
+    ADD COLUMN IF NOT EXISTS cloned_from_id INTEGER REFERENCES shift(id) ON DELETE SET NULL;
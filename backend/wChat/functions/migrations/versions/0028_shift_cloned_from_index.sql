@@ -0,0 +1,7 @@
+-- migrate:no-transaction
+-- One copy per source shift and start time: what makes cloning a schedule
+-- idempotent. Built CONCURRENTLY so the shift table stays writable.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_shift_cloned_from_start
+    ON shift (cloned_from_id, start_time)
+    WHERE cloned_from_id IS NOT NULL;
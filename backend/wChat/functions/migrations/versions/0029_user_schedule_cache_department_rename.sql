@@ -0,0 +1,17 @@
+-- Cached schedules carry department_name, so renaming a department drops the
+-- cache rows of everyone with a shift there; they are rebuilt on the next read.
+
+CREATE OR REPLACE FUNCTION invalidate_department_user_schedule_cache() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM user_schedule_cache
+    WHERE user_id IN (SELECT user_id FROM shift WHERE department_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS department_rename_user_schedule_cache ON department;
+CREATE TRIGGER department_rename_user_schedule_cache
+    AFTER UPDATE OF name ON department
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION invalidate_department_user_schedule_cache();
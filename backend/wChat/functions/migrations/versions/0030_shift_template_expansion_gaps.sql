@@ -0,0 +1,46 @@
+-- Expanding a later range first (say, next month through /expand before the
+-- daily job had reached it) moved materialized_through past days that were
+-- never generated, and later runs skipped them for good. Expansion now always
+-- starts at the first day a template hasn't been materialized for, so the
+-- days in between are generated too and materialized_through only ever
+-- advances over days that have been materialized. A template never expanded
+-- starts at the requested day, or at today (UTC) when that is earlier, like
+-- the daily job.
+CREATE OR REPLACE FUNCTION expand_shift_templates(first_day DATE, last_day DATE, only_template_id INTEGER DEFAULT NULL)
+RETURNS TABLE (id INTEGER, template_id INTEGER, department_id INTEGER, start_time TIMESTAMPTZ, end_time TIMESTAMPTZ) AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH scope AS (
+        SELECT t.*,
+               GREATEST(
+                   t.valid_from,
+                   COALESCE(t.materialized_through + 1,
+                            LEAST(first_day, (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')::date))
+               ) AS from_day,
+               LEAST(last_day, COALESCE(t.valid_until, last_day)) AS until_day
+        FROM shift_template t
+        WHERE t.is_active = true
+        AND (only_template_id IS NULL OR t.id = only_template_id)
+        FOR UPDATE
+    ), advanced AS (
+        UPDATE shift_template t
+        SET materialized_through = scope.until_day
+        FROM scope
+        WHERE t.id = scope.id AND scope.from_day <= scope.until_day
+    ), created AS (
+        INSERT INTO shift AS s (start_time, end_time, scheduled_by_id, department_id, role_id, status, template_id, template_slot)
+        SELECT (day + t.start_time) AT TIME ZONE t.time_zone,
+               (day + t.end_time + CASE WHEN t.end_time <= t.start_time THEN interval '1 day' ELSE interval '0' END)
+                   AT TIME ZONE t.time_zone,
+               t.created_by_id, t.department_id, t.role_id, 'scheduled', t.id, slot
+        FROM scope t
+        CROSS JOIN LATERAL generate_series(t.from_day::timestamp, t.until_day::timestamp, interval '1 day') AS day
+        CROSS JOIN LATERAL generate_series(1, t.headcount) AS slot
+        WHERE EXTRACT(ISODOW FROM day)::SMALLINT = ANY(t.weekdays)
+        ON CONFLICT (template_id, start_time, template_slot) WHERE template_id IS NOT NULL DO NOTHING
+        RETURNING s.id, s.template_id, s.department_id, s.start_time, s.end_time
+    )
+    SELECT * FROM created;
+END;
+$$ LANGUAGE plpgsql;
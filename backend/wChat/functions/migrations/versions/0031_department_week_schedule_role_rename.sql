@@ -0,0 +1,22 @@
+-- Week documents show each shift's role name, but only user and department
+-- renames dropped them, so a renamed role kept its old name in every stored
+-- week until a shift there was written. Renaming a role now drops the
+-- documents that show it; they are rebuilt the next time they are read.
+
+CREATE OR REPLACE FUNCTION drop_role_department_week_schedules() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM department_week_schedule w
+    USING shift s
+    WHERE s.role_id = NEW.id
+    AND w.department_id = s.department_id
+    AND w.week_start = date_trunc('week', s.start_time AT TIME ZONE 'UTC')::DATE;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS role_rename_department_week_schedule ON role;
+CREATE TRIGGER role_rename_department_week_schedule
+    AFTER UPDATE OF name ON role
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION drop_role_department_week_schedules();
@@ -0,0 +1,113 @@
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Users recounted per transaction; keeps counter row locks short
+BATCH_SIZE = 500
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Scheduled consistency check for notification_counter. Walks every user in id order and
+    # rewrites only the counters that disagree with their notifications and broadcast deliveries.
+    conn = get_db_connection()
+    try:
+        checked, repaired = repair_counters(conn)
+        print(f"Checked {checked} notification counters, repaired {repaired}")
+        return {'statusCode': 200, 'body': json.dumps({'checked': checked, 'repaired': repaired})}
+    except Exception as e:
+        print(f"Error repairing notification counters: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
+
+def repair_counters(conn, batch_size=BATCH_SIZE):
+    checked = 0
+    repaired = 0
+    last_user_id = 0
+    while True:
+        user_ids, count = repair_batch(conn, last_user_id, batch_size)
+        if not user_ids:
+            return checked, repaired
+        checked += len(user_ids)
+        repaired += count
+        last_user_id = user_ids[-1]
+
+def repair_batch(conn, after_user_id, batch_size):
+    """Recount one keyset page of users; returns (user_ids, number of counters changed)"""
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id
+                FROM "user"
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (after_user_id, batch_size))
+            user_ids = [row['id'] for row in cur.fetchall()]
+            if not user_ids:
+                conn.commit()
+                return [], 0
+
+            # Make sure every user has a row, then lock them so inserts that are
+            # in flight either land before the recount or wait until after it
+            cur.execute("""
+                INSERT INTO notification_counter (user_id)
+                SELECT unnest(%s::int[])
+                ON CONFLICT (user_id) DO NOTHING
+            """, (user_ids,))
+            cur.execute("""
+                SELECT user_id
+                FROM notification_counter
+                WHERE user_id = ANY(%s)
+                ORDER BY user_id
+                FOR UPDATE
+            """, (user_ids,))
+
+            cur.execute("""
+                WITH feed AS (
+                    SELECT user_id, id, is_read
+                    FROM notification
+                    WHERE user_id = ANY(%(user_ids)s)
+                    UNION ALL
+                    SELECT user_id, broadcast_id, is_read
+                    FROM notification_delivery
+                    WHERE user_id = ANY(%(user_ids)s)
+                ), actual AS (
+                    SELECT c.user_id,
+                           COUNT(f.user_id) AS total_count,
+                           COUNT(f.user_id) FILTER (WHERE f.is_read = false AND f.id > c.read_watermark) AS unread_count
+                    FROM notification_counter c
+                    LEFT JOIN feed f ON f.user_id = c.user_id
+                    WHERE c.user_id = ANY(%(user_ids)s)
+                    GROUP BY c.user_id
+                )
+                UPDATE notification_counter c
+                SET total_count = actual.total_count,
+                    unread_count = actual.unread_count,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM actual
+                WHERE c.user_id = actual.user_id
+                AND (c.total_count <> actual.total_count OR c.unread_count <> actual.unread_count)
+                RETURNING c.user_id
+            """, {'user_ids': user_ids})
+            repaired = cur.fetchall()
+            for row in repaired:
+                print(f"Repaired notification counter for user {row['user_id']}")
+
+        conn.commit()
+        return user_ids, len(repaired)
+    except Exception:
+        conn.rollback()
+        raise
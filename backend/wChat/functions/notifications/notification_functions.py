@@ -3,13 +3,112 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+# Pages are read from this many recent days first so only the newest notification
+# partitions are scanned; older history is only touched when the window runs short
+HOT_WINDOW_DAYS = 90
+# Allowance for rows whose time stamp is earlier than their id order suggests
+CURSOR_SLACK = timedelta(hours=1)
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 
+# Personal notifications and department broadcast deliveries merged newest first;
+# each side only needs its first offset + limit rows. Rows at or below the user's
+# read watermark count as read. Filled in by feed_query.
+NOTIFICATION_FEED = """
+    SELECT id, content, time_stamp, is_read
+    FROM (
+        (SELECT id, content, time_stamp, (is_read OR id <= %(watermark)s) AS is_read
+         FROM notification
+         WHERE user_id = %(user_id)s{unread_filter}{time_filter}
+         ORDER BY time_stamp DESC
+         LIMIT %(window)s)
+        UNION ALL
+        (SELECT b.id, b.content, b.time_stamp, (d.is_read OR b.id <= %(watermark)s) AS is_read
+         FROM notification_delivery d
+         JOIN notification_broadcast b ON b.id = d.broadcast_id
+         WHERE d.user_id = %(user_id)s{delivery_unread_filter}{broadcast_time_filter}
+         ORDER BY b.time_stamp DESC
+         LIMIT %(window)s)
+    ) feed
+    ORDER BY time_stamp DESC, id DESC
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# Moves the user's read watermark up to %(up_to_id)s, or past everything they
+# have, without writing notification rows. up_to_id is capped at the user's
+# newest id, so notifications that do not exist yet still arrive unread. The
+# unread counter is recounted above the new watermark rather than decremented:
+# a notification whose id was drawn before the newest one but that commits
+# later lands under the watermark, and must not stay in the count. Callers lock
+# the counter row first, so every notification already counted is visible
+# here. Filled in by mark_all_read_query.
+MARK_ALL_READ = """
+    WITH latest AS (
+        SELECT COALESCE(GREATEST(
+            (SELECT MAX(id) FROM notification WHERE user_id = %(user_id)s),
+            (SELECT MAX(broadcast_id) FROM notification_delivery WHERE user_id = %(user_id)s)
+        ), 0) AS id
+    ), newly_read AS (
+        SELECT id
+        FROM notification
+        WHERE user_id = %(user_id)s AND is_read = false{upto_filter}
+        AND id > (SELECT read_watermark FROM notification_counter WHERE user_id = %(user_id)s)
+        UNION ALL
+        SELECT broadcast_id
+        FROM notification_delivery
+        WHERE user_id = %(user_id)s AND is_read = false{delivery_upto_filter}
+        AND broadcast_id > (SELECT read_watermark FROM notification_counter WHERE user_id = %(user_id)s)
+    ), target AS (
+        SELECT GREATEST(
+                   read_watermark,
+                   COALESCE(LEAST(%(up_to_id)s, (SELECT id FROM latest)),
+                            (SELECT MAX(id) FROM newly_read), read_watermark)
+               ) AS read_watermark
+        FROM notification_counter
+        WHERE user_id = %(user_id)s
+    ), updated AS (
+        UPDATE notification_counter
+        SET read_watermark = (SELECT read_watermark FROM target),
+            unread_count = (
+                SELECT COUNT(*)
+                FROM notification
+                WHERE user_id = %(user_id)s AND is_read = false
+                AND id > (SELECT read_watermark FROM target)
+            ) + (
+                SELECT COUNT(*)
+                FROM notification_delivery
+                WHERE user_id = %(user_id)s AND is_read = false
+                AND broadcast_id > (SELECT read_watermark FROM target)
+            ),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = %(user_id)s
+        RETURNING read_watermark
+    )
+    SELECT (SELECT COUNT(*) FROM newly_read) AS marked_count,
+           (SELECT read_watermark FROM updated) AS read_watermark
+"""
+
+def feed_query(unread_only, hot_window):
+    """ NOTIFICATION_FEED for all or only unread rows, bounded to %(since)s with hot_window """
+    return NOTIFICATION_FEED.format(
+        unread_filter=" AND is_read = false AND id > %(watermark)s" if unread_only else "",
+        time_filter=" AND time_stamp >= %(since)s" if hot_window else "",
+        delivery_unread_filter=" AND d.is_read = false AND b.id > %(watermark)s" if unread_only else "",
+        broadcast_time_filter=" AND b.time_stamp >= %(since)s" if hot_window else ""
+    )
+
+def mark_all_read_query(up_to):
+    """ MARK_ALL_READ up to %(up_to_id)s, or over everything without up_to """
+    return MARK_ALL_READ.format(
+        upto_filter=" AND id <= %(up_to_id)s" if up_to else "",
+        delivery_upto_filter=" AND broadcast_id <= %(up_to_id)s" if up_to else ""
+    )
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -50,6 +149,9 @@ def get_notifications(event, cur):
         limit = query_params.get('limit', '50')  # Default to 50 notifications
         offset = query_params.get('offset', '0')  # Default to first page
         unread_only = query_params.get('unreadOnly', 'false').lower() == 'true'
+        # Optional cursors: only notifications newer than sinceId or older than beforeId
+        since_id = query_params.get('sinceId')
+        before_id = query_params.get('beforeId')
         
         if not user_id:
             return response(400, {'error': 'userId is required'})
@@ -58,44 +160,48 @@ def get_notifications(event, cur):
         try:
             limit = int(limit)
             offset = int(offset)
+            since_id = int(since_id) if since_id is not None else None
+            before_id = int(before_id) if before_id is not None else None
         except ValueError:
-            return response(400, {'error': 'Invalid limit or offset value'})
+            return response(400, {'error': 'Invalid limit, offset or cursor value'})
+
+        if since_id is not None and before_id is not None:
+            return response(400, {'error': 'Use either sinceId or beforeId, not both'})
         
-        # Build query
-        query = """
-            SELECT id, content, time_stamp, is_read
-            FROM notification
+        # Get total count for pagination from the user's maintained counters
+        cur.execute("""
+            SELECT total_count, unread_count, read_watermark
+            FROM notification_counter
             WHERE user_id = %s
-        """
-        params = [user_id]
-        
-        # Add unread filter if requested
-        if unread_only:
-            query += " AND is_read = false"
-            
-        # Add ordering and pagination
-        query += """
-            ORDER BY time_stamp DESC
-            LIMIT %s OFFSET %s
-        """
-        params.extend([limit, offset])
+        """, (user_id,))
+        counter = cur.fetchone() or {'total_count': 0, 'unread_count': 0, 'read_watermark': 0}
+        total_count = counter['unread_count'] if unread_only else counter['total_count']
+
+        if since_id is not None or before_id is not None:
+            return get_notifications_by_cursor(cur, user_id, unread_only, limit, since_id, before_id, counter)
         
-        # Get total count for pagination
-        count_query = "SELECT COUNT(*) FROM notification WHERE user_id = %s"
-        count_params = [user_id]
-        if unread_only:
-            count_query += " AND is_read = false"
-            
-        cur.execute(count_query, count_params)
-        total_count = cur.fetchone()['count']
+        params = {
+            'user_id': user_id,
+            'window': offset + limit,
+            'limit': limit,
+            'offset': offset,
+            'since': datetime.now(timezone.utc) - timedelta(days=HOT_WINDOW_DAYS),
+            'watermark': counter['read_watermark']
+        }
         
-        # Get notifications
-        cur.execute(query, params)
+        # Get notifications, partition-pruned to the hot window
+        cur.execute(feed_query(unread_only, hot_window=True), params)
         notifications = cur.fetchall()
+
+        # The page reaches past the hot window: read it again over all retained history
+        if len(notifications) < limit and offset + len(notifications) < total_count:
+            cur.execute(feed_query(unread_only, hot_window=False), params)
+            notifications = cur.fetchall()
         
         # Prepare response with pagination info
         response_data = {
             'notifications': notifications,
+            'unreadCount': counter['unread_count'],
             'pagination': {
                 'total': total_count,
                 'limit': limit,
@@ -110,6 +216,81 @@ def get_notifications(event, cur):
         print(f"Error retrieving notifications: {str(e)}")
         return response(500, {'error': 'Internal server error'})
 
+def get_notifications_by_cursor(cur, user_id, unread_only, limit, since_id, before_id, counter):
+    """
+    Keyset page of the notification feed relative to a notification id the client
+    already has: sinceId returns newer rows oldest first, so the client can keep
+    syncing from the last id it received; beforeId returns older rows newest first.
+    Ids are handed out by one sequence, so a coalesced broadcast shows up as new.
+    """
+    cursor_id = since_id if since_id is not None else before_id
+
+    # The cursor's time stamp bounds the scan so only the partitions around and
+    # after (or before) it are read. Rows get their time stamp at transaction start,
+    # so allow some slack for ids handed out by longer transactions.
+    cur.execute("""
+        SELECT time_stamp FROM notification WHERE id = %(id)s AND user_id = %(user_id)s
+        UNION ALL
+        SELECT b.time_stamp
+        FROM notification_broadcast b
+        JOIN notification_delivery d ON d.broadcast_id = b.id
+        WHERE b.id = %(id)s AND d.user_id = %(user_id)s
+    """, {'id': cursor_id, 'user_id': user_id})
+    cursor_row = cur.fetchone()
+
+    unread_filter = " AND is_read = false AND id > %(watermark)s" if unread_only else ""
+    delivery_unread_filter = " AND d.is_read = false AND b.id > %(watermark)s" if unread_only else ""
+    if since_id is not None:
+        id_filter, broadcast_id_filter, direction = " AND id > %(cursor_id)s", " AND b.id > %(cursor_id)s", "ASC"
+        time_filter, broadcast_time_filter = " AND time_stamp >= %(bound)s", " AND b.time_stamp >= %(bound)s"
+        bound = cursor_row['time_stamp'] - CURSOR_SLACK if cursor_row else None
+    else:
+        id_filter, broadcast_id_filter, direction = " AND id < %(cursor_id)s", " AND b.id < %(cursor_id)s", "DESC"
+        time_filter, broadcast_time_filter = " AND time_stamp <= %(bound)s", " AND b.time_stamp <= %(bound)s"
+        bound = cursor_row['time_stamp'] + CURSOR_SLACK if cursor_row else None
+
+    # The cursor row has been archived or coalesced away: fall back to the id alone
+    if bound is None:
+        time_filter = broadcast_time_filter = ""
+
+    # One extra row tells whether there is another page
+    cur.execute(f"""
+        SELECT id, content, time_stamp, is_read
+        FROM (
+            (SELECT id, content, time_stamp, (is_read OR id <= %(watermark)s) AS is_read
+             FROM notification
+             WHERE user_id = %(user_id)s{unread_filter}{id_filter}{time_filter}
+             ORDER BY id {direction}
+             LIMIT %(window)s)
+            UNION ALL
+            (SELECT b.id, b.content, b.time_stamp, (d.is_read OR b.id <= %(watermark)s) AS is_read
+             FROM notification_delivery d
+             JOIN notification_broadcast b ON b.id = d.broadcast_id
+             WHERE d.user_id = %(user_id)s{delivery_unread_filter}{broadcast_id_filter}{broadcast_time_filter}
+             ORDER BY b.id {direction}
+             LIMIT %(window)s)
+        ) feed
+        ORDER BY id {direction}
+        LIMIT %(window)s
+    """, {
+        'user_id': user_id,
+        'cursor_id': cursor_id,
+        'bound': bound,
+        'window': limit + 1,
+        'watermark': counter['read_watermark']
+    })
+    notifications = cur.fetchall()
+
+    return response(200, {
+        'notifications': notifications[:limit],
+        'unreadCount': counter['unread_count'],
+        'pagination': {
+            'total': counter['unread_count'] if unread_only else counter['total_count'],
+            'limit': limit,
+            'hasMore': len(notifications) > limit
+        }
+    })
+
 @authenticate
 def mark_notifications_read(event, cur):
     try:
@@ -117,34 +298,72 @@ def mark_notifications_read(event, cur):
         body = json.loads(event['body'])
         user_id = body.get('userId')
         notification_ids = body.get('notificationIds', [])  # Optional: specific notifications to mark as read
+        up_to_id = body.get('upToId')  # Optional: everything up to and including this id is read
         
         if not user_id:
             return response(400, {'error': 'userId is required'})
+
+        if up_to_id is not None:
+            try:
+                up_to_id = int(up_to_id)
+            except (TypeError, ValueError):
+                return response(400, {'error': 'Invalid upToId value'})
             
-        # Build update query
         if notification_ids:
-            # Mark specific notifications as read
-            cur.execute("""
-                UPDATE notification
-                SET is_read = true
-                WHERE user_id = %s AND id = ANY(%s)
-                RETURNING id
-            """, (user_id, notification_ids))
-        else:
-            # Mark all notifications as read
+            # Mark specific notifications as read, for reads out of order.
+            # Ids may belong to personal notifications or to broadcast deliveries,
+            # and only rows that are still unread are touched so the unread
+            # counter drops by exactly the number this request changed
             cur.execute("""
-                UPDATE notification
-                SET is_read = true
-                WHERE user_id = %s AND is_read = false
-                RETURNING id
-            """, (user_id,))
+                WITH watermark AS (
+                    SELECT COALESCE(MAX(read_watermark), 0) AS read_watermark
+                    FROM notification_counter
+                    WHERE user_id = %(user_id)s
+                ), updated AS (
+                    UPDATE notification
+                    SET is_read = true
+                    WHERE user_id = %(user_id)s AND id = ANY(%(ids)s) AND is_read = false
+                    AND id > (SELECT read_watermark FROM watermark)
+                    RETURNING id
+                ), updated_deliveries AS (
+                    UPDATE notification_delivery
+                    SET is_read = true
+                    WHERE user_id = %(user_id)s AND broadcast_id = ANY(%(ids)s) AND is_read = false
+                    AND broadcast_id > (SELECT read_watermark FROM watermark)
+                    RETURNING broadcast_id AS id
+                ), changed AS (
+                    SELECT id FROM updated
+                    UNION ALL
+                    SELECT id FROM updated_deliveries
+                ), counter AS (
+                    UPDATE notification_counter
+                    SET unread_count = GREATEST(unread_count - (SELECT COUNT(*) FROM changed), 0),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = %(user_id)s
+                )
+                SELECT id FROM changed
+            """, {'user_id': user_id, 'ids': notification_ids})
+                
+            updated_ids = [row['id'] for row in cur.fetchall()]
+            cur.connection.commit()
             
-        updated_ids = [row['id'] for row in cur.fetchall()]
+            return response(200, {
+                'message': 'Notifications marked as read',
+                'updatedIds': updated_ids
+            })
+
+        # Mark everything up to upToId (or everything, without it) as read by
+        # moving the user's watermark. Notification inserts update the counter
+        # row too, so once it is locked the next statement sees all they counted
+        cur.execute("SELECT 1 FROM notification_counter WHERE user_id = %s FOR UPDATE", (user_id,))
+        cur.execute(mark_all_read_query(up_to_id is not None), {'user_id': user_id, 'up_to_id': up_to_id})
+        result = cur.fetchone()
         cur.connection.commit()
-        
+
         return response(200, {
             'message': 'Notifications marked as read',
-            'updatedIds': updated_ids
+            'markedCount': result['marked_count'],
+            'readWatermark': result['read_watermark'] or 0
         })
         
     except Exception as e:
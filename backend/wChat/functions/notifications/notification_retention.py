@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import psycopg2
+from datetime import date, datetime, timezone
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Months of notifications kept attached to the notification table
+RETENTION_MONTHS = int(os.environ.get('NOTIFICATION_RETENTION_MONTHS', '12'))
+# 'archive' moves retired partitions to the notification_archive schema, 'drop' deletes them
+RETENTION_ACTION = os.environ.get('NOTIFICATION_RETENTION_ACTION', 'archive')
+# Partitions are created this many months ahead so inserts always have somewhere to go
+PREMAKE_MONTHS = 3
+
+PARTITION_NAME_PATTERN = re.compile(r'^notification_(\d{4})_(\d{2})$')
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Daily partition maintenance for the notification table: create upcoming
+    # months, move rows out of the default partition, then detach (and archive
+    # or drop) months past the retention period
+    if RETENTION_ACTION not in ('archive', 'drop'):
+        return {'statusCode': 500, 'body': json.dumps({'error': f"Invalid retention action: {RETENTION_ACTION}"})}
+
+    conn = get_db_connection()
+    try:
+        today = datetime.now(timezone.utc).date()
+        created = create_partitions(conn, today)
+        drained = drain_default_partition(conn)
+        cutoff = add_months(today.replace(day=1), -RETENTION_MONTHS)
+        retired = retire_partitions(conn, cutoff)
+        broadcasts = expire_broadcasts(conn, cutoff)
+
+        result = {'created': created, 'drained': drained, 'retired': retired, 'expired_broadcasts': broadcasts}
+        print(f"Notification retention: {result}")
+        return {'statusCode': 200, 'body': json.dumps(result)}
+    except Exception as e:
+        print(f"Error maintaining notification partitions: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def create_partitions(conn, today):
+    with conn.cursor() as cur:
+        cur.execute("SELECT ensure_notification_partitions(%s, %s)",
+                    (today, add_months(today.replace(day=1), PREMAKE_MONTHS)))
+        created = cur.fetchone()[0]
+    conn.commit()
+    return created
+
+def drain_default_partition(conn):
+    """Move rows in notification_default into their monthly partitions; returns how many"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT drain_notification_default()")
+            drained = cur.fetchone()[0]
+        conn.commit()
+        return drained
+    except Exception:
+        conn.rollback()
+        raise
+
+def retire_partitions(conn, cutoff):
+    """Detach every partition that ends on or before cutoff; returns their names"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'notification'::regclass
+        """)
+        partitions = sorted(row[0] for row in cur.fetchall())
+
+    retired = []
+    for partition in partitions:
+        match = PARTITION_NAME_PATTERN.match(partition)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month, 1) > cutoff:
+            continue
+        retire_partition(conn, partition)
+        retired.append(partition)
+    return retired
+
+def retire_partition(conn, partition):
+    # The counters drop by what leaves the table, in the same transaction as the detach
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                WITH retired AS (
+                    SELECT n.user_id, COUNT(*) AS total_count,
+                           COUNT(*) FILTER (WHERE n.is_read = false AND n.id > c.read_watermark) AS unread_count
+                    FROM {partition} n
+                    JOIN notification_counter c ON c.user_id = n.user_id
+                    GROUP BY n.user_id
+                )
+                UPDATE notification_counter c
+                SET total_count = GREATEST(c.total_count - retired.total_count, 0),
+                    unread_count = GREATEST(c.unread_count - retired.unread_count, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                FROM retired
+                WHERE c.user_id = retired.user_id
+            """).format(partition=sql.Identifier(partition)))
+
+            cur.execute(sql.SQL("ALTER TABLE notification DETACH PARTITION {partition}").format(
+                partition=sql.Identifier(partition)))
+
+            if RETENTION_ACTION == 'archive':
+                cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f'notification_archive.{partition}',))
+                if cur.fetchone()[0]:
+                    # The month was archived before and rows drained from the
+                    # default partition brought it back; add them to the archive
+                    cur.execute(sql.SQL("""
+                        INSERT INTO notification_archive.{partition} SELECT * FROM {partition};
+                        DROP TABLE {partition}
+                    """).format(partition=sql.Identifier(partition)))
+                else:
+                    cur.execute(sql.SQL("ALTER TABLE {partition} SET SCHEMA notification_archive").format(
+                        partition=sql.Identifier(partition)))
+            else:
+                cur.execute(sql.SQL("DROP TABLE {partition}").format(partition=sql.Identifier(partition)))
+        conn.commit()
+        print(f"Retired notification partition {partition} ({RETENTION_ACTION})")
+    except Exception:
+        conn.rollback()
+        raise
+
+def expire_broadcasts(conn, cutoff):
+    # Department broadcasts follow the same retention period; they are small
+    # enough to delete outright, deliveries go with them
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                WITH expired AS (
+                    DELETE FROM notification_broadcast
+                    WHERE time_stamp < %s
+                    RETURNING id
+                ), removed AS (
+                    SELECT d.user_id, COUNT(*) AS total_count,
+                           COUNT(*) FILTER (WHERE d.is_read = false AND d.broadcast_id > c.read_watermark) AS unread_count
+                    FROM notification_delivery d
+                    JOIN notification_counter c ON c.user_id = d.user_id
+                    WHERE d.broadcast_id IN (SELECT id FROM expired)
+                    GROUP BY d.user_id
+                ), counted AS (
+                    UPDATE notification_counter c
+                    SET total_count = GREATEST(c.total_count - removed.total_count, 0),
+                        unread_count = GREATEST(c.unread_count - removed.unread_count, 0),
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM removed
+                    WHERE c.user_id = removed.user_id
+                )
+                SELECT COUNT(*) AS expired FROM expired
+            """, (cutoff,))
+            expired = cur.fetchone()['expired']
+        conn.commit()
+        return expired
+    except Exception:
+        conn.rollback()
+        raise
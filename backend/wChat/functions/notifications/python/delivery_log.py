@@ -0,0 +1,92 @@
+import json
+from functions.notifications.python.websocket_service import json_default
+
+# Days a frame stays replayable; clients that were away longer reload instead
+RETENTION_DAYS = 7
+
+def record(cur, messages):
+    """
+    Log (user_id, message) pairs under each recipient's next delivery sequence
+    numbers, in the caller's transaction. Returns the messages with 'seq' set,
+    in the order given. The sequence row stays locked until the caller commits,
+    so a user's frames become visible in sequence order.
+    """
+    if not messages:
+        return []
+
+    cur.execute("""
+        WITH incoming AS (
+            SELECT user_id, message, ord,
+                   row_number() OVER (PARTITION BY user_id ORDER BY ord) AS n,
+                   COUNT(*) OVER (PARTITION BY user_id) AS user_total
+            FROM unnest(%s::int[], %s::jsonb[]) WITH ORDINALITY AS e(user_id, message, ord)
+        ), sequenced AS (
+            INSERT INTO delivery_sequence AS s (user_id, last_seq)
+            SELECT user_id, COUNT(*)
+            FROM incoming
+            GROUP BY user_id
+            ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET last_seq = s.last_seq + EXCLUDED.last_seq
+            RETURNING user_id, last_seq
+        ), logged AS (
+            INSERT INTO delivery_log (user_id, seq, message)
+            SELECT i.user_id, s.last_seq - i.user_total + i.n, i.message
+            FROM incoming i
+            JOIN sequenced s ON s.user_id = i.user_id
+            RETURNING user_id, seq
+        )
+        SELECT i.ord, s.last_seq - i.user_total + i.n AS seq
+        FROM incoming i
+        JOIN sequenced s ON s.user_id = i.user_id
+        ORDER BY i.ord
+    """, (
+        [int(user_id) for user_id, _ in messages],
+        [json.dumps(message, default=json_default) for _, message in messages]
+    ))
+    seqs = [row['seq'] for row in cur.fetchall()]
+    return [dict(message, seq=seq) for (_, message), seq in zip(messages, seqs)]
+
+def replay(cur, user_id, after_seq, limit):
+    """
+    Frames logged for the user after after_seq, oldest first and at most limit.
+    Returns (messages, last_seq, resync); resync is True when frames the client
+    is missing have already expired, so it has to reload instead. An after_seq
+    of 0 is a client that has just started and loaded everything over REST; it
+    gets the current last_seq and nothing to replay.
+    """
+    cur.execute("""
+        SELECT COALESCE((SELECT last_seq FROM delivery_sequence WHERE user_id = %(user_id)s), 0) AS last_seq,
+               (SELECT MIN(seq) FROM delivery_log WHERE user_id = %(user_id)s) AS first_seq
+    """, {'user_id': user_id})
+    state = cur.fetchone()
+
+    if after_seq == 0 or after_seq == state['last_seq']:
+        return [], state['last_seq'], False
+    # A sequence ahead of the server's can only come from a stale client
+    if after_seq > state['last_seq'] or state['first_seq'] is None or after_seq < state['first_seq'] - 1:
+        return [], state['last_seq'], True
+
+    cur.execute("""
+        SELECT seq, message
+        FROM delivery_log
+        WHERE user_id = %s AND seq > %s
+        ORDER BY seq
+        LIMIT %s
+    """, (user_id, after_seq, limit))
+    messages = [dict(row['message'], seq=row['seq']) for row in cur.fetchall()]
+    return messages, state['last_seq'], False
+
+def expire(cur, batch_size):
+    # Delete one batch of frames past RETENTION_DAYS, oldest first; returns how many
+    cur.execute("""
+        DELETE FROM delivery_log
+        WHERE (user_id, seq) IN (
+            SELECT user_id, seq
+            FROM delivery_log
+            WHERE created_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+            ORDER BY created_at
+            LIMIT %s
+        )
+    """, (RETENTION_DAYS, batch_size))
+    return cur.rowcount
@@ -1,14 +1,67 @@
 import json
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime
+from functions.notifications.python import outbox, delivery_log
+from functions.notifications.python.websocket_service import department_channel
+
+# Wraps every notification insert so the recipients' counters are bumped in the
+# same statement, and returns the new rows so they can be pushed to the client.
+# A row at or below the user's read watermark already shows as read (its id
+# was drawn before a mark-all-read that committed first), so it isn't counted
+# as unread; the watermark is read from the locked, current counter row.
+COUNTED_INSERT = """
+    WITH created AS (
+        {insert}
+        RETURNING id, user_id, content, time_stamp, is_read
+    ), counted AS (
+        INSERT INTO notification_counter AS c (user_id, total_count, unread_count)
+        SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE is_read = false)
+        FROM created
+        GROUP BY user_id
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_count = c.total_count + EXCLUDED.total_count,
+            unread_count = c.unread_count + (
+                SELECT COUNT(*)
+                FROM created n
+                WHERE n.user_id = c.user_id AND n.is_read = false AND n.id > c.read_watermark
+            ),
+            updated_at = CURRENT_TIMESTAMP
+    )
+    SELECT * FROM created ORDER BY id
+"""
+
+# Broadcast kinds that are coalesced, with the summary shown once there is more than one
+SHIFT_AVAILABLE = 'shift_available'
+COALESCE_SUMMARIES = {
+    SHIFT_AVAILABLE: '{count} new shifts available in {department}',
+}
+COALESCE_WINDOW_MINUTES = 10
+
+def notification_frame(notification):
+    # The WebSocket frame for a new notification row, as pushed and as replayed
+    frame = {
+        'id': notification['id'],
+        'content': notification['content'],
+        'time_stamp': notification['time_stamp'],
+        'is_read': notification['is_read']
+    }
+    # A coalesced broadcast supersedes the earlier summary the client may be showing
+    if 'replaces' in notification:
+        frame['replaces'] = notification['replaces']
+    return {'type': 'notification', 'notification': frame}
 
 class NotificationService:
-    def __init__(self):
+    def __init__(self, cur=None):
         self.DB_HOST = os.environ['DB_HOST']
         self.DB_USER = os.environ['POSTGRES_USER']
         self.DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+        # With a cursor, notifications are written in the caller's transaction
+        # and the caller commits; without one each call uses its own connection
+        self.cur = cur
 
     def get_db_connection(self):
         return psycopg2.connect(
@@ -17,64 +70,220 @@ class NotificationService:
             password=self.DB_PASSWORD
         )
 
-    def create_notification(self, user_id, content):
-        # Create single notification
+    @contextmanager
+    def cursor(self):
+        if self.cur is not None:
+            yield self.cur
+            return
+
         conn = self.get_db_connection()
         try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    INSERT INTO notification (user_id, content, time_stamp)
-                    VALUES (%s, %s, CURRENT_TIMESTAMP)
-                    RETURNING id
-                """, (user_id, content))
-                notification_id = cur.fetchone()['id']
+                yield cur
                 conn.commit()
-                return notification_id
         finally:
             conn.close()
 
+    def queue_push(self, cur, notifications):
+        # Push the new rows to the users' live connections once this transaction commits;
+        # each is logged under its user's next delivery sequence number for replay
+        if notifications:
+            logged = delivery_log.record(cur, [(n['user_id'], notification_frame(n)) for n in notifications])
+            outbox.enqueue(cur, outbox.NOTIFICATION_PUSH, {
+                'notifications': [dict(n, seq=frame['seq']) for n, frame in zip(notifications, logged)]
+            })
+
+    def create_notification(self, user_id, content):
+        # Create single notification
+        with self.cursor() as cur:
+            cur.execute(COUNTED_INSERT.format(insert="""
+                INSERT INTO notification (user_id, content, time_stamp)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+            """), (user_id, content))
+            notification = cur.fetchone()
+            self.queue_push(cur, [notification])
+            return notification['id']
+
     def create_notifications_batch(self, notifications):
-        # Create multiple notifications
-        conn = self.get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.executemany("""
-                    INSERT INTO notification (user_id, content, time_stamp)
-                    VALUES (%s, %s, CURRENT_TIMESTAMP)
-                """, [(n['user_id'], n['content']) for n in notifications])
-                conn.commit()
-        finally:
-            conn.close()
+        # Create multiple notifications with a single multi-row insert
+        if not notifications:
+            return
+        with self.cursor() as cur:
+            created = execute_values(cur, COUNTED_INSERT.format(insert="""
+                INSERT INTO notification (user_id, content, time_stamp)
+                VALUES %s
+            """), [(n['user_id'], n['content']) for n in notifications],
+                template='(%s, %s, CURRENT_TIMESTAMP)', fetch=True)
+            self.queue_push(cur, created)
 
     def notify_managers(self, content):
         # Notify all managers
-        conn = self.get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor() as cur:
+            cur.execute(COUNTED_INSERT.format(insert="""
+                INSERT INTO notification (user_id, content, time_stamp)
+                SELECT id, %s, CURRENT_TIMESTAMP
+                FROM "user"
+                WHERE is_manager = true
+            """), (content,))
+            self.queue_push(cur, cur.fetchall())
+
+    def notify_department(self, department_id, content, kind=None, item_count=1):
+        """
+        Notify all users in a department with one broadcast row plus a delivery
+        marker per member. Broadcasts of a coalescing kind sent to the same
+        department within COALESCE_WINDOW_MINUTES are folded into a single
+        summary ("3 new shifts available in Kitchen") that is marked unread again.
+        item_count is how many items (e.g. shifts) this notification stands for.
+        """
+        with self.cursor() as cur:
+            replaces = None
+            broadcast = None
+            if kind in COALESCE_SUMMARIES:
                 cur.execute("""
-                    INSERT INTO notification (user_id, content, time_stamp)
-                    SELECT id, %s, CURRENT_TIMESTAMP
-                    FROM "user"
-                    WHERE is_manager = true
-                """, (content,))
-                conn.commit()
-        finally:
-            conn.close()
+                    SELECT b.id, b.item_count, d.name AS department_name
+                    FROM notification_broadcast b
+                    JOIN department d ON d.id = b.department_id
+                    WHERE b.department_id = %s AND b.kind = %s
+                    AND b.created_at > CURRENT_TIMESTAMP - make_interval(mins => %s)
+                    ORDER BY b.created_at DESC
+                    LIMIT 1
+                    FOR UPDATE OF b
+                """, (department_id, kind, COALESCE_WINDOW_MINUTES))
+                open_broadcast = cur.fetchone()
 
-    def notify_department(self, department_id, content):
-        # Notify all users in a department
-        conn = self.get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if open_broadcast:
+                    replaces = open_broadcast['id']
+                    summary = COALESCE_SUMMARIES[kind].format(
+                        count=open_broadcast['item_count'] + item_count,
+                        department=open_broadcast['department_name']
+                    )
+                    # A fresh id makes the summary sort (and sync) as a new notification
+                    cur.execute("""
+                        UPDATE notification_broadcast
+                        SET id = nextval('notification_id_seq'),
+                            item_count = item_count + %s,
+                            content = %s,
+                            time_stamp = CURRENT_TIMESTAMP
+                        WHERE id = %s
+                        RETURNING id, content, time_stamp
+                    """, (item_count, summary, replaces))
+                    broadcast = cur.fetchone()
+
+            if broadcast is None:
                 cur.execute("""
-                    INSERT INTO notification (user_id, content, time_stamp)
-                    SELECT user_id, %s, CURRENT_TIMESTAMP
+                    INSERT INTO notification_broadcast (department_id, kind, content, item_count)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id, content, time_stamp
+                """, (department_id, kind, content, item_count))
+                broadcast = cur.fetchone()
+
+            # New members get a delivery and members who already read a coalesced
+            # broadcast (directly or through their read watermark, which its old id
+            # may be under) see it as unread again; counters follow both
+            cur.execute("""
+                WITH previously_read AS (
+                    SELECT d.user_id
+                    FROM notification_delivery d
+                    LEFT JOIN notification_counter c ON c.user_id = d.user_id
+                    WHERE d.broadcast_id = %(broadcast_id)s
+                    AND (d.is_read = true OR %(replaces)s <= c.read_watermark)
+                ), delivered AS (
+                    INSERT INTO notification_delivery (broadcast_id, user_id)
+                    SELECT %(broadcast_id)s, user_id
                     FROM department_group
-                    WHERE department_id = %s
-                """, (content, department_id))
-                conn.commit()
-        finally:
-            conn.close()
+                    WHERE department_id = %(department_id)s
+                    ON CONFLICT (user_id, broadcast_id) DO UPDATE
+                    SET is_read = false
+                    RETURNING user_id, (xmax = 0) AS inserted
+                ), counted AS (
+                    INSERT INTO notification_counter AS c (user_id, total_count, unread_count)
+                    SELECT user_id, CASE WHEN inserted THEN 1 ELSE 0 END, 1
+                    FROM delivered
+                    WHERE inserted OR user_id IN (SELECT user_id FROM previously_read)
+                    ORDER BY user_id
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET total_count = c.total_count + EXCLUDED.total_count,
+                        unread_count = c.unread_count + EXCLUDED.unread_count,
+                        updated_at = CURRENT_TIMESTAMP
+                )
+                SELECT user_id FROM delivered
+            """, {'broadcast_id': broadcast['id'], 'department_id': department_id, 'replaces': replaces})
+
+            notifications = []
+            for row in cur.fetchall():
+                notification = dict(broadcast, user_id=row['user_id'], is_read=False)
+                if replaces is not None:
+                    notification['replaces'] = replaces
+                notifications.append(notification)
+            self.queue_push(cur, notifications)
+            return broadcast['id']
+
+    def notify_assigned_shifts(self, shifts):
+        # One notification per user for newly assigned shifts (rows with user_id,
+        # start_time, end_time), however many shifts they got
+        by_user = {}
+        for shift in shifts:
+            if shift['user_id']:
+                by_user.setdefault(shift['user_id'], []).append(shift)
+
+        notifications = []
+        for user_id, user_shifts in by_user.items():
+            if len(user_shifts) == 1:
+                shift = user_shifts[0]
+                content = (f"New shift assigned: {shift['start_time'].strftime('%B %d, %Y')} "
+                           f"from {shift['start_time'].strftime('%I:%M %p')} to {shift['end_time'].strftime('%I:%M %p')}")
+            else:
+                first = min(shift['start_time'] for shift in user_shifts)
+                last = max(shift['start_time'] for shift in user_shifts)
+                content = (f"{len(user_shifts)} new shifts assigned between "
+                           f"{first.strftime('%B %d')} and {last.strftime('%B %d, %Y')}")
+            notifications.append({'user_id': user_id, 'content': content})
+        self.create_notifications_batch(notifications)
+
+    def notify_open_shifts(self, shifts, departments=None):
+        # One shift_available broadcast per department for newly created open shifts
+        # (rows with id, department_id, start_time, end_time), however many there are.
+        # departments ({id: name}) saves the lookup when the caller already has it
+        by_department = {}
+        for shift in shifts:
+            by_department.setdefault(shift['department_id'], []).append(shift)
+        if not by_department:
+            return
+
+        if departments is None:
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT id, name
+                    FROM department
+                    WHERE id = ANY(%s)
+                """, (list(by_department),))
+                departments = {row['id']: row['name'] for row in cur.fetchall()}
+
+        for department_id, open_shifts in by_department.items():
+            if len(open_shifts) == 1:
+                shift = open_shifts[0]
+                content = (f"A new shift is available: {shift['start_time'].strftime('%B %d, %Y')} "
+                           f"from {shift['start_time'].strftime('%I:%M %p')} to {shift['end_time'].strftime('%I:%M %p')}")
+            else:
+                content = COALESCE_SUMMARIES[SHIFT_AVAILABLE].format(
+                    count=len(open_shifts), department=departments.get(department_id, 'your department'))
+            self.notify_department(department_id, content, SHIFT_AVAILABLE, item_count=len(open_shifts))
+
+def queue_schedule_updates(cur, shifts, action):
+    # Open schedule views refresh once per department: one schedule_update frame
+    # per department channel for the given shift rows, sent after commit
+    shift_ids = {}
+    for shift in shifts:
+        shift_ids.setdefault(shift['department_id'], []).append(shift['id'])
+    outbox.enqueue_many(cur, [(outbox.CHANNEL, {
+        'channel': department_channel(department_id),
+        'message': {
+            'type': 'schedule_update',
+            'department_id': department_id,
+            'shift_ids': ids,
+            'action': action
+        }
+    }) for department_id, ids in shift_ids.items()])
 
 def availability_change_template():
     # John Smith has updated their availability:
@@ -0,0 +1,35 @@
+import json
+from psycopg2.extras import execute_values
+from functions.notifications.python import delivery_log
+from functions.notifications.python.websocket_service import json_default
+
+# Event types understood by the outbox dispatcher
+NOTIFICATION = 'notification'
+NOTIFY_MANAGERS = 'notify_managers'
+NOTIFY_DEPARTMENT = 'notify_department'
+NOTIFICATION_PUSH = 'notification_push'
+WEBSOCKET = 'websocket'
+CHANNEL = 'channel'
+EMAIL = 'email'
+
+def enqueue(cur, event_type, payload):
+    # Written in the caller's transaction, so the side effect only happens if the caller commits
+    cur.execute("""
+        INSERT INTO outbox (event_type, payload)
+        VALUES (%s, %s)
+    """, (event_type, json.dumps(payload, default=json_default)))
+
+def enqueue_many(cur, events):
+    # events: [(event_type, payload)]
+    if not events:
+        return
+    execute_values(cur, """
+        INSERT INTO outbox (event_type, payload)
+        VALUES %s
+    """, [(event_type, json.dumps(payload, default=json_default)) for event_type, payload in events])
+
+def enqueue_websocket(cur, user_id, message):
+    # The frame is logged under the user's next delivery sequence number first, so
+    # a client that was offline when it went out can replay it on reconnect
+    message = delivery_log.record(cur, [(user_id, message)])[0]
+    enqueue(cur, WEBSOCKET, {'user_id': user_id, 'message': message})
@@ -0,0 +1,211 @@
+import json
+import os
+import boto3
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+
+# Upper bound on concurrent post_to_connection calls from one invocation
+MAX_PARALLEL_POSTS = 16
+
+# Channels a connection is subscribed to on $connect (see connection_channel)
+MANAGERS_CHANNEL = 'managers'
+
+def department_channel(department_id):
+    return f'department:{department_id}'
+
+# Live connections of many users, and the connections subscribed to many channels
+USERS_CONNECTIONS = """
+    SELECT user_id, connection_id, encoding
+    FROM connections
+    WHERE user_id = ANY(%s)
+"""
+CHANNELS_CONNECTIONS = """
+    SELECT cc.channel, cc.connection_id, c.encoding
+    FROM connection_channel cc
+    JOIN connections c ON c.connection_id = cc.connection_id
+    WHERE cc.channel = ANY(%s)
+"""
+
+# Frames for one connection that are sent together go out as a single 'batch'
+# frame, split below API Gateway's 128 KB frame limit
+FRAME_MAX_BYTES = 96 * 1024
+
+# Frame encodings a client can ask for on $connect. 'compact' renames keys to
+# the short forms below; clients expand them with the inverse map.
+JSON_ENCODING = 'json'
+COMPACT_ENCODING = 'compact'
+ENCODINGS = (JSON_ENCODING, COMPACT_ENCODING)
+COMPACT_KEYS = {
+    'type': 't',
+    'events': 'e',
+    'message': 'm',
+    'notification': 'n',
+    'id': 'i',
+    'seq': 'q',
+    'content': 'c',
+    'time_stamp': 'ts',
+    'timestamp': 'tm',
+    'is_read': 'r',
+    'replaces': 'rp',
+    'unread_count': 'u',
+    'sent_by_user_id': 'sb',
+    'received_by_user_id': 'rb',
+    'sender_first_name': 'sf',
+    'sender_last_name': 'sl',
+    'sender_id': 'si',
+    'reader_id': 'rd',
+    'message_id': 'mi',
+    'is_typing': 'ty',
+    'expires_in': 'x',
+    'channel': 'ch',
+    'department_id': 'd',
+    'shift_id': 'sh',
+    'action': 'a',
+    'last_seq': 'ls',
+    'resync': 'rs',
+    'complete': 'cp',
+}
+
+def json_default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj)} is not JSON serializable')
+
+def compact(value):
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(key, key): compact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+def encode(message, encoding=JSON_ENCODING):
+    # The bytes posted for a frame in the connection's encoding
+    if encoding == COMPACT_ENCODING:
+        message = compact(message)
+    return json.dumps(message, default=json_default, separators=(',', ':')).encode('utf-8')
+
+def batch_frames(messages, encoding=JSON_ENCODING):
+    """
+    Encode the messages for one connection as few frames as possible: a message
+    on its own is sent as is, several become {'type': 'batch', 'events': [...]}
+    frames of at most FRAME_MAX_BYTES. Returns [(data, [index into messages, ...])].
+    """
+    if len(messages) == 1:
+        return [(encode(messages[0], encoding), [0])]
+
+    frames = []
+    events = []
+    indexes = []
+    size = 0
+    for index, message in enumerate(messages):
+        data = encode(message, encoding)
+        if events and size + len(data) + 1 > FRAME_MAX_BYTES:
+            frames.append((encode({'type': 'batch', 'events': events}, encoding), indexes))
+            events, indexes, size = [], [], 0
+        events.append(message)
+        indexes.append(index)
+        size += len(data) + 1
+    frames.append((encode({'type': 'batch', 'events': events}, encoding), indexes))
+    return frames
+
+class WebSocketService:
+    def __init__(self, api_client=None):
+        # WebSocket route handlers pass the client for the API the event came from
+        self.endpoint_url = f"https://{os.environ.get('WEBSOCKET_API_DOMAIN')}/{os.environ.get('WEBSOCKET_API_STAGE')}"
+        self.api_client = api_client or boto3.client('apigatewaymanagementapi', endpoint_url=self.endpoint_url)
+
+    def get_connections(self, cur, user_ids):
+        # Live connections for many users with one query: {user_id: [(connection_id, encoding), ...]}
+        cur.execute(USERS_CONNECTIONS, (list(user_ids),))
+        connections = {}
+        for row in cur.fetchall():
+            connections.setdefault(row['user_id'], []).append((row['connection_id'], row['encoding']))
+        return connections
+
+    def get_channel_connections(self, cur, channels):
+        # Subscribed connections for many channels with one query: {channel: [(connection_id, encoding), ...]}
+        cur.execute(CHANNELS_CONNECTIONS, (list(channels),))
+        connections = {}
+        for row in cur.fetchall():
+            connections.setdefault(row['channel'], []).append((row['connection_id'], row['encoding']))
+        return connections
+
+    def post(self, connection_id, data):
+        # Posts an encoded frame; returns 'sent', 'gone' for a closed connection, or 'failed'
+        try:
+            self.api_client.post_to_connection(
+                ConnectionId=connection_id,
+                Data=data
+            )
+            return 'sent'
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'GoneException':
+                return 'gone'
+            print(f"Error sending message to connection {connection_id}: {str(e)}")
+            return 'failed'
+        except Exception as e:
+            print(f"Error sending message to connection {connection_id}: {str(e)}")
+            return 'failed'
+
+    def post_many(self, posts):
+        # posts: [(connection_id, data)], sent in parallel; returns one result per post
+        if not posts:
+            return []
+        if len(posts) == 1:
+            return [self.post(*posts[0])]
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_POSTS, len(posts))) as executor:
+            return list(executor.map(lambda post: self.post(*post), posts))
+
+    def remove_connections(self, cur, connection_ids):
+        if not connection_ids:
+            return
+        cur.execute("""
+            DELETE FROM connections
+            WHERE connection_id = ANY(%s)
+        """, (list(connection_ids),))
+
+    def send_to_users(self, cur, messages):
+        """
+        Deliver (user_id, message) pairs to every live connection of each user.
+        Stale connections are removed. Returns the indexes of messages that had
+        a failed (not gone) post, so the caller can retry them.
+        """
+        if not messages:
+            return set()
+
+        connections = self.get_connections(cur, {int(user_id) for user_id, _ in messages})
+        return self.deliver(cur, [(connections.get(int(user_id), []), message) for user_id, message in messages])
+
+    def send_to_channels(self, cur, messages):
+        # Deliver (channel, message) pairs to every connection subscribed to the
+        # channel, so fan-out follows the audience; same return value as send_to_users
+        if not messages:
+            return set()
+
+        connections = self.get_channel_connections(cur, {channel for channel, _ in messages})
+        return self.deliver(cur, [(connections.get(channel, []), message) for channel, message in messages])
+
+    def deliver(self, cur, targets):
+        # targets: [([(connection_id, encoding), ...], message)]. Everything bound for
+        # the same connection is posted together, so a burst costs one frame
+        by_connection = {}
+        for index, (connections, message) in enumerate(targets):
+            for connection_id, encoding in connections:
+                queued = by_connection.setdefault(connection_id, (encoding, [], []))
+                queued[1].append(message)
+                queued[2].append(index)
+
+        posts = []
+        owners = []
+        for connection_id, (encoding, messages, indexes) in by_connection.items():
+            for data, frame_indexes in batch_frames(messages, encoding):
+                posts.append((connection_id, data))
+                owners.append([indexes[i] for i in frame_indexes])
+
+        results = self.post_many(posts)
+
+        gone = {posts[i][0] for i, result in enumerate(results) if result == 'gone'}
+        self.remove_connections(cur, gone)
+
+        return {index for i, result in enumerate(results) if result == 'failed' for index in owners[i]}
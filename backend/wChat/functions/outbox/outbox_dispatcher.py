@@ -0,0 +1,282 @@
+import json
+import os
+import secrets
+import select
+import time
+import boto3
+import psycopg2
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import RealDictCursor
+from functions.notifications.python.notification_service import NotificationService, notification_frame
+from functions.notifications.python.websocket_service import WebSocketService
+from functions.notifications.python import outbox
+from functions._email.email_service import EmailTemplate
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Outbox rows claimed per transaction
+BATCH_SIZE = 200
+# Rows that keep failing are left in the table for inspection after this many tries
+MAX_ATTEMPTS = 5
+# Seconds to wait for a NOTIFY before polling again anyway
+IDLE_WAIT_SECONDS = 5
+# After a wake-up, let a burst of events land so frames for the same connection go out together
+BATCH_WINDOW_SECONDS = 0.05
+# Stop draining this long before the Lambda timeout
+TIME_MARGIN_MS = 10000
+# Upper bound on concurrent SES calls
+MAX_PARALLEL_EMAILS = 8
+# How long the set-password link in a welcome email stays valid
+WELCOME_LINK_HOURS = 72
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Runs on a one-minute schedule and keeps draining until just before its timeout,
+    # woken by the outbox NOTIFY trigger, so queued side effects go out within moments
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("LISTEN outbox")
+        conn.commit()
+
+        websocket_service = WebSocketService()
+        dispatched = 0
+        while True:
+            count = dispatch_batch(conn, websocket_service)
+            dispatched += count
+
+            if context is None or context.get_remaining_time_in_millis() < TIME_MARGIN_MS:
+                break
+            if count < BATCH_SIZE:
+                wait_for_events(conn)
+
+        return {'statusCode': 200, 'body': json.dumps({'dispatched': dispatched})}
+    except Exception as e:
+        print(f"Error in outbox dispatcher: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
+
+def wait_for_events(conn):
+    if select.select([conn], [], [], IDLE_WAIT_SECONDS) != ([], [], []):
+        time.sleep(BATCH_WINDOW_SECONDS)
+        conn.poll()
+        conn.notifies.clear()
+
+def dispatch_batch(conn, websocket_service):
+    """Claim a batch of outbox rows, perform their side effects and delete them"""
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id, event_type, payload, attempts
+                FROM outbox
+                WHERE available_at <= CURRENT_TIMESTAMP
+                AND attempts < %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (MAX_ATTEMPTS, BATCH_SIZE))
+            events = cur.fetchall()
+
+            if not events:
+                conn.commit()
+                return 0
+
+            by_type = {}
+            for event in events:
+                by_type.setdefault(event['event_type'], []).append(event)
+
+            failed = {}
+            for event_type, typed_events in by_type.items():
+                handler = EVENT_HANDLERS.get(event_type)
+                if handler is None:
+                    for event in typed_events:
+                        failed[event['id']] = f"Unknown event type: {event_type}"
+                    continue
+                try:
+                    failed.update(run_handler(cur, handler, typed_events, websocket_service))
+                except Exception as e:
+                    print(f"Error dispatching {event_type} events: {str(e)}")
+                    # Fall back to one event at a time so a single bad row doesn't hold back the rest
+                    for event in typed_events:
+                        try:
+                            failed.update(run_handler(cur, handler, [event], websocket_service))
+                        except Exception as e:
+                            failed[event['id']] = str(e)
+
+            done_ids = [event['id'] for event in events if event['id'] not in failed]
+            cur.execute("DELETE FROM outbox WHERE id = ANY(%s)", (done_ids,))
+
+            for event_id, error in failed.items():
+                # Exponential backoff: 2, 4, 8, ... seconds
+                cur.execute("""
+                    UPDATE outbox
+                    SET attempts = attempts + 1,
+                        available_at = CURRENT_TIMESTAMP + make_interval(secs => power(2, attempts + 1)),
+                        last_error = %s
+                    WHERE id = %s
+                """, (error, event_id))
+
+        conn.commit()
+        return len(events)
+    except Exception:
+        conn.rollback()
+        raise
+
+def run_handler(cur, handler, events, websocket_service):
+    # A savepoint lets a failed handler be undone without aborting the claimed batch
+    cur.execute("SAVEPOINT dispatch_events")
+    try:
+        failed = handler(cur, events, websocket_service)
+        cur.execute("RELEASE SAVEPOINT dispatch_events")
+        return failed
+    except Exception:
+        cur.execute("ROLLBACK TO SAVEPOINT dispatch_events")
+        raise
+
+def dispatch_notifications(cur, events, websocket_service):
+    # All single-user notifications in the batch become one multi-row insert
+    NotificationService(cur).create_notifications_batch([event['payload'] for event in events])
+    return {}
+
+def dispatch_manager_notifications(cur, events, websocket_service):
+    notification_service = NotificationService(cur)
+    for event in events:
+        notification_service.notify_managers(event['payload']['content'])
+    return {}
+
+def dispatch_department_notifications(cur, events, websocket_service):
+    notification_service = NotificationService(cur)
+    for event in events:
+        notification_service.notify_department(
+            event['payload']['department_id'], event['payload']['content'], event['payload'].get('kind')
+        )
+    return {}
+
+def dispatch_websocket_messages(cur, events, websocket_service):
+    failed_indexes = websocket_service.send_to_users(
+        cur, [(event['payload']['user_id'], event['payload']['message']) for event in events]
+    )
+    return {events[i]['id']: 'WebSocket post failed' for i in failed_indexes}
+
+def dispatch_channel_messages(cur, events, websocket_service):
+    failed_indexes = websocket_service.send_to_channels(
+        cur, [(event['payload']['channel'], event['payload']['message']) for event in events]
+    )
+    return {events[i]['id']: 'WebSocket post failed' for i in failed_indexes}
+
+def dispatch_notification_pushes(cur, events, websocket_service):
+    notifications = [n for event in events for n in event['payload']['notifications']]
+    user_ids = list({int(n['user_id']) for n in notifications})
+
+    # Unread counts are read at send time so every frame carries the current value
+    cur.execute("""
+        SELECT user_id, unread_count
+        FROM notification_counter
+        WHERE user_id = ANY(%s)
+    """, (user_ids,))
+    unread_counts = {row['user_id']: row['unread_count'] for row in cur.fetchall()}
+
+    messages = []
+    owners = []
+    for event in events:
+        for n in event['payload']['notifications']:
+            message = notification_frame(n)
+            message['unread_count'] = unread_counts.get(int(n['user_id']), 0)
+            # Pushes queued before delivery sequences existed carry no seq
+            if 'seq' in n:
+                message['seq'] = n['seq']
+            messages.append((n['user_id'], message))
+            owners.append(event['id'])
+
+    failed_indexes = websocket_service.send_to_users(cur, messages)
+    return {owners[i]: 'WebSocket post failed' for i in failed_indexes}
+
+def dispatch_emails(cur, events, websocket_service):
+    recipient_ids = list({int(event['payload']['recipient_id']) for event in events})
+    cur.execute("""
+        SELECT id, email
+        FROM "user"
+        WHERE id = ANY(%s)
+    """, (recipient_ids,))
+    recipients = {row['id']: row['email'] for row in cur.fetchall()}
+
+    failed = {}
+    emails = []
+    for event in events:
+        payload = event['payload']
+        email_address = recipients.get(int(payload['recipient_id']))
+        template_func = getattr(EmailTemplate, payload['template_type'], None)
+        if not email_address or not template_func:
+            failed[event['id']] = 'Unknown recipient or template type'
+            continue
+        template_data = payload['template_data']
+        if payload['template_type'] == 'new_user':
+            template_data = {
+                'user_name': template_data['user_name'],
+                'set_password_link': create_set_password_link(cur, int(payload['recipient_id']))
+            }
+        emails.append((event, email_address, template_func(**template_data)))
+
+    ses = boto3.client('ses', region_name=os.environ['MY_AWS_REGION'])
+
+    def send(email):
+        event, email_address, content = email
+        try:
+            ses.send_email(
+                Source=os.environ['SENDER_EMAIL'],
+                Destination={'ToAddresses': [email_address]},
+                Message={
+                    'Subject': {'Data': content['subject']},
+                    'Body': {'Text': {'Data': content['body']}}
+                }
+            )
+            return None
+        except ClientError as e:
+            print(f"SES Error: {str(e)}")
+            return str(e)
+
+    sent_notifications = []
+    if emails:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_EMAILS, len(emails))) as executor:
+            errors = list(executor.map(send, emails))
+        for (event, _, content), error in zip(emails, errors):
+            if error:
+                failed[event['id']] = error
+            else:
+                sent_notifications.append({
+                    'user_id': event['payload']['recipient_id'],
+                    'content': f"Email sent: {content['subject']}"
+                })
+
+    NotificationService(cur).create_notifications_batch(sent_notifications)
+    return failed
+
+def create_set_password_link(cur, user_id):
+    # A password reset token made at send time; a retried email gets a new one
+    token = secrets.token_urlsafe(32)
+    cur.execute("""
+        INSERT INTO password_reset_tokens (user_id, token, expires_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP + make_interval(hours => %s))
+    """, (user_id, token, WELCOME_LINK_HOURS))
+    return f"{os.environ['APP_URL'].rstrip('/')}/#/reset-password?token={token}"
+
+EVENT_HANDLERS = {
+    outbox.NOTIFICATION: dispatch_notifications,
+    outbox.NOTIFY_MANAGERS: dispatch_manager_notifications,
+    outbox.NOTIFY_DEPARTMENT: dispatch_department_notifications,
+    outbox.NOTIFICATION_PUSH: dispatch_notification_pushes,
+    outbox.WEBSOCKET: dispatch_websocket_messages,
+    outbox.CHANNEL: dispatch_channel_messages,
+    outbox.EMAIL: dispatch_emails,
+}
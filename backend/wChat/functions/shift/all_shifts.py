@@ -10,6 +10,35 @@ DB_HOST = os.environ['DB_HOST']
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 
+# One page of shifts and the total, both narrowed by shift_filters
+SHIFTS_PAGE = """
+    SELECT 
+        s.id,
+        s.start_time,
+        s.end_time,
+        s.scheduled_by_id,
+        s.department_id,
+        s.user_id,
+        s.status,
+        d.name as department_name,
+        u.first_name as user_first_name,
+        u.last_name as user_last_name,
+        sb.first_name as scheduled_by_first_name,
+        sb.last_name as scheduled_by_last_name
+    FROM shift s
+    LEFT JOIN department d ON s.department_id = d.id
+    LEFT JOIN "user" u ON s.user_id = u.id
+    LEFT JOIN "user" sb ON s.scheduled_by_id = sb.id
+    WHERE 1=1{filters}
+    ORDER BY s.start_time ASC
+    LIMIT %s OFFSET %s
+"""
+SHIFTS_COUNT = """
+    SELECT COUNT(*) as total
+    FROM shift s
+    WHERE 1=1{filters}
+"""
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -63,84 +92,13 @@ def get_shifts(cur, department_id=None, user_id=None, status=None,
     Get shifts with optional filtering
     """
     try:
-        # Base query
-        query = """
-            SELECT 
-                s.id,
-                s.start_time,
-                s.end_time,
-                s.scheduled_by_id,
-                s.department_id,
-                s.user_id,
-                s.status,
-                d.name as department_name,
-                u.first_name as user_first_name,
-                u.last_name as user_last_name,
-                sb.first_name as scheduled_by_first_name,
-                sb.last_name as scheduled_by_last_name
-            FROM shift s
-            LEFT JOIN department d ON s.department_id = d.id
-            LEFT JOIN "user" u ON s.user_id = u.id
-            LEFT JOIN "user" sb ON s.scheduled_by_id = sb.id
-            WHERE 1=1
-        """
-        
-        # Initialize parameters list
-        params = []
-        
-        # Add filters if provided
-        if department_id:
-            query += " AND s.department_id = %s"
-            params.append(department_id)
-            
-        if user_id:
-            query += " AND s.user_id = %s"
-            params.append(user_id)
-            
-        if status:
-            query += " AND s.status = %s"
-            params.append(status)
-            
-        if start_date:
-            query += " AND s.start_time >= %s"
-            params.append(start_date)
-            
-        if end_date:
-            query += " AND s.end_time <= %s"
-            params.append(end_date)
-            
-        # Add ordering
-        query += " ORDER BY s.start_time ASC"
-        
-        # Add pagination
-        query += " LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-        
-        # Execute query
-        cur.execute(query, params)
+        filters, params = shift_filters(department_id, user_id, status, start_date, end_date)
+
+        cur.execute(SHIFTS_PAGE.format(filters=filters), params + [limit, offset])
         shifts = cur.fetchall()
         
         # Get total count for pagination
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM shift s
-            WHERE 1=1
-        """
-        
-        # Add the same filters to count query
-        params = params[:-2]  # Remove limit and offset
-        if department_id:
-            count_query += " AND s.department_id = %s"
-        if user_id:
-            count_query += " AND s.user_id = %s"
-        if status:
-            count_query += " AND s.status = %s"
-        if start_date:
-            count_query += " AND s.start_time >= %s"
-        if end_date:
-            count_query += " AND s.end_time <= %s"
-            
-        cur.execute(count_query, params)
+        cur.execute(SHIFTS_COUNT.format(filters=filters), params)
         total_count = cur.fetchone()['total']
         
         return response(200, {
@@ -156,6 +114,33 @@ def get_shifts(cur, department_id=None, user_id=None, status=None,
         print(f"Error in get_shifts: {str(e)}")
         return response(500, {'error': str(e)})
 
+def shift_filters(department_id=None, user_id=None, status=None, start_date=None, end_date=None):
+    """ The WHERE conditions for the given filters and their parameters """
+    filters = ""
+    params = []
+    
+    if department_id:
+        filters += " AND s.department_id = %s"
+        params.append(department_id)
+        
+    if user_id:
+        filters += " AND s.user_id = %s"
+        params.append(user_id)
+        
+    if status:
+        filters += " AND s.status = %s"
+        params.append(status)
+        
+    if start_date:
+        filters += " AND s.start_time >= %s"
+        params.append(start_date)
+        
+    if end_date:
+        filters += " AND s.end_time <= %s"
+        params.append(end_date)
+    
+    return filters, params
+
 def response(status_code, body):
     return {
         'statusCode': status_code,
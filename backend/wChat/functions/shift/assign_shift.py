@@ -3,7 +3,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
-from functions.notifications.python.notification_service import NotificationService
+from functions.notifications.python.notification_service import NotificationService, queue_schedule_updates
 from datetime import datetime
 
 # Database connection parameters
@@ -74,6 +74,21 @@ def assign_user_to_shift(shift_id, user_id, cur):
         if not user:
             return response(404, {'error': 'User not found'})
 
+        # Check for schedule conflicts (one probe on the shift_user_no_overlap index)
+        cur.execute("""
+            SELECT id
+            FROM shift
+            WHERE user_id = %s
+            AND status IN ('scheduled', 'available_for_exchange')
+            AND period && tstzrange(%s, %s, '[)')
+            AND id <> %s
+            LIMIT 1
+        """, (user_id, shift['start_time'], shift['end_time'], shift_id))
+        conflict = cur.fetchone()
+
+        if conflict:
+            return response(409, {'error': 'Schedule conflict detected', 'conflicting_shift_id': conflict['id']})
+
         # Initialize notification service
         notification_service = NotificationService()
         
@@ -94,7 +109,7 @@ def assign_user_to_shift(shift_id, user_id, cur):
             SET user_id = %s,
                 status = 'scheduled'
             WHERE id = %s
-            RETURNING id, user_id
+            RETURNING id, user_id, department_id
         """, (user_id, shift_id))
         
         updated_shift = cur.fetchone()
@@ -121,6 +136,7 @@ def assign_user_to_shift(shift_id, user_id, cur):
             for manager in managers:
                 notification_service.create_notification(manager['id'], manager_notification)
             
+            queue_schedule_updates(cur, [updated_shift], 'updated')
             cur.connection.commit()
             return response(200, {
                 'message': 'User assigned to shift successfully', 
@@ -130,6 +146,9 @@ def assign_user_to_shift(shift_id, user_id, cur):
         else:
             return response(500, {'error': 'Failed to assign user to shift'})
             
+    except psycopg2.errors.ExclusionViolation:
+        cur.connection.rollback()
+        return response(409, {'error': 'Schedule conflict detected'})
     except Exception as e:
         cur.connection.rollback()
         return response(500, {'error': str(e)})
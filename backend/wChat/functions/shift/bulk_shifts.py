@@ -0,0 +1,176 @@
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+from functions.auth_layer.auth import authenticate
+from functions.notifications.python.notification_service import NotificationService, queue_schedule_updates
+from datetime import datetime, date
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Largest request accepted; a department's month of shifts fits comfortably
+MAX_SHIFTS = 500
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+# Custom JSON encoder to handle datetime objects
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return super(DateTimeEncoder, self).default(obj)
+
+def lambda_handler(event, context):
+    if event['httpMethod'] == 'OPTIONS':
+        return response(200, 'OK')
+
+    if event['httpMethod'] != 'POST':
+        return response(405, {'error': 'Method not allowed'})
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            return create_shifts(event, cur)
+    finally:
+        conn.close()
+
+@authenticate
+def create_shifts(event, cur):
+    """
+    Create many shifts in one request: {"scheduled_by_id": 1, "shifts": [{"start_time",
+    "end_time", "department_id", "user_id"?, "status"?, "scheduled_by_id"?}, ...]}.
+    Either every shift is created or none is. Assigned users get one notification
+    for all their new shifts and each department one summary for its open shifts.
+    """
+    try:
+        body = json.loads(event['body'])
+    except (TypeError, json.JSONDecodeError):
+        return response(400, {'error': 'Invalid JSON in request body'})
+
+    shifts = body.get('shifts')
+    if not isinstance(shifts, list) or not shifts:
+        return response(400, {'error': 'shifts must be a non-empty list'})
+    if len(shifts) > MAX_SHIFTS:
+        return response(400, {'error': f'At most {MAX_SHIFTS} shifts can be created at once'})
+
+    rows, errors = parse_shifts(shifts, body.get('scheduled_by_id'))
+    if errors:
+        return response(400, {'error': 'Invalid shifts', 'details': errors})
+
+    try:
+        # Department names and user ids are resolved once for the whole request
+        cur.execute("""
+            SELECT id, name
+            FROM department
+            WHERE id = ANY(%s)
+        """, (list({row['department_id'] for row in rows}),))
+        departments = {row['id']: row['name'] for row in cur.fetchall()}
+
+        user_ids = list({row[field] for row in rows for field in ('user_id', 'scheduled_by_id') if row[field]})
+        cur.execute("""
+            SELECT id
+            FROM "user"
+            WHERE id = ANY(%s)
+        """, (user_ids,))
+        users = {row['id'] for row in cur.fetchall()}
+
+        errors = []
+        for index, row in enumerate(rows):
+            if row['department_id'] not in departments:
+                errors.append({'index': index, 'error': 'Department not found'})
+            for field in ('user_id', 'scheduled_by_id'):
+                if row[field] and row[field] not in users:
+                    errors.append({'index': index, 'error': f'{field} not found'})
+        if errors:
+            return response(400, {'error': 'Invalid shifts', 'details': errors})
+
+        created = execute_values(cur, """
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+            VALUES %s
+            RETURNING id, start_time, end_time, department_id, user_id
+        """, [(row['start_time'], row['end_time'], row['scheduled_by_id'], row['department_id'],
+               row['user_id'], row['status']) for row in rows], page_size=MAX_SHIFTS, fetch=True)
+
+        queue_notifications(cur, created, departments)
+
+        cur.connection.commit()
+        return response(201, {'ids': [shift['id'] for shift in created], 'created': len(created)})
+
+    except psycopg2.errors.ExclusionViolation as e:
+        # Two of the shifts, or one of them and an existing shift, overlap for a user
+        cur.connection.rollback()
+        return response(409, {'error': 'Schedule conflict detected', 'details': e.diag.message_detail})
+    except psycopg2.Error as e:
+        cur.connection.rollback()
+        return response(400, {'error': str(e)})
+
+def parse_shifts(shifts, default_scheduled_by_id):
+    """Check every shift before touching the database; returns (rows, errors)"""
+    rows = []
+    errors = []
+    for index, shift in enumerate(shifts):
+        if not isinstance(shift, dict):
+            errors.append({'index': index, 'error': 'Shift must be an object'})
+            continue
+
+        missing = [field for field in ('start_time', 'end_time', 'department_id') if field not in shift]
+        scheduled_by_id = shift.get('scheduled_by_id', default_scheduled_by_id)
+        if scheduled_by_id is None:
+            missing.append('scheduled_by_id')
+        if missing:
+            errors.append({'index': index, 'error': f"Missing required fields: {', '.join(missing)}"})
+            continue
+
+        try:
+            start_time = datetime.fromisoformat(shift['start_time'])
+            end_time = datetime.fromisoformat(shift['end_time'])
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'start_time and end_time must be ISO 8601 timestamps'})
+            continue
+        if end_time <= start_time:
+            errors.append({'index': index, 'error': 'end_time must be after start_time'})
+            continue
+
+        try:
+            rows.append({
+                'start_time': start_time,
+                'end_time': end_time,
+                'scheduled_by_id': int(scheduled_by_id),
+                'department_id': int(shift['department_id']),
+                'user_id': int(shift['user_id']) if shift.get('user_id') else None,
+                'status': shift.get('status', 'scheduled')
+            })
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Ids must be integers'})
+    return rows, errors
+
+def queue_notifications(cur, created, departments):
+    notification_service = NotificationService(cur)
+
+    # One notification per assigned user, however many shifts they got
+    notification_service.notify_assigned_shifts(created)
+
+    # One (coalescing) broadcast per department with open shifts
+    notification_service.notify_open_shifts([shift for shift in created if not shift['user_id']], departments)
+
+    queue_schedule_updates(cur, created, 'created')
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            "Access-Control-Allow-Methods": "OPTIONS,POST"
+        },
+        'body': json.dumps(body, cls=DateTimeEncoder)
+    }
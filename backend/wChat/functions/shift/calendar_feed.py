@@ -0,0 +1,238 @@
+import hashlib
+import io
+import json
+import os
+import secrets
+import jwt
+import psycopg2
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from psycopg2.extras import RealDictCursor
+from functions.auth_layer.auth import authenticate
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+JWT_SECRET = os.environ['JWT_SECRET']
+
+# The feed covers shifts starting from FEED_PAST_DAYS ago up to FEED_FUTURE_DAYS ahead
+FEED_PAST_DAYS = 60
+FEED_FUTURE_DAYS = 365
+# Rows fetched per round trip from the server-side cursor
+FEED_FETCH_SIZE = 500
+
+# The user_shifts query over the feed window
+FEED_SHIFTS = """
+    SELECT s.id, s.start_time, s.end_time, s.status,
+           d.name as department_name
+    FROM shift s
+    LEFT JOIN department d ON s.department_id = d.id
+    WHERE s.user_id = %s
+    AND s.start_time >= %s AND s.start_time < %s
+    ORDER BY s.start_time, s.id
+"""
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def get_user_id_from_token(event):
+    try:
+        # Extract the JWT token from the Authorization header
+        auth_header = event['headers'].get('Authorization')
+        if not auth_header:
+            raise Exception('No Authorization header found')
+
+        # Remove 'Bearer ' prefix if present
+        token = auth_header.replace('Bearer ', '')
+
+        # Decode the JWT token
+        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+
+        # Return the user ID from the token
+        user_id = decoded_token.get('user_id')
+        if user_id is None:
+            raise Exception('No user_id found in token')
+
+        return user_id
+    except Exception as e:
+        print(f"Error extracting user ID from token: {str(e)}")
+        raise Exception('Invalid or expired token')
+
+def lambda_handler(event, context):
+    # Handle preflight OPTIONS request
+    if event['httpMethod'] == 'OPTIONS':
+        return response(200, 'OK')
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            path_params = event.get('pathParameters') or {}
+            http_method = event['httpMethod']
+
+            if 'token' in path_params:
+                if http_method == 'GET':
+                    # The feed token is the credential; calendar apps send no other
+                    return get_calendar_feed(event, cur)
+            elif http_method == 'POST':
+                return issue_feed_token(event, cur)
+            elif http_method == 'DELETE':
+                return revoke_feed_token(event, cur)
+            return response(405, {'error': 'Method not allowed'})
+    finally:
+        conn.close()
+
+@authenticate
+def issue_feed_token(event, cur):
+    """
+    Creates the user's calendar feed, or replaces its token so the old feed URL
+    stops working. Returns the token and the feed's path.
+    """
+    user_id = event['pathParameters']['id']
+    if str(get_user_id_from_token(event)) != str(user_id):
+        return response(403, {'error': 'Users can only manage their own calendar feed'})
+
+    token = secrets.token_urlsafe(32)
+    cur.execute("""
+        INSERT INTO calendar_feed (user_id, token)
+        VALUES (%s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+        SET token = EXCLUDED.token,
+            shifts_changed_at = CURRENT_TIMESTAMP,
+            created_at = CURRENT_TIMESTAMP
+    """, (user_id, token))
+    cur.connection.commit()
+
+    return response(201, {'token': token, 'path': f'/calendar/{token}.ics'})
+
+@authenticate
+def revoke_feed_token(event, cur):
+    user_id = event['pathParameters']['id']
+    if str(get_user_id_from_token(event)) != str(user_id):
+        return response(403, {'error': 'Users can only manage their own calendar feed'})
+
+    cur.execute("DELETE FROM calendar_feed WHERE user_id = %s", (user_id,))
+    cur.connection.commit()
+
+    return response(200, {'message': 'Calendar feed revoked'})
+
+def get_calendar_feed(event, cur):
+    token = event['pathParameters']['token']
+    if token.endswith('.ics'):
+        token = token[:-len('.ics')]
+
+    cur.execute("""
+        SELECT user_id, shifts_changed_at
+        FROM calendar_feed
+        WHERE token = %s
+    """, (token,))
+    feed = cur.fetchone()
+
+    if not feed:
+        return response(404, {'error': 'Calendar feed not found'})
+
+    # The window moves once a day, which changes the feed as well
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    window_start = today - timedelta(days=FEED_PAST_DAYS)
+    window_end = today + timedelta(days=FEED_FUTURE_DAYS)
+    last_modified = max(feed['shifts_changed_at'], today).replace(microsecond=0)
+    version = f"{feed['user_id']}:{feed['shifts_changed_at'].isoformat()}:{today.date().isoformat()}"
+    etag = f'"{hashlib.md5(version.encode()).hexdigest()}"'
+
+    if not_modified(event, etag, last_modified):
+        return feed_response(304, '', etag, last_modified)
+
+    out = io.StringIO()
+    # A named cursor keeps the rows on the server and hands them over in batches
+    with cur.connection.cursor(name='calendar_feed', cursor_factory=RealDictCursor) as shifts:
+        shifts.itersize = FEED_FETCH_SIZE
+        shifts.execute(FEED_SHIFTS, (feed['user_id'], window_start, window_end))
+        write_calendar(out, shifts, last_modified)
+
+    return feed_response(200, out.getvalue(), etag, last_modified)
+
+def write_calendar(out, shifts, stamp):
+    """ Writes an iCalendar (RFC 5545) document with one event per shift """
+    write_line(out, 'BEGIN:VCALENDAR')
+    write_line(out, 'VERSION:2.0')
+    write_line(out, 'PRODID:-//WorkChat//Shifts//EN')
+    write_line(out, 'CALSCALE:GREGORIAN')
+    write_line(out, 'METHOD:PUBLISH')
+    write_line(out, 'X-WR-CALNAME:WorkChat shifts')
+    for shift in shifts:
+        write_line(out, 'BEGIN:VEVENT')
+        write_line(out, f"UID:shift-{shift['id']}@wchat")
+        write_line(out, f'DTSTAMP:{ical_time(stamp)}')
+        write_line(out, f"DTSTART:{ical_time(shift['start_time'])}")
+        write_line(out, f"DTEND:{ical_time(shift['end_time'])}")
+        summary = f"Shift: {shift['department_name']}" if shift['department_name'] else 'Shift'
+        write_line(out, f'SUMMARY:{ical_text(summary)}')
+        write_line(out, f"STATUS:{'CANCELLED' if shift['status'] == 'cancelled' else 'CONFIRMED'}")
+        write_line(out, 'END:VEVENT')
+    write_line(out, 'END:VCALENDAR')
+
+def write_line(out, line):
+    # Content lines are folded at 75 octets; continuation lines start with a space
+    encoded = line.encode('utf-8')
+    limit = 75
+    while len(encoded) > limit:
+        cut = limit
+        # Never split a multi-byte character
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        out.write(encoded[:cut].decode('utf-8') + '\r\n ')
+        encoded = encoded[cut:]
+        limit = 74
+    out.write(encoded.decode('utf-8') + '\r\n')
+
+def ical_time(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+def ical_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def not_modified(event, etag, last_modified):
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def feed_response(status_code, body, etag, last_modified):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'text/calendar; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'ETag': etag,
+            'Last-Modified': format_datetime(last_modified, usegmt=True),
+            # Cached copies must be revalidated, which is cheap with the validators
+            'Cache-Control': 'private, no-cache'
+        },
+        'body': body
+    }
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            "Access-Control-Allow-Methods": "OPTIONS,GET,POST,DELETE"
+        },
+        'body': json.dumps(body)
+    }
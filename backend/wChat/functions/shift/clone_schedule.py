@@ -0,0 +1,207 @@
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from functions.auth_layer.auth import authenticate
+from functions.notifications.python.notification_service import NotificationService, queue_schedule_updates
+from datetime import datetime, date, timedelta
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Longest source range one request may copy
+MAX_CLONE_DAYS = 31
+
+# Copies a department's shifts in [start_date, end_date] (local dates) forward or
+# back by a number of days in one statement. Wall-clock times are kept across DST
+# changes. A copied assignment is kept only if the user has no approved time off
+# that day, no other shift at that time and, where they recorded availability
+# for that weekday, is available for the whole shift; otherwise the copy is
+# created as an open shift and the conflict reported. Cancelled and completed
+# shifts aren't copied, nor shifts already copied to the same start, so repeating
+# a clone creates nothing. New ids are drawn up front so each copy can be matched
+# with its source and conflict.
+CLONE_SHIFTS = """
+    WITH source AS (
+        SELECT s.id AS source_id, s.department_id, s.role_id, s.user_id,
+               ((s.start_time AT TIME ZONE %(time_zone)s) + make_interval(days => %(days)s)) AT TIME ZONE %(time_zone)s AS start_time,
+               ((s.end_time AT TIME ZONE %(time_zone)s) + make_interval(days => %(days)s)) AT TIME ZONE %(time_zone)s AS end_time
+        FROM shift s
+        WHERE s.department_id = %(department_id)s
+        AND s.status NOT IN ('cancelled', 'completed')
+        AND s.start_time >= %(start_date)s::timestamp AT TIME ZONE %(time_zone)s
+        AND s.start_time < (%(end_date)s::date + 1)::timestamp AT TIME ZONE %(time_zone)s
+    ), local AS (
+        SELECT source.*,
+               start_time AT TIME ZONE %(time_zone)s AS local_start,
+               end_time AT TIME ZONE %(time_zone)s AS local_end
+        FROM source
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM shift copy
+            WHERE copy.cloned_from_id = source.source_id AND copy.start_time = source.start_time
+        )
+    ), checked AS (
+        SELECT nextval(pg_get_serial_sequence('shift', 'id')) AS id, l.source_id, l.department_id,
+               l.role_id, l.user_id, l.start_time, l.end_time,
+               CASE
+                   WHEN l.user_id IS NULL THEN NULL
+                   WHEN EXISTS (
+                       SELECT 1
+                       FROM time_off_request t
+                       WHERE t.user_id = l.user_id AND t.status = 'approved'
+                       AND t.start_date <= l.local_end::date AND t.end_date >= l.local_start::date
+                   ) THEN 'time_off'
+                   WHEN EXISTS (
+                       SELECT 1
+                       FROM shift other
+                       WHERE other.user_id = l.user_id
+                       AND other.status IN ('scheduled', 'available_for_exchange')
+                       AND other.period && tstzrange(l.start_time, l.end_time, '[)')
+                   ) THEN 'already_scheduled'
+                   WHEN EXISTS (
+                       SELECT 1
+                       FROM availability a
+                       WHERE a.user_id = l.user_id AND a.day = EXTRACT(DOW FROM l.local_start)
+                   ) AND NOT EXISTS (
+                       SELECT 1
+                       FROM availability a
+                       WHERE a.user_id = l.user_id AND a.day = EXTRACT(DOW FROM l.local_start)
+                       AND a.is_available
+                       AND a.start_time <= l.local_start::time
+                       AND a.end_time >= CASE WHEN l.local_end::date > l.local_start::date
+                                              THEN time '23:59' ELSE l.local_end::time END
+                   ) THEN 'unavailable'
+               END AS conflict
+        FROM local l
+    ), created AS (
+        INSERT INTO shift (id, start_time, end_time, scheduled_by_id, department_id, role_id, user_id, status, cloned_from_id)
+        SELECT id, start_time, end_time, %(scheduled_by_id)s, department_id, role_id,
+               CASE WHEN conflict IS NULL THEN user_id END, 'scheduled', source_id
+        FROM checked
+        ON CONFLICT (cloned_from_id, start_time) WHERE cloned_from_id IS NOT NULL DO NOTHING
+        RETURNING id
+    )
+    SELECT c.id, c.source_id, c.department_id, c.start_time, c.end_time,
+           CASE WHEN c.conflict IS NULL THEN c.user_id END AS user_id,
+           c.user_id AS source_user_id, c.conflict
+    FROM checked c
+    JOIN created USING (id)
+    ORDER BY c.start_time, c.id
+"""
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+# Custom JSON encoder to handle datetime objects
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return super(DateTimeEncoder, self).default(obj)
+
+def lambda_handler(event, context):
+    if event['httpMethod'] == 'OPTIONS':
+        return response(200, 'OK')
+
+    if event['httpMethod'] != 'POST':
+        return response(405, {'error': 'Method not allowed'})
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            return clone_schedule(event, cur)
+    finally:
+        conn.close()
+
+@authenticate
+def clone_schedule(event, cur):
+    """
+    Copy a department's schedule: {"department_id", "start_date", "end_date",
+    "days"? (default 7), "scheduled_by_id", "time_zone"? (default UTC)}. Every
+    shift starting in the range that isn't cancelled, completed or already
+    copied there is copied; assignments that conflict with the user's time off,
+    availability or other shifts are left open and listed under "skipped".
+    """
+    try:
+        body = json.loads(event['body'])
+    except (TypeError, json.JSONDecodeError):
+        return response(400, {'error': 'Invalid JSON in request body'})
+
+    required_fields = ['department_id', 'start_date', 'end_date', 'scheduled_by_id']
+    if not all(field in body for field in required_fields):
+        return response(400, {'error': 'Missing required fields'})
+
+    try:
+        start_date = date.fromisoformat(body['start_date'])
+        end_date = date.fromisoformat(body['end_date'])
+        days = int(body.get('days', 7))
+    except (TypeError, ValueError):
+        return response(400, {'error': 'Dates must be YYYY-MM-DD and days an integer'})
+
+    if end_date < start_date or end_date - start_date >= timedelta(days=MAX_CLONE_DAYS):
+        return response(400, {'error': f'The date range must run forwards and span at most {MAX_CLONE_DAYS} days'})
+    if days == 0:
+        return response(400, {'error': 'days must not be 0'})
+
+    time_zone = body.get('time_zone', 'UTC')
+    cur.execute("SELECT 1 FROM pg_timezone_names WHERE name = %s", (time_zone,))
+    if not cur.fetchone():
+        return response(400, {'error': f'Unknown time zone: {time_zone}'})
+
+    try:
+        cur.execute(CLONE_SHIFTS, {
+            'department_id': body['department_id'],
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': days,
+            'time_zone': time_zone,
+            'scheduled_by_id': body['scheduled_by_id']
+        })
+        created = cur.fetchall()
+
+        notification_service = NotificationService(cur)
+        notification_service.notify_assigned_shifts(created)
+        notification_service.notify_open_shifts([shift for shift in created if not shift['user_id']])
+        queue_schedule_updates(cur, created, 'created')
+
+        cur.connection.commit()
+
+        skipped = [{
+            'shift_id': shift['id'],
+            'source_shift_id': shift['source_id'],
+            'user_id': shift['source_user_id'],
+            'start_time': shift['start_time'],
+            'reason': shift['conflict']
+        } for shift in created if shift['conflict']]
+        return response(201, {
+            'created': len(created),
+            'ids': [shift['id'] for shift in created],
+            'skipped': skipped
+        })
+
+    except psycopg2.errors.ExclusionViolation as e:
+        # Two copies for the same user overlap (e.g. across a DST change)
+        cur.connection.rollback()
+        return response(409, {'error': 'Schedule conflict detected', 'details': e.diag.message_detail})
+    except psycopg2.Error as e:
+        cur.connection.rollback()
+        return response(400, {'error': str(e)})
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            "Access-Control-Allow-Methods": "OPTIONS,POST"
+        },
+        'body': json.dumps(body, cls=DateTimeEncoder)
+    }
@@ -1,58 +1,152 @@
 import json
 import os
+import jwt
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from functions.auth_layer.auth import authenticate
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
-
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+JWT_SECRET = os.environ['JWT_SECRET']
+
+# The open-shift board for one department, built as a JSON document in a single
+# query. Only members of the department and managers see it. The shift filter
+# repeats the idx_shift_open predicate so the board is read off that index.
+OPEN_SHIFT_BOARD = """
+    SELECT access.allowed, board.document, md5(board.document) AS etag
+    FROM department d
+    CROSS JOIN LATERAL (
+        SELECT EXISTS (
+            SELECT 1
+            FROM department_group
+            WHERE department_id = d.id AND user_id = %(user_id)s
+        ) OR EXISTS (
+            SELECT 1
+            FROM "user"
+            WHERE id = %(user_id)s AND is_manager = true
+        ) AS allowed
+    ) access
+    CROSS JOIN LATERAL (
+        SELECT jsonb_build_object(
+            'department_id', d.id,
+            'department_name', d.name,
+            'shifts', COALESCE(jsonb_agg(jsonb_build_object(
+                'id', s.id,
+                'start_time', s.start_time,
+                'end_time', s.end_time,
+                'role', r.name,
+                'offered_by', u.first_name || ' ' || u.last_name
+            ) ORDER BY s.start_time, s.id) FILTER (WHERE s.id IS NOT NULL), '[]'::jsonb)
+        )::text AS document
+        FROM (
+            SELECT id, start_time, end_time, role_id, user_id
+            FROM shift
+            WHERE department_id = d.id
+            AND (status = 'available_for_exchange' OR user_id IS NULL)
+            AND start_time > CURRENT_TIMESTAMP
+            AND status NOT IN ('completed', 'cancelled')
+            AND access.allowed
+        ) s
+        LEFT JOIN role r ON r.id = s.role_id
+        LEFT JOIN "user" u ON u.id = s.user_id
+    ) board
+    WHERE d.id = %(department_id)s
+"""
 
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
-        # database=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD
     )
 
+def get_user_id_from_token(event):
+    try:
+        # Extract the JWT token from the Authorization header
+        auth_header = event['headers'].get('Authorization')
+        if not auth_header:
+            raise Exception('No Authorization header found')
+
+        # Remove 'Bearer ' prefix if present
+        token = auth_header.replace('Bearer ', '')
+
+        # Decode the JWT token
+        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+
+        # Return the user ID from the token
+        user_id = decoded_token.get('user_id')
+        if user_id is None:
+            raise Exception('No user_id found in token')
+
+        return user_id
+    except Exception as e:
+        print(f"Error extracting user ID from token: {str(e)}")
+        raise Exception('Invalid or expired token')
+
 def lambda_handler(event, context):
     # Handle preflight OPTIONS request
     if event['httpMethod'] == 'OPTIONS':
         return response(200, 'OK')
 
+    if event['httpMethod'] != 'GET':
+        return response(405, {'error': 'Method not allowed'})
+
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            http_method = event['httpMethod']
-            
-            if http_method == 'GET':
-                return get_available_department_shifts(event, cur)
+            return get_open_shift_board(event, cur)
     finally:
         conn.close()
 
-def get_available_department_shifts(event, cur):
+@authenticate
+def get_open_shift_board(event, cur):
+    """
+    Upcoming open shifts (unassigned or offered for exchange) of one department:
+    {"department_id", "department_name", "shifts": [{"id", "start_time", "end_time",
+    "role", "offered_by"}]}. The ETag changes whenever the board does, so clients
+    send If-None-Match and get 304 while nothing has changed.
+    """
     department_id = event['pathParameters']['id']
-    cur.execute("""
-        SELECT s.id, s.start_time, s.end_time, s.status, u.name as scheduled_by
-        FROM shift s
-        LEFT JOIN users u ON s.scheduled_by = u.id
-        WHERE s.department_id = %s
-    """, (department_id))
-    shifts = cur.fetchall()
-    
-    return response(200, shifts)
-
-
-def response(status_code, body):
+    user_id = get_user_id_from_token(event)
+
+    cur.execute(OPEN_SHIFT_BOARD, {'department_id': department_id, 'user_id': user_id})
+    board = cur.fetchone()
+
+    if not board:
+        return response(404, {'error': 'Department not found'})
+    if not board['allowed']:
+        return response(403, {'error': 'User not authorized for this department'})
+
+    etag = f'"{board["etag"]}"'
+    if etag_matches(event, etag):
+        return response(304, None, etag)
+    # The board document is already JSON
+    return response(200, None, etag, encoded_body=board['document'])
+
+def etag_matches(event, etag):
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if_none_match = headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]
+
+def response(status_code, body, etag=None, encoded_body=None):
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag',
+        "Access-Control-Allow-Methods": "OPTIONS,GET"
+    }
+    if etag:
+        # Cached copies must be revalidated, which is cheap with the ETag
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'private, no-cache'
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-            "Access-Control-Allow-Methods": "OPTIONS,POST,GET,PUT,DELETE"
-        },
-        'body': json.dumps(body)
-    }
\ No newline at end of file
+        'headers': headers,
+        'body': encoded_body if encoded_body is not None else ('' if body is None else json.dumps(body))
+    }
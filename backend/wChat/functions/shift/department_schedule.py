@@ -0,0 +1,150 @@
+import json
+import os
+import jwt
+import psycopg2
+from datetime import date, datetime, timedelta, timezone
+from psycopg2.extras import RealDictCursor
+from functions.auth_layer.auth import authenticate
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+JWT_SECRET = os.environ['JWT_SECRET']
+
+# The access check and the stored week document in one lookup. Only members of
+# the department and managers see it.
+DEPARTMENT_WEEK_SCHEDULE = """
+    SELECT access.allowed, w.document, w.etag
+    FROM department d
+    CROSS JOIN LATERAL (
+        SELECT EXISTS (
+            SELECT 1
+            FROM department_group
+            WHERE department_id = d.id AND user_id = %(user_id)s
+        ) OR EXISTS (
+            SELECT 1
+            FROM "user"
+            WHERE id = %(user_id)s AND is_manager = true
+        ) AS allowed
+    ) access
+    LEFT JOIN department_week_schedule w
+        ON w.department_id = d.id AND w.week_start = %(week_start)s AND access.allowed
+    WHERE d.id = %(department_id)s
+"""
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def get_user_id_from_token(event):
+    try:
+        # Extract the JWT token from the Authorization header
+        auth_header = event['headers'].get('Authorization')
+        if not auth_header:
+            raise Exception('No Authorization header found')
+
+        # Remove 'Bearer ' prefix if present
+        token = auth_header.replace('Bearer ', '')
+
+        # Decode the JWT token
+        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+
+        # Return the user ID from the token
+        user_id = decoded_token.get('user_id')
+        if user_id is None:
+            raise Exception('No user_id found in token')
+
+        return user_id
+    except Exception as e:
+        print(f"Error extracting user ID from token: {str(e)}")
+        raise Exception('Invalid or expired token')
+
+def lambda_handler(event, context):
+    # Handle preflight OPTIONS request
+    if event['httpMethod'] == 'OPTIONS':
+        return response(200, 'OK')
+
+    if event['httpMethod'] != 'GET':
+        return response(405, {'error': 'Method not allowed'})
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            return get_department_week_schedule(event, cur)
+    finally:
+        conn.close()
+
+@authenticate
+def get_department_week_schedule(event, cur):
+    """
+    One department's shifts for the ISO week containing ?week= (a date, default
+    today, UTC): {"department_id", "department_name", "week_start", "shifts": [...]}.
+    The document is kept up to date by the database as shifts change, so this
+    is a key lookup; clients send If-None-Match and get 304 while it is unchanged.
+    """
+    department_id = event['pathParameters']['id']
+    user_id = get_user_id_from_token(event)
+    params = event.get('queryStringParameters') or {}
+
+    try:
+        day = date.fromisoformat(params['week']) if params.get('week') else datetime.now(timezone.utc).date()
+    except ValueError:
+        return response(400, {'error': 'week must be a date (YYYY-MM-DD)'})
+    week_start = day - timedelta(days=day.weekday())
+
+    cur.execute(DEPARTMENT_WEEK_SCHEDULE, {
+        'department_id': department_id,
+        'user_id': user_id,
+        'week_start': week_start
+    })
+    schedule = cur.fetchone()
+
+    if not schedule:
+        return response(404, {'error': 'Department not found'})
+    if not schedule['allowed']:
+        return response(403, {'error': 'User not authorized for this department'})
+
+    if schedule['document'] is None:
+        # The week has no document yet, or a rename dropped it
+        cur.execute("""
+            SELECT document, etag
+            FROM cached_department_week_schedule(%s, %s)
+        """, (department_id, week_start))
+        schedule = cur.fetchone()
+        cur.connection.commit()
+
+    etag = f'"{schedule["etag"]}"'
+    if etag_matches(event, etag):
+        return response(304, None, etag)
+    # The schedule document is already JSON
+    return response(200, None, etag, encoded_body=schedule['document'])
+
+def etag_matches(event, etag):
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if_none_match = headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]
+
+def response(status_code, body, etag=None, encoded_body=None):
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag',
+        "Access-Control-Allow-Methods": "OPTIONS,GET"
+    }
+    if etag:
+        # Cached copies must be revalidated, which is cheap with the ETag
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'private, no-cache'
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': encoded_body if encoded_body is not None else ('' if body is None else json.dumps(body))
+    }
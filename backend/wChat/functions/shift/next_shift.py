@@ -9,6 +9,9 @@ from functions.auth_layer.auth import authenticate
 DB_HOST = os.environ['DB_HOST']
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+# Longest a cached next shift may lag behind a shift change; writes to the
+# user's shifts invalidate it straight away
+SCHEDULE_CACHE_TTL_SECONDS = int(os.environ.get('SCHEDULE_CACHE_TTL_SECONDS', '60'))
 
 def get_db_connection():
     return psycopg2.connect(
@@ -40,21 +43,17 @@ def lambda_handler(event, context):
 
 def get_next_shift(event, cur):
     user_id = event['pathParameters']['id']
-    current_time = datetime.now().isoformat()
 
+    # Served from the per-user schedule cache; filling it writes
     cur.execute("""
-        SELECT s.id, s.start_time, s.end_time, s.status, d.name as department_name
-        FROM shift s
-        JOIN department d ON s.department_id = d.id
-        WHERE s.user_id = %s AND s.start_time > %s
-        ORDER BY s.start_time ASC
-        LIMIT 1
-    """, (user_id, current_time))
-    
-    next_shift = cur.fetchone()
-    
-    if next_shift:
-        return response(200, next_shift)
+        SELECT next_shift
+        FROM cached_user_schedule(%s, %s)
+    """, (user_id, SCHEDULE_CACHE_TTL_SECONDS))
+    cached = cur.fetchone()
+    cur.connection.commit()
+
+    if cached and cached['next_shift']:
+        return response(200, cached['next_shift'])
     else:
         return response(404, {'error': 'No upcoming shifts found for this user'})
 
@@ -4,7 +4,7 @@ import jwt
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
-from functions.notifications.python.notification_service import NotificationService
+from functions.notifications.python.notification_service import NotificationService, SHIFT_AVAILABLE, queue_schedule_updates
 from datetime import datetime
 
 # Database connection parameters
@@ -13,6 +13,48 @@ DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 JWT_SECRET = os.environ['JWT_SECRET']
 
+# How many colleagues are offered a relinquished shift (see eligible_replacements)
+REPLACEMENT_CANDIDATES = 5
+
+# pickup_shift outcomes other than 'picked_up' -> (status code, message)
+PICKUP_ERRORS = {
+    'not_found': (404, 'Shift not found'),
+    'contended': (409, 'Shift is being picked up by someone else'),
+    'not_available': (409, 'Shift not available for pickup'),
+    'own_shift': (400, 'Cannot pick up your own shift'),
+    'not_in_department': (403, 'User not authorized for this department'),
+    'conflict': (409, 'Schedule conflict detected'),
+}
+
+# Open shifts in the user's departments in one query; the shift filter repeats
+# the idx_shift_open predicate so each department's board is an index range
+AVAILABLE_SHIFTS = """
+    SELECT 
+        s.id,
+        s.start_time,
+        s.end_time,
+        s.status,
+        d.name as department_name,
+        CASE 
+            WHEN s.user_id IS NOT NULL THEN json_build_object(
+                'id', u.id,
+                'first_name', u.first_name,
+                'last_name', u.last_name
+            )
+            ELSE NULL 
+        END as current_user
+    FROM department_group g
+    JOIN shift s ON s.department_id = g.department_id
+    JOIN department d ON s.department_id = d.id
+    LEFT JOIN "user" u ON s.user_id = u.id
+    WHERE g.user_id = %s
+    AND (s.status = 'available_for_exchange' OR s.user_id IS NULL)
+    AND s.start_time > CURRENT_TIMESTAMP
+    AND s.status != 'completed'
+    AND s.status != 'cancelled'
+    ORDER BY s.start_time ASC
+"""
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -71,44 +113,7 @@ def lambda_handler(event, context):
 def get_available_shifts(event, cur):
     user_id = get_user_id_from_token(event)
     
-    # Get user's department(s)
-    cur.execute("""
-        SELECT department_id 
-        FROM department_group 
-        WHERE user_id = %s
-    """, (user_id,))
-    
-    user_departments = [row['department_id'] for row in cur.fetchall()]
-    
-    if not user_departments:
-        return response(400, {'error': 'User not assigned to any departments'})
-    
-    # Get available shifts for user's departments
-    cur.execute("""
-        SELECT 
-            s.id,
-            s.start_time,
-            s.end_time,
-            s.status,
-            d.name as department_name,
-            CASE 
-                WHEN s.user_id IS NOT NULL THEN json_build_object(
-                    'id', u.id,
-                    'first_name', u.first_name,
-                    'last_name', u.last_name
-                )
-                ELSE NULL 
-            END as current_user
-        FROM shift s
-        JOIN department d ON s.department_id = d.id
-        LEFT JOIN "user" u ON s.user_id = u.id
-        WHERE (s.status = 'available_for_exchange' OR s.user_id IS NULL)
-        AND s.department_id = ANY(%s)
-        AND s.start_time > CURRENT_TIMESTAMP
-        AND s.status != 'completed'
-        AND s.status != 'cancelled'
-        ORDER BY s.start_time ASC
-    """, (user_departments,))
+    cur.execute(AVAILABLE_SHIFTS, (user_id,))
     
     available_shifts = cur.fetchall()
     
@@ -158,16 +163,34 @@ def relinquish_shift(event, cur):
         """, (shift_id, user_id))
         
         if cur.fetchone():
-            # Notify department about available shift
-            notification_service = NotificationService()
+            notification_service = NotificationService(cur)
             shift_date = shift['start_time'].strftime('%B %d, %Y')
             shift_start = shift['start_time'].strftime('%I:%M %p')
             shift_end = shift['end_time'].strftime('%I:%M %p')
-            notification_content = f"A new shift is available: {shift_date} from {shift_start} to {shift_end}"
-            notification_service.notify_department(shift['department_id'], notification_content)
             
+            # Offer the shift to the best-placed colleagues rather than the whole
+            # department; the department hears about it only if nobody fits
+            cur.execute("""
+                SELECT user_id
+                FROM eligible_replacements(%s, max_candidates => %s)
+            """, (shift_id, REPLACEMENT_CANDIDATES))
+            candidates = [row['user_id'] for row in cur.fetchall()]
+            
+            if candidates:
+                notification_content = f"A shift you can cover is available: {shift_date} from {shift_start} to {shift_end}"
+                notification_service.create_notifications_batch([
+                    {'user_id': candidate, 'content': notification_content} for candidate in candidates
+                ])
+            else:
+                notification_content = f"A new shift is available: {shift_date} from {shift_start} to {shift_end}"
+                notification_service.notify_department(shift['department_id'], notification_content, SHIFT_AVAILABLE)
+            
+            queue_schedule_updates(cur, [shift], 'updated')
             cur.connection.commit()
-            return response(200, {'message': 'Shift successfully marked as available for exchange'})
+            return response(200, {
+                'message': 'Shift successfully marked as available for exchange',
+                'notified': len(candidates)
+            })
         else:
             return response(400, {'error': 'Failed to update shift status'})
             
@@ -185,80 +208,40 @@ def pickup_shift(event, cur):
     shift_id = data['shift_id']
     user_id = get_user_id_from_token(event)
     
-    # Check if shift is available for pickup
-    cur.execute("""
-        SELECT s.id, s.department_id, s.start_time, s.end_time, 
-               s.user_id as current_user_id, d.name as department_name
-        FROM shift s
-        JOIN department d ON s.department_id = d.id
-        WHERE s.id = %s AND s.status = 'available_for_exchange'
-    """, (shift_id,))
-    
-    shift = cur.fetchone()
-    if not shift:
-        return response(404, {'error': 'Shift not available for pickup'})
-    
-    # Prevent user from picking up their own shift
-    if shift['current_user_id'] == user_id:
-        return response(400, {'error': 'Cannot pick up your own shift'})
-    
-    # Check if user is in the correct department
-    cur.execute("""
-        SELECT 1 
-        FROM department_group 
-        WHERE user_id = %s AND department_id = %s
-    """, (user_id, shift['department_id']))
-    
-    if not cur.fetchone():
-        return response(403, {'error': 'User not authorized for this department'})
-    
-    # Check for schedule conflicts
-    cur.execute("""
-        SELECT 1 
-        FROM shift 
-        WHERE user_id = %s 
-        AND status IN ('scheduled', 'available_for_exchange')
-        AND (
-            (start_time <= %s AND end_time >= %s)
-            OR (start_time <= %s AND end_time >= %s)
-            OR (start_time >= %s AND end_time <= %s)
-        )
-    """, (user_id, shift['start_time'], shift['start_time'], 
-          shift['end_time'], shift['end_time'], 
-          shift['start_time'], shift['end_time']))
-    
-    if cur.fetchone():
-        return response(409, {'error': 'Schedule conflict detected'})
-    
     try:
-        # Update shift assignment and status
+        # Claim, check and assign in one round trip (see pickup_shift in 0017)
         cur.execute("""
-            UPDATE shift 
-            SET user_id = %s,
-                status = 'scheduled'
-            WHERE id = %s AND status = 'available_for_exchange'
-            RETURNING id
-        """, (user_id, shift_id))
+            SELECT outcome, shift_id, department_id, start_time, end_time,
+                   previous_user_id, conflicting_shift_id
+            FROM pickup_shift(%s, %s)
+        """, (shift_id, user_id))
+        result = cur.fetchone()
         
-        if cur.fetchone():
-            notification_service = NotificationService()
-            shift_date = shift['start_time'].strftime('%B %d, %Y')
-            shift_start = shift['start_time'].strftime('%I:%M %p')
-            shift_end = shift['end_time'].strftime('%I:%M %p')
-            
-            # Notify user who picked up the shift
-            pickup_content = f"New shift assigned: {shift_date} from {shift_start} to {shift_end}"
-            notification_service.create_notification(user_id, pickup_content)
-            
-            # Notify user who relinquished the shift
-            if shift['current_user_id']:
-                relinquish_content = f"Your shift on {shift_date} has been picked up"
-                notification_service.create_notification(shift['current_user_id'], relinquish_content)
-            
-            cur.connection.commit()
-            return response(200, {'message': 'Shift successfully picked up'})
-        else:
-            return response(400, {'error': 'Failed to pick up shift'})
+        if result['outcome'] != 'picked_up':
+            cur.connection.rollback()
+            status_code, error = PICKUP_ERRORS[result['outcome']]
+            body = {'error': error, 'outcome': result['outcome']}
+            if result['conflicting_shift_id']:
+                body['conflicting_shift_id'] = result['conflicting_shift_id']
+            return response(status_code, body)
+        
+        notification_service = NotificationService(cur)
+        shift_date = result['start_time'].strftime('%B %d, %Y')
+        shift_start = result['start_time'].strftime('%I:%M %p')
+        shift_end = result['end_time'].strftime('%I:%M %p')
+        
+        # Notify user who picked up the shift
+        pickup_content = f"New shift assigned: {shift_date} from {shift_start} to {shift_end}"
+        notification_service.create_notification(user_id, pickup_content)
+        
+        # Notify user who relinquished the shift
+        if result['previous_user_id']:
+            relinquish_content = f"Your shift on {shift_date} has been picked up"
+            notification_service.create_notification(result['previous_user_id'], relinquish_content)
+        
+        queue_schedule_updates(cur, [{'id': result['shift_id'], 'department_id': result['department_id']}], 'updated')
+        cur.connection.commit()
+        return response(200, {'message': 'Shift successfully picked up', 'outcome': result['outcome']})
             
     except psycopg2.Error as e:
         cur.connection.rollback()
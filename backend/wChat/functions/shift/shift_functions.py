@@ -4,13 +4,28 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
 from datetime import datetime, date
-from functions.notifications.python.notification_service import NotificationService
+from functions.notifications.python.notification_service import NotificationService, SHIFT_AVAILABLE, queue_schedule_updates
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 
+# Statuses that keep a shift on its user's schedule (see shift_user_no_overlap)
+SCHEDULED_STATUSES = ('scheduled', 'available_for_exchange')
+
+# A shift on the user's schedule overlapping [start, end), other than the one
+# being edited; one probe on the index behind the shift_user_no_overlap constraint
+SHIFT_CONFLICT = """
+    SELECT id
+    FROM shift
+    WHERE user_id = %s
+    AND status IN ('scheduled', 'available_for_exchange')
+    AND period && tstzrange(%s, %s, '[)')
+    AND id IS DISTINCT FROM %s
+    LIMIT 1
+"""
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -34,7 +49,9 @@ def lambda_handler(event, context):
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             http_method = event['httpMethod']
             
-            if http_method == 'GET':
+            if http_method == 'GET' and event['path'].endswith('/replacements'):
+                return get_replacements(event, cur)
+            elif http_method == 'GET':
                 return get_shift(event, cur)
             elif http_method == 'POST':
                 return create_shift(event, cur)
@@ -68,6 +85,37 @@ def get_shift(event, cur):
     else:
         return response(404, {'error': 'Shift not found'})
 
+@authenticate
+def get_replacements(event, cur):
+    # Colleagues who could cover the shift, best first; ?limit= (default 5, at most
+    # 50) and ?time_zone= for the wall-clock checks (default UTC)
+    shift_id = event['pathParameters']['id']
+    params = event.get('queryStringParameters') or {}
+    
+    try:
+        limit = min(max(int(params.get('limit', 5)), 1), 50)
+    except ValueError:
+        return response(400, {'error': 'limit must be an integer'})
+    
+    time_zone = params.get('time_zone', 'UTC')
+    cur.execute("SELECT 1 FROM pg_timezone_names WHERE name = %s", (time_zone,))
+    if not cur.fetchone():
+        return response(400, {'error': f'Unknown time zone: {time_zone}'})
+    
+    cur.execute("SELECT 1 FROM shift WHERE id = %s", (shift_id,))
+    if not cur.fetchone():
+        return response(404, {'error': 'Shift not found'})
+    
+    cur.execute("""
+        SELECT user_id, first_name, last_name, week_hours, availability_recorded
+        FROM eligible_replacements(%s, %s, %s)
+    """, (shift_id, time_zone, limit))
+    candidates = cur.fetchall()
+    for candidate in candidates:
+        candidate['week_hours'] = float(candidate['week_hours'])
+    
+    return response(200, candidates)
+
 @authenticate
 def create_shift(event, cur):
     shift_data = json.loads(event['body'])
@@ -80,6 +128,11 @@ def create_shift(event, cur):
     start_time = datetime.fromisoformat(shift_data['start_time'])
     end_time = datetime.fromisoformat(shift_data['end_time'])
     
+    if shift_data.get('user_id') and shift_data.get('status', 'scheduled') in SCHEDULED_STATUSES:
+        conflict = find_conflict(cur, shift_data['user_id'], start_time, end_time)
+        if conflict:
+            return response(409, {'error': 'Schedule conflict detected', 'conflicting_shift_id': conflict})
+    
     try:
         cur.execute("""
             INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
@@ -94,7 +147,7 @@ def create_shift(event, cur):
         cur.execute("SELECT name FROM department WHERE id = %s", (shift_data['department_id'],))
         department = cur.fetchone()
         
-        notification_service = NotificationService()
+        notification_service = NotificationService(cur)
         shift_date = start_time.strftime('%B %d, %Y')
         shift_start = start_time.strftime('%I:%M %p')
         shift_end = end_time.strftime('%I:%M %p')
@@ -106,11 +159,15 @@ def create_shift(event, cur):
         else:
             # Notify department about available shift
             notification_content = f"A new shift is available: {shift_date} from {shift_start} to {shift_end}"
-            notification_service.notify_department(shift_data['department_id'], notification_content)
+            notification_service.notify_department(shift_data['department_id'], notification_content, SHIFT_AVAILABLE)
         
+        queue_schedule_updates(cur, [{'id': new_shift_id, 'department_id': shift_data['department_id']}], 'created')
         cur.connection.commit()
         return response(201, {'id': new_shift_id})
         
+    except psycopg2.errors.ExclusionViolation:
+        cur.connection.rollback()
+        return response(409, {'error': 'Schedule conflict detected'})
     except psycopg2.Error as e:
         cur.connection.rollback()
         return response(400, {'error': str(e)})
@@ -145,6 +202,16 @@ def update_shift(event, cur):
     if not update_fields:
         return response(400, {'error': 'No fields to update'})
     
+    # The shift as it will be after the update must not overlap the user's other shifts
+    user_id = shift_data.get('user_id', current_shift['user_id'])
+    if user_id and shift_data.get('status', current_shift['status']) in SCHEDULED_STATUSES:
+        conflict = find_conflict(cur, user_id,
+                                 shift_data.get('start_time', current_shift['start_time']),
+                                 shift_data.get('end_time', current_shift['end_time']),
+                                 exclude_shift_id=shift_id)
+        if conflict:
+            return response(409, {'error': 'Schedule conflict detected', 'conflicting_shift_id': conflict})
+    
     update_values.append(shift_id)
     
     try:
@@ -178,11 +245,17 @@ def update_shift(event, cur):
                 change_content = f"Your shift on {shift_date} has been updated: {updated_shift['start_time'].strftime('%I:%M %p')} to {updated_shift['end_time'].strftime('%I:%M %p')}"
                 notification_service.create_notification(updated_shift['user_id'], change_content)
             
+            queue_schedule_updates(cur, [updated_shift], 'updated')
+            if current_shift['department_id'] != updated_shift['department_id']:
+                queue_schedule_updates(cur, [current_shift], 'removed')
             cur.connection.commit()
             return response(200, {'message': 'Shift updated successfully'})
         else:
             return response(404, {'error': 'Shift not found'})
             
+    except psycopg2.errors.ExclusionViolation:
+        cur.connection.rollback()
+        return response(409, {'error': 'Schedule conflict detected'})
     except psycopg2.Error as e:
         cur.connection.rollback()
         return response(400, {'error': str(e)})
@@ -215,6 +288,7 @@ def delete_shift(event, cur):
                 notification_content = f"Your shift on {shift_date} has been cancelled"
                 notification_service.create_notification(shift['user_id'], notification_content)
             
+            queue_schedule_updates(cur, [shift], 'deleted')
             cur.connection.commit()
             return response(200, {'message': 'Shift deleted successfully'})
         else:
@@ -224,6 +298,12 @@ def delete_shift(event, cur):
         cur.connection.rollback()
         return response(400, {'error': str(e)})
 
+def find_conflict(cur, user_id, start_time, end_time, exclude_shift_id=None):
+    # Id of a shift on the user's schedule overlapping [start_time, end_time), if any
+    cur.execute(SHIFT_CONFLICT, (user_id, start_time, end_time, exclude_shift_id))
+    conflict = cur.fetchone()
+    return conflict['id'] if conflict else None
+
 def response(status_code, body):
     return {
         'statusCode': status_code,
@@ -0,0 +1,48 @@
+import json
+import os
+import psycopg2
+from datetime import datetime, timedelta, timezone
+from psycopg2.extras import RealDictCursor
+from functions.notifications.python.notification_service import NotificationService, queue_schedule_updates
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Shift templates are kept materialized this many days ahead
+EXPAND_AHEAD_DAYS = int(os.environ.get('SHIFT_TEMPLATE_EXPAND_AHEAD_DAYS', '28'))
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Daily: materialize every active shift template for the coming weeks. Each
+    # template continues after the last day it was materialized for, so a run
+    # only adds the new day(s) and shifts for templates created since the last run
+    conn = get_db_connection()
+    try:
+        today = datetime.now(timezone.utc).date()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id, template_id, department_id, start_time, end_time
+                FROM expand_shift_templates(%s, %s)
+            """, (today, today + timedelta(days=EXPAND_AHEAD_DAYS)))
+            created = cur.fetchall()
+
+            NotificationService(cur).notify_open_shifts(created)
+            queue_schedule_updates(cur, created, 'created')
+        conn.commit()
+
+        print(f"Materialized {len(created)} shifts from templates")
+        return {'statusCode': 200, 'body': json.dumps({'created': len(created)})}
+    except Exception as e:
+        conn.rollback()
+        print(f"Error expanding shift templates: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
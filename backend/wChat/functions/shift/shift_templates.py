@@ -0,0 +1,194 @@
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from functions.auth_layer.auth import authenticate
+from functions.notifications.python.notification_service import NotificationService, queue_schedule_updates
+from datetime import datetime, date, time, timedelta
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# Longest date range one expand request may materialize
+MAX_EXPAND_DAYS = 92
+
+TEMPLATE_COLUMNS = """
+    t.id, t.name, t.department_id, d.name AS department_name, t.role_id, r.name AS role_name,
+    t.weekdays, t.start_time, t.end_time, t.time_zone, t.headcount,
+    t.valid_from, t.valid_until, t.materialized_through, t.is_active, t.created_by_id, t.created_at
+"""
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+# Custom JSON encoder to handle datetime objects
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        if isinstance(obj, time):
+            return obj.strftime('%H:%M')
+        return super(DateTimeEncoder, self).default(obj)
+
+def lambda_handler(event, context):
+    if event['httpMethod'] == 'OPTIONS':
+        return response(200, 'OK')
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            http_method = event['httpMethod']
+
+            if http_method == 'GET':
+                return list_templates(event, cur)
+            elif http_method == 'POST' and event['path'].endswith('/expand'):
+                return expand_templates(event, cur)
+            elif http_method == 'POST':
+                return create_template(event, cur)
+            elif http_method == 'DELETE':
+                return deactivate_template(event, cur)
+            else:
+                return response(405, {'error': 'Method not allowed'})
+    finally:
+        conn.close()
+
+@authenticate
+def list_templates(event, cur):
+    params = event.get('queryStringParameters') or {}
+    department_id = params.get('department_id')
+
+    cur.execute(f"""
+        SELECT {TEMPLATE_COLUMNS}
+        FROM shift_template t
+        JOIN department d ON d.id = t.department_id
+        LEFT JOIN role r ON r.id = t.role_id
+        WHERE t.is_active = true
+        AND (%(department_id)s::int IS NULL OR t.department_id = %(department_id)s::int)
+        ORDER BY d.name, t.start_time, t.id
+    """, {'department_id': department_id})
+    return response(200, cur.fetchall())
+
+@authenticate
+def create_template(event, cur):
+    """
+    {"department_id", "weekdays": [1-7, ...], "start_time": "09:00", "end_time": "17:00",
+    "headcount"?, "role_id"?, "name"?, "time_zone"?, "valid_from"?, "valid_until"?,
+    "created_by_id"?}. An end_time at or before start_time ends the next day.
+    """
+    template_data = json.loads(event['body'])
+    required_fields = ['department_id', 'weekdays', 'start_time', 'end_time']
+
+    if not all(field in template_data for field in required_fields):
+        return response(400, {'error': 'Missing required fields'})
+
+    weekdays = template_data['weekdays']
+    if not isinstance(weekdays, list) or not weekdays or not all(day in range(1, 8) for day in weekdays):
+        return response(400, {'error': 'weekdays must list ISO weekdays, 1 (Monday) to 7 (Sunday)'})
+
+    try:
+        start_time = time.fromisoformat(template_data['start_time'])
+        end_time = time.fromisoformat(template_data['end_time'])
+        valid_from = date.fromisoformat(template_data['valid_from']) if template_data.get('valid_from') else None
+        valid_until = date.fromisoformat(template_data['valid_until']) if template_data.get('valid_until') else None
+    except (TypeError, ValueError):
+        return response(400, {'error': 'Times must be HH:MM and dates YYYY-MM-DD'})
+
+    time_zone = template_data.get('time_zone', 'UTC')
+    cur.execute("SELECT 1 FROM pg_timezone_names WHERE name = %s", (time_zone,))
+    if not cur.fetchone():
+        return response(400, {'error': f'Unknown time zone: {time_zone}'})
+
+    try:
+        cur.execute("""
+            INSERT INTO shift_template (name, department_id, role_id, weekdays, start_time, end_time,
+                                        time_zone, headcount, valid_from, valid_until, created_by_id)
+            VALUES (%s, %s, %s, %s::smallint[], %s, %s, %s, %s, COALESCE(%s, CURRENT_DATE), %s, %s)
+            RETURNING id
+        """, (template_data.get('name'), template_data['department_id'], template_data.get('role_id'),
+              sorted(set(weekdays)), start_time, end_time, time_zone, template_data.get('headcount', 1),
+              valid_from, valid_until, template_data.get('created_by_id')))
+        template_id = cur.fetchone()['id']
+        cur.connection.commit()
+        return response(201, {'id': template_id})
+
+    except psycopg2.Error as e:
+        cur.connection.rollback()
+        return response(400, {'error': str(e)})
+
+@authenticate
+def deactivate_template(event, cur):
+    # Shifts already materialized from the template are kept
+    template_id = event['pathParameters']['id']
+
+    cur.execute("""
+        UPDATE shift_template
+        SET is_active = false
+        WHERE id = %s AND is_active = true
+        RETURNING id
+    """, (template_id,))
+    deactivated = cur.fetchone()
+    cur.connection.commit()
+
+    if deactivated:
+        return response(200, {'message': 'Shift template deactivated'})
+    else:
+        return response(404, {'error': 'Shift template not found'})
+
+@authenticate
+def expand_templates(event, cur):
+    """
+    Materialize shifts for {"start_date", "end_date", "template_id"?}; days a
+    template has already been materialized for are skipped, so repeating a
+    request creates nothing new and deleted shifts stay deleted. A range that
+    starts after the days materialized so far also fills in the days before it.
+    """
+    body = json.loads(event['body'])
+
+    try:
+        start_date = date.fromisoformat(body['start_date'])
+        end_date = date.fromisoformat(body['end_date'])
+    except (KeyError, TypeError, ValueError):
+        return response(400, {'error': 'start_date and end_date (YYYY-MM-DD) are required'})
+
+    if end_date < start_date or end_date - start_date > timedelta(days=MAX_EXPAND_DAYS):
+        return response(400, {'error': f'The date range must run forwards and span at most {MAX_EXPAND_DAYS} days'})
+
+    try:
+        created = expand(cur, start_date, end_date, body.get('template_id'))
+        cur.connection.commit()
+        return response(200, {'created': len(created), 'ids': [shift['id'] for shift in created]})
+
+    except psycopg2.Error as e:
+        cur.connection.rollback()
+        return response(400, {'error': str(e)})
+
+def expand(cur, start_date, end_date, template_id=None):
+    # One INSERT ... SELECT over generate_series (see expand_shift_templates), then
+    # one coalesced notification and schedule update per department
+    cur.execute("""
+        SELECT id, template_id, department_id, start_time, end_time
+        FROM expand_shift_templates(%s, %s, %s)
+    """, (start_date, end_date, template_id))
+    created = cur.fetchall()
+
+    NotificationService(cur).notify_open_shifts(created)
+    queue_schedule_updates(cur, created, 'created')
+    return created
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            "Access-Control-Allow-Methods": "OPTIONS,POST,GET,DELETE"
+        },
+        'body': json.dumps(body, cls=DateTimeEncoder)
+    }
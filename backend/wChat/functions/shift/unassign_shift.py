@@ -3,7 +3,7 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from functions.auth_layer.auth import authenticate
-from functions.notifications.python.notification_service import NotificationService
+from functions.notifications.python.notification_service import NotificationService, SHIFT_AVAILABLE, queue_schedule_updates
 from datetime import datetime
 
 # Database connection parameters
@@ -75,7 +75,7 @@ def unassign_user_from_shift(shift_id, cur):
         updated_shift = cur.fetchone()
         
         if updated_shift:
-            notification_service = NotificationService()
+            notification_service = NotificationService(cur)
             shift_date = shift['start_time'].strftime('%B %d, %Y')
             
             # Notify the user who was unassigned
@@ -86,8 +86,9 @@ def unassign_user_from_shift(shift_id, cur):
             shift_start = shift['start_time'].strftime('%I:%M %p')
             shift_end = shift['end_time'].strftime('%I:%M %p')
             available_content = f"A new shift is available: {shift_date} from {shift_start} to {shift_end}"
-            notification_service.notify_department(shift['department_id'], available_content)
+            notification_service.notify_department(shift['department_id'], available_content, SHIFT_AVAILABLE)
             
+            queue_schedule_updates(cur, [updated_shift], 'updated')
             cur.connection.commit()
             return response(200, {
                 'message': 'User unassigned from shift successfully',
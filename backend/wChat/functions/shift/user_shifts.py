@@ -1,3 +1,4 @@
+import base64
 import json
 import os
 import psycopg2
@@ -10,6 +11,12 @@ DB_HOST = os.environ['DB_HOST']
 DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+# Longest a cached week may lag behind a shift change; writes to the user's
+# shifts invalidate it straight away
+SCHEDULE_CACHE_TTL_SECONDS = int(os.environ.get('SCHEDULE_CACHE_TTL_SECONDS', '60'))
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -41,18 +48,98 @@ def lambda_handler(event, context):
 
 @authenticate
 def get_user_shifts(event, cur):
+    """
+    A user's shifts in start order, one page at a time. Optional start_date and
+    end_date bound the window by start time, limit sets the page size and the
+    next_cursor of one page fetches the next. week=current returns this week's
+    shifts from the per-user schedule cache instead.
+    """
     user_id = event['pathParameters']['id']
-    cur.execute("""
-        SELECT s.id, s.start_time, s.end_time, s.status, 
+    params = event.get('queryStringParameters') or {}
+
+    if params.get('week') == 'current':
+        return get_current_week_shifts(cur, user_id)
+
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        start_date = datetime.fromisoformat(params['start_date']) if params.get('start_date') else None
+        end_date = datetime.fromisoformat(params['end_date']) if params.get('end_date') else None
+        after = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError:
+        return response(400, {'error': 'Invalid limit, start_date, end_date or cursor value'})
+
+    # One extra row tells whether another page follows
+    cur.execute(*user_shifts_query(user_id, start_date, end_date, after, limit + 1))
+    shifts = cur.fetchall()
+
+    next_cursor = None
+    if len(shifts) > limit:
+        shifts = shifts[:limit]
+        next_cursor = encode_cursor(shifts[-1])
+
+    return response(200, {
+        'shifts': shifts,
+        'pagination': {
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
+    })
+
+def user_shifts_query(user_id, start_date, end_date, after, limit):
+    """ The page query and its parameters; after is the (start_time, id) of the last row seen """
+    query = """
+        SELECT s.id, s.start_time, s.end_time, s.status,
                d.name as department_name
         FROM shift s
         LEFT JOIN department d ON s.department_id = d.id
         WHERE s.user_id = %s
-        ORDER BY s.start_time
-    """, (user_id,))
-    shifts = cur.fetchall()
-    
-    return response(200, shifts)
+    """
+    query_params = [user_id]
+
+    if start_date:
+        query += " AND s.start_time >= %s"
+        query_params.append(start_date)
+
+    if end_date:
+        query += " AND s.start_time < %s"
+        query_params.append(end_date)
+
+    if after:
+        # Keyset paging: rows after the last one the client has seen
+        query += " AND (s.start_time, s.id) > (%s, %s)"
+        query_params.extend(after)
+
+    query += " ORDER BY s.start_time, s.id LIMIT %s"
+    query_params.append(limit)
+    return query, query_params
+
+def get_current_week_shifts(cur, user_id):
+    cur.execute("""
+        SELECT week_start, week_shifts
+        FROM cached_user_schedule(%s, %s)
+    """, (user_id, SCHEDULE_CACHE_TTL_SECONDS))
+    cached = cur.fetchone()
+    # Filling the cache writes
+    cur.connection.commit()
+
+    if not cached:
+        return response(404, {'error': 'User not found'})
+
+    return response(200, {
+        'shifts': cached['week_shifts'],
+        'week_start': cached['week_start']
+    })
+
+def encode_cursor(shift):
+    position = json.dumps([shift['start_time'].isoformat(), shift['id']])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        start_time, shift_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(start_time), int(shift_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
 
 def response(status_code, body):
     return {
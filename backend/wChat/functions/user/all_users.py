@@ -75,11 +75,14 @@ def get_all_users(event, cur):
             r.name as role_name,
             r.description as role_description,
             COALESCE(ud.departments, '') as departments,
-            COALESCE(ua.availability, '[]'::jsonb) as availability
+            COALESCE(ua.availability, '[]'::jsonb) as availability,
+            o.user_id IS NOT NULL as is_online,
+            o.last_seen
         FROM "user" u
         LEFT JOIN role r ON u.role_id = r.id
         LEFT JOIN user_departments ud ON u.id = ud.user_id
         LEFT JOIN user_availability ua ON u.id = ua.user_id
+        LEFT JOIN online_user o ON u.id = o.user_id
         ORDER BY u.last_name, u.first_name
     """)
     
@@ -4,7 +4,7 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 import bcrypt
 from functions.auth_layer.auth import authenticate
-import boto3
+from functions.notifications.python import outbox
 import jwt
 
 # Database connection parameters
@@ -75,9 +75,7 @@ def create_user(event, cur):
     if not all(field in user_data for field in required_fields):
         return response(400, {'error': 'Missing required fields'})
     
-    # Store plain password for email
-    temp_password = user_data['password']
-    password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = bcrypt.hashpw(user_data['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
     #check if the role exists
     cur.execute("SELECT * FROM role WHERE id = %s", (user_data['role_id'],))
@@ -96,31 +94,17 @@ def create_user(event, cur):
       user_data['hourly_rate'], user_data['role_id'], user_data['is_manager'], password_hash, full_time))
     
     new_user = cur.fetchone()
-    cur.connection.commit()
 
-    # Send welcome email with temporary password
-    try:
-        lambda_client = boto3.client('lambda')
-        email_payload = {
-            'httpMethod': 'POST',
-            'body': json.dumps({
-                'template_type': 'new_user',
-                'recipient_id': new_user['id'],
-                'template_data': {
-                    'user_name': f"{new_user['first_name']} {new_user['last_name']}",
-                    'temp_password': temp_password
-                }
-            })
+    # Queue the welcome email, sent once the user is committed. It carries a
+    # set-password link made by the dispatcher; no password goes into the outbox.
+    outbox.enqueue(cur, outbox.EMAIL, {
+        'template_type': 'new_user',
+        'recipient_id': new_user['id'],
+        'template_data': {
+            'user_name': f"{new_user['first_name']} {new_user['last_name']}"
         }
-        
-        lambda_client.invoke(
-            FunctionName=os.environ['EMAIL_FUNCTION_NAME'],
-            InvocationType='Event',
-            Payload=json.dumps(email_payload)
-        )
-    except Exception as e:
-        print(f"Error sending welcome email: {str(e)}")
-        # Continue with user creation even if email fails
+    })
+    cur.connection.commit()
     
     return response(201, {'id': new_user['id']})
 
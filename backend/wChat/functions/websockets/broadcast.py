@@ -1,9 +1,11 @@
 import os
 import json
+import time
 import boto3
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from botocore.exceptions import ClientError
+from functions.notifications.python.websocket_service import encode, WebSocketService, MANAGERS_CHANNEL
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
@@ -11,6 +13,35 @@ DB_USER = os.environ['POSTGRES_USER']
 DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
 DB_NAME = os.environ['DB_NAME']
 
+# Typing indicators are served from memory that survives between warm invocations:
+# recipients' connection ids are cached briefly and each sender/recipient pair gets
+# at most one frame per interval, so keystroke traffic doesn't reach the database
+CONNECTION_CACHE_TTL_SECONDS = 30
+TYPING_INTERVAL_SECONDS = 3
+
+USER_CONNECTIONS = "SELECT connection_id, encoding FROM connections WHERE user_id = %s"
+# The connection's user and whether they may post to %(channel)s: managers may
+# post anywhere, everyone else only to their own departments' channels. A
+# broadcast to everyone is checked as one to the managers channel.
+BROADCAST_SENDER = """
+    SELECT c.user_id,
+           u.is_manager OR EXISTS (
+               SELECT 1
+               FROM department_group g
+               WHERE g.user_id = c.user_id AND 'department:' || g.department_id = %(channel)s
+           ) AS allowed
+    FROM connections c
+    JOIN "user" u ON u.id = c.user_id
+    WHERE c.connection_id = %(connection_id)s
+"""
+# Clients clear the indicator themselves if no refresh arrives within this time
+TYPING_EXPIRY_SECONDS = 6
+
+# user_id -> (expires_at, [(connection_id, encoding), ...])
+connection_cache = {}
+# (sender_id, recipient_id) -> (sent_at, is_typing)
+typing_state = {}
+
 def get_db_connection():
     return psycopg2.connect(
         host=DB_HOST,
@@ -33,11 +64,13 @@ def lambda_handler(event, context):
         elif message_type == 'group_message':
             handle_group_message(api_client, message_data)
         elif message_type == 'broadcast':
-            handle_broadcast(api_client, message_data)
+            rejected = handle_broadcast(api_client, message_data, event['requestContext']['connectionId'])
+            if rejected:
+                return rejected
         elif message_type == 'typing_indicator':
             handle_typing_indicator(api_client, message_data)
         elif message_type == 'read_receipt':
-            handle_read_receipt(api_client, message_data)
+            handle_read_receipt(api_client, message_data, event['requestContext']['connectionId'])
         else:
             return {
                 'statusCode': 400,
@@ -96,47 +129,111 @@ def handle_group_message(api_client, message_data):
                 'timestamp': message_data.get('timestamp', '')
             })
 
-def handle_broadcast(api_client, message_data):
-    sender_id = message_data['sender_id']
-    content = message_data['content']
+def handle_broadcast(api_client, message_data, connection_id):
+    # 'department:<id>' or 'managers'; without one the broadcast goes to everyone.
+    # The sender is whoever owns the connection (see BROADCAST_SENDER). Returns
+    # an error response if the broadcast is refused.
+    channel = message_data.get('channel')
     
-    # Store the message in PostgreSQL
-    message_id = store_message(sender_id, 'all', content, 'broadcast')
-    
-    # Send the message to all connected users
-    broadcast_to_all(api_client, {
-        'type': 'broadcast',
-        'message_id': message_id,
-        'sender_id': sender_id,
-        'content': content,
-        'timestamp': message_data.get('timestamp', '')
-    })
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(BROADCAST_SENDER, {'connection_id': connection_id, 'channel': channel or MANAGERS_CHANNEL})
+            sender = cur.fetchone()
+            if not sender:
+                return {'statusCode': 404, 'body': json.dumps({'message': 'Connection not found'})}
+            if not sender['allowed']:
+                return {'statusCode': 403, 'body': json.dumps({'message': 'Not allowed to broadcast to this channel'})}
+            
+            message = {
+                'type': 'broadcast',
+                'sender_id': sender['user_id'],
+                'content': message_data['content'],
+                'channel': channel,
+                'timestamp': message_data.get('timestamp', '')
+            }
+            websocket_service = WebSocketService(api_client)
+            if channel:
+                websocket_service.send_to_channels(cur, [(channel, message)])
+            else:
+                cur.execute("SELECT connection_id, encoding FROM connections")
+                connections = [(row['connection_id'], row['encoding']) for row in cur.fetchall()]
+                websocket_service.deliver(cur, [(connections, message)])
+            conn.commit()
+    return None
 
 def handle_typing_indicator(api_client, message_data):
     sender_id = message_data['sender_id']
     recipient_id = message_data['recipient_id']
     is_typing = message_data['is_typing']
     
-    send_message_to_user(api_client, recipient_id, {
+    now = time.monotonic()
+    expire_typing_state(now)
+    
+    # Repeats of the same state inside the interval are dropped; a change
+    # (started/stopped typing) always goes out straight away
+    key = (sender_id, recipient_id)
+    last = typing_state.get(key)
+    if last and last[1] == is_typing and now - last[0] < TYPING_INTERVAL_SECONDS:
+        return
+    typing_state[key] = (now, is_typing)
+    
+    message = {
         'type': 'typing_indicator',
         'sender_id': sender_id,
-        'is_typing': is_typing
-    })
+        'is_typing': is_typing,
+        'expires_in': TYPING_EXPIRY_SECONDS
+    }
+    for connection_id, encoding in get_cached_connections(recipient_id, now):
+        send_typing_frame(api_client, recipient_id, connection_id, encode(message, encoding))
+
+def expire_typing_state(now):
+    for key in [key for key, (sent_at, _) in typing_state.items() if now - sent_at >= TYPING_EXPIRY_SECONDS]:
+        del typing_state[key]
+    for user_id in [user_id for user_id, (expires_at, _) in connection_cache.items() if expires_at <= now]:
+        del connection_cache[user_id]
+
+def get_cached_connections(user_id, now):
+    cached = connection_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    connections = [(connection['connection_id'], connection['encoding']) for connection in get_connections_for_user(user_id)]
+    connection_cache[user_id] = (now + CONNECTION_CACHE_TTL_SECONDS, connections)
+    return connections
+
+def send_typing_frame(api_client, user_id, connection_id, data):
+    # Typing frames are disposable: a closed connection is only dropped from the
+    # cache, the connections table is cleaned up by $disconnect and regular sends
+    try:
+        api_client.post_to_connection(
+            ConnectionId=connection_id,
+            Data=data
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'GoneException':
+            cached = connection_cache.get(user_id)
+            if cached:
+                connection_cache[user_id] = (cached[0], [c for c in cached[1] if c[0] != connection_id])
+        else:
+            print(f"Error sending typing indicator to {connection_id}: {e}")
 
-def handle_read_receipt(api_client, message_data):
-    reader_id = message_data['reader_id']
+def handle_read_receipt(api_client, message_data, connection_id):
+    # The reader is whoever owns the connection, never an id from the frame
+    reader_id = get_connection_user(connection_id)
+    if reader_id is None:
+        return
     message_id = message_data['message_id']
     
-    # Update the message as read in PostgreSQL
-    update_message_read_status(message_id, reader_id)
+    # Move the reader's watermark for this conversation up to the message
+    receipt = update_conversation_read(message_id, reader_id)
     
-    # Get the original sender of the message
-    original_sender_id = get_message_sender(message_id)
+    # Nothing to tell the sender if the watermark was already past this message
+    if receipt is None:
+        return
     
-    # Send read receipt to the original sender
-    send_message_to_user(api_client, original_sender_id, {
+    # One receipt covers every earlier message in the conversation
+    send_message_to_user(api_client, receipt['other_user_id'], {
         'type': 'read_receipt',
-        'message_id': message_id,
+        'message_id': receipt['last_read_message_id'],
         'reader_id': reader_id
     })
 
@@ -152,21 +249,16 @@ def store_message(sender_id, recipient_id, content, message_type):
             conn.commit()
     return message_id
 
-def broadcast_to_all(api_client, message):
-    connections = get_all_connections()
-    for connection in connections:
-        send_message(api_client, connection['connection_id'], message)
-
 def send_message_to_user(api_client, user_id, message):
     connections = get_connections_for_user(user_id)
     for connection in connections:
-        send_message(api_client, connection['connection_id'], message)
+        send_message(api_client, connection['connection_id'], message, connection['encoding'])
 
-def send_message(api_client, connection_id, message):
+def send_message(api_client, connection_id, message, encoding):
     try:
         api_client.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps(message).encode('utf-8')
+            Data=encode(message, encoding)
         )
     except ClientError as e:
         if e.response['Error']['Code'] == 'GoneException':
@@ -174,34 +266,40 @@ def send_message(api_client, connection_id, message):
         else:
             print(f"Error sending message to {connection_id}: {e}")
 
-def get_all_connections():
+def get_connection_user(connection_id):
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT connection_id FROM connections")
-            return cur.fetchall()
+            cur.execute("SELECT user_id FROM connections WHERE connection_id = %s", (connection_id,))
+            connection = cur.fetchone()
+            return connection['user_id'] if connection else None
 
 def get_connections_for_user(user_id):
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT connection_id FROM connections WHERE user_id = %s", (user_id,))
+            cur.execute(USER_CONNECTIONS, (user_id,))
             return cur.fetchall()
 
-def update_message_read_status(message_id, reader_id):
+def update_conversation_read(message_id, reader_id):
+    """
+    Upsert the reader's last-read message for the conversation the message belongs
+    to. Returns the sender and new watermark, or None if nothing moved forward.
+    """
     with get_db_connection() as conn:
-        with conn.cursor() as cur:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                INSERT INTO message_reads (message_id, reader_id, read_at)
-                VALUES (%s, %s, NOW())
-                ON CONFLICT (message_id, reader_id) DO UPDATE
-                SET read_at = NOW()
+                INSERT INTO conversation_read (reader_id, other_user_id, last_read_message_id, read_at)
+                SELECT received_by_user_id, sent_by_user_id, id, NOW()
+                FROM message
+                WHERE id = %s AND received_by_user_id = %s
+                ON CONFLICT (reader_id, other_user_id) DO UPDATE
+                SET last_read_message_id = EXCLUDED.last_read_message_id,
+                    read_at = EXCLUDED.read_at
+                WHERE conversation_read.last_read_message_id < EXCLUDED.last_read_message_id
+                RETURNING other_user_id, last_read_message_id
             """, (message_id, reader_id))
+            receipt = cur.fetchone()
             conn.commit()
-
-def get_message_sender(message_id):
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT sender_id FROM messages WHERE id = %s", (message_id,))
-            return cur.fetchone()['sender_id']
+    return receipt
 
 def remove_connection(connection_id):
     with get_db_connection() as conn:
@@ -3,6 +3,7 @@ import os
 import boto3
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from functions.notifications.python.websocket_service import ENCODINGS, JSON_ENCODING
 
 # Database connection parameters
 DB_HOST = os.environ['DB_HOST']
@@ -19,17 +20,33 @@ def get_db_connection():
 def lambda_handler(event, context):
     connection_id = event['requestContext']['connectionId']
     user_id = event['queryStringParameters'].get('user_id')
+    # 'compact' frames use short keys; everything else gets plain JSON
+    encoding = event['queryStringParameters'].get('encoding', JSON_ENCODING)
     
     if not user_id:
         return {'statusCode': 400, 'body': json.dumps('Missing user_id parameter')}
+    if encoding not in ENCODINGS:
+        return {'statusCode': 400, 'body': json.dumps('Invalid encoding parameter')}
     
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
             cur.execute("""
-                INSERT INTO connections (connection_id, user_id)
-                VALUES (%s, %s)
-            """, (connection_id, user_id))
+                INSERT INTO connections (connection_id, user_id, encoding)
+                VALUES (%s, %s, %s)
+            """, (connection_id, user_id, encoding))
+            # Subscribe to the user's department channels and, for managers, the
+            # managers channel; triggers keep these current while connected
+            cur.execute("""
+                INSERT INTO connection_channel (channel, connection_id)
+                SELECT 'department:' || department_id, %(connection_id)s
+                FROM department_group
+                WHERE user_id = %(user_id)s
+                UNION ALL
+                SELECT 'managers', %(connection_id)s
+                FROM "user"
+                WHERE id = %(user_id)s AND is_manager = true
+            """, {'connection_id': connection_id, 'user_id': user_id})
             conn.commit()
         return {'statusCode': 200, 'body': json.dumps('Connected successfully')}
     except psycopg2.Error as e:
@@ -0,0 +1,42 @@
+import json
+import os
+import psycopg2
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Clients send {"action": "heartbeat"} about once a minute; it keeps the
+    # connection's last_seen inside the presence window and away from the sweeper
+    connection_id = event['requestContext']['connectionId']
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE connections
+                SET last_seen = CURRENT_TIMESTAMP
+                WHERE connection_id = %s
+            """, (connection_id,))
+            updated_rows = cur.rowcount
+            conn.commit()
+        
+        if updated_rows > 0:
+            return {'statusCode': 200, 'body': json.dumps('OK')}
+        else:
+            # Already swept; the client reconnects when API Gateway closes the socket
+            return {'statusCode': 404, 'body': json.dumps('Connection not found')}
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        return {'statusCode': 500, 'body': json.dumps('Failed to record heartbeat')}
+    finally:
+        conn.close()
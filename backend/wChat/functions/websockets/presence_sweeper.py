@@ -0,0 +1,86 @@
+import json
+import os
+import psycopg2
+from functions.notifications.python import delivery_log
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# API Gateway closes a WebSocket after 10 idle minutes, so a connection that has
+# not sent a heartbeat for that long is gone even if $disconnect never ran
+CONNECTION_EXPIRY_MINUTES = 10
+# Connections deleted per transaction
+BATCH_SIZE = 500
+
+# One batch of expired connections off the last_seen index. Rows a heartbeat or
+# $disconnect is touching right now are skipped. The batch's ids go in as an
+# array so the delete probes the primary key instead of joining the whole table.
+SWEEP_BATCH = """
+    DELETE FROM connections
+    WHERE connection_id = ANY(ARRAY(
+        SELECT connection_id
+        FROM connections
+        WHERE last_seen < CURRENT_TIMESTAMP - make_interval(mins => %s)
+        ORDER BY last_seen
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ))
+"""
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Scheduled cleanup of expired connections, so fan-out stops posting to them,
+    # and of delivery log frames too old to be replayed
+    conn = get_db_connection()
+    try:
+        removed = sweep_connections(conn)
+        expired = expire_delivery_log(conn)
+        print(f"Removed {removed} expired connections and {expired} delivery log frames")
+        return {'statusCode': 200, 'body': json.dumps({'removed': removed, 'expired_frames': expired})}
+    except Exception as e:
+        print(f"Error sweeping connections: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+    finally:
+        conn.close()
+
+def sweep_connections(conn, batch_size=BATCH_SIZE):
+    removed = 0
+    while True:
+        count = sweep_batch(conn, batch_size)
+        removed += count
+        if count < batch_size:
+            return removed
+
+def sweep_batch(conn, batch_size):
+    """Delete one batch of expired connections off the last_seen index; returns how many"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SWEEP_BATCH, (CONNECTION_EXPIRY_MINUTES, batch_size))
+            count = cur.rowcount
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+
+def expire_delivery_log(conn, batch_size=BATCH_SIZE):
+    expired = 0
+    while True:
+        try:
+            with conn.cursor() as cur:
+                count = delivery_log.expire(cur, batch_size)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        expired += count
+        if count < batch_size:
+            return expired
@@ -0,0 +1,109 @@
+import json
+import os
+import boto3
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from botocore.exceptions import ClientError
+from functions.notifications.python import delivery_log
+from functions.notifications.python.websocket_service import encode, FRAME_MAX_BYTES
+
+# Database connection parameters
+DB_HOST = os.environ['DB_HOST']
+DB_USER = os.environ['POSTGRES_USER']
+DB_PASSWORD = os.environ['POSTGRES_PASSWORD']
+
+# A client missing more frames than this reloads instead of replaying
+REPLAY_MAX_EVENTS = 1000
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+def lambda_handler(event, context):
+    # Clients send {"action": "replay", "last_seq": n} as soon as the socket opens
+    # (API Gateway doesn't accept posts to a connection until $connect has returned)
+    # and get everything pushed to them after n, usually in a single frame. A
+    # client that has no n yet sends 0 (or nothing) and only learns the current one
+    connection_id = event['requestContext']['connectionId']
+    domain_name = event['requestContext']['domainName']
+    stage = event['requestContext']['stage']
+    
+    try:
+        body = json.loads(event.get('body') or '{}')
+        after_seq = int(body.get('last_seq') or 0)
+    except (ValueError, TypeError):
+        return {'statusCode': 400, 'body': json.dumps('Invalid last_seq')}
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # The user comes from the connection, never from the frame
+            cur.execute("""
+                SELECT user_id, encoding
+                FROM connections
+                WHERE connection_id = %s
+            """, (connection_id,))
+            connection = cur.fetchone()
+            if not connection:
+                return {'statusCode': 404, 'body': json.dumps('Connection not found')}
+            
+            messages, last_seq, resync = delivery_log.replay(cur, connection['user_id'], after_seq, REPLAY_MAX_EVENTS + 1)
+            if len(messages) > REPLAY_MAX_EVENTS:
+                messages, resync = [], True
+            
+            cur.execute("""
+                SELECT unread_count
+                FROM notification_counter
+                WHERE user_id = %s
+            """, (connection['user_id'],))
+            counter = cur.fetchone()
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        return {'statusCode': 500, 'body': json.dumps('Failed to replay')}
+    finally:
+        conn.close()
+    
+    api_client = boto3.client('apigatewaymanagementapi', endpoint_url=f'https://{domain_name}/{stage}')
+    frames = build_frames(messages, last_seq, resync, counter['unread_count'] if counter else 0, connection['encoding'])
+    try:
+        for frame in frames:
+            api_client.post_to_connection(ConnectionId=connection_id, Data=frame)
+    except ClientError as e:
+        print(f"Error replaying to {connection_id}: {e}")
+        return {'statusCode': 500, 'body': json.dumps('Failed to replay')}
+    
+    return {'statusCode': 200, 'body': json.dumps({'replayed': len(messages), 'frames': len(frames)})}
+
+def build_frames(messages, last_seq, resync, unread_count, encoding):
+    """
+    Encode the replay as one frame, or several under FRAME_MAX_BYTES each. Only the
+    final frame has complete set; clients apply events in order and skip any seq
+    they already hold.
+    """
+    def replay_frame(events, complete):
+        return encode({
+            'type': 'replay',
+            'events': events,
+            'last_seq': last_seq,
+            'resync': resync,
+            'complete': complete,
+            'unread_count': unread_count
+        }, encoding)
+    
+    frames = []
+    batch = []
+    batch_bytes = 0
+    for message in messages:
+        size = len(encode(message, encoding)) + 1
+        if batch and batch_bytes + size > FRAME_MAX_BYTES:
+            frames.append(replay_frame(batch, False))
+            batch = []
+            batch_bytes = 0
+        batch.append(message)
+        batch_bytes += size
+    frames.append(replay_frame(batch, True))
+    return frames
@@ -0,0 +1,100 @@
+"""
+Fixtures for integration tests that run handlers and queries against Postgres.
+DB_HOST, POSTGRES_USER and POSTGRES_PASSWORD must point at a server where the
+user may create databases; each test module gets a freshly migrated scratch
+database, which the handlers reach through PGDATABASE. Without DB_HOST the
+tests that need a database are skipped.
+"""
+import os
+import uuid
+
+import pytest
+
+from tests.integration.support import connect
+
+DATABASE_CONFIGURED = 'DB_HOST' in os.environ
+
+# The handler modules read their configuration on import, before the test modules are collected
+for name, value in {'DB_HOST': 'localhost', 'POSTGRES_USER': 'postgres', 'POSTGRES_PASSWORD': '',
+                    'JWT_SECRET': 'test', 'AWS_REGION': 'us-east-1', 'COGNITO_USER_POOL_ID': 'test',
+                    'DB_NAME': 'postgres'}.items():
+    os.environ.setdefault(name, value)
+
+BASE_SQL = """
+    INSERT INTO role (name) VALUES ('Staff');
+
+    INSERT INTO department (name) VALUES ('Kitchen'), ('Bar');
+
+    -- User 1 is a manager; 2-4 work in the kitchen, 5-6 in the bar and 2 in both
+    INSERT INTO "user" (first_name, last_name, email, role_id, is_manager, password)
+    SELECT 'First' || u, 'Last' || u, 'user' || u || '@example.com', 1, u = 1, 'x'
+    FROM generate_series(1, 6) u;
+
+    INSERT INTO department_group (department_id, user_id)
+    VALUES (1, 1), (1, 2), (1, 3), (1, 4), (2, 2), (2, 5), (2, 6);
+"""
+
+
+def pytest_collection_modifyitems(config, items):
+    if DATABASE_CONFIGURED:
+        return
+    skip = pytest.mark.skip(reason='DB_HOST is not set')
+    for item in items:
+        if 'scratch_database' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='module')
+def scratch_database():
+    """ Create and migrate a scratch database and point the handlers at it """
+    from functions.migrations.migrate import migrate
+
+    database = f"wchat_test_{uuid.uuid4().hex[:8]}"
+    admin = connect('postgres')
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f'CREATE DATABASE "{database}"')
+
+    previous = os.environ.get('PGDATABASE')
+    os.environ['PGDATABASE'] = database
+    try:
+        conn = connect(database)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        yield database
+    finally:
+        if previous is None:
+            os.environ.pop('PGDATABASE', None)
+        else:
+            os.environ['PGDATABASE'] = previous
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+        admin.close()
+
+
+@pytest.fixture
+def db(scratch_database):
+    """ An autocommit connection to the scratch database, emptied and given the base rows """
+    conn = connect(scratch_database)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT string_agg(format('%I', tablename), ', ')
+            FROM pg_tables
+            WHERE schemaname = current_schema() AND tablename <> 'schema_migrations'
+        """)
+        cur.execute(f"TRUNCATE {cur.fetchone()[0]} RESTART IDENTITY CASCADE")
+        cur.execute(BASE_SQL)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def other_db(db, scratch_database):
+    """ A second connection to the scratch database, e.g. to hold locks while a handler runs """
+    conn = connect(scratch_database)
+    yield conn
+    conn.rollback()
+    conn.close()
@@ -0,0 +1,24 @@
+""" Helpers shared by the integration tests """
+import json
+import os
+
+import jwt
+import psycopg2
+
+
+def connect(database):
+    return psycopg2.connect(host=os.environ['DB_HOST'], user=os.environ['POSTGRES_USER'],
+                            password=os.environ['POSTGRES_PASSWORD'], dbname=database)
+
+
+def api_event(method, user_id, body=None, path='/', path_params=None, query=None, headers=None):
+    """ An API Gateway proxy event from a user holding a valid token """
+    token = jwt.encode({'user_id': user_id}, os.environ['JWT_SECRET'], algorithm='HS256')
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': {'Authorization': f'Bearer {token}', **(headers or {})},
+        'pathParameters': path_params,
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None
+    }
@@ -0,0 +1,101 @@
+""" Calendar feed tokens, the iCalendar feed and its ETag and Last-Modified revalidation """
+import json
+
+import pytest
+
+from functions.shift import calendar_feed
+from tests.integration.support import api_event
+
+USER_ID = 3
+
+
+def add_shift(db, days_ahead=1):
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+            VALUES (CURRENT_TIMESTAMP + make_interval(days => %s),
+                    CURRENT_TIMESTAMP + make_interval(days => %s, hours => 8), 1, 1, %s, 'scheduled')
+            RETURNING id
+        """, (days_ahead, days_ahead, USER_ID))
+        return cur.fetchone()[0]
+
+
+def issue(user_id=USER_ID, token_user_id=USER_ID):
+    return calendar_feed.lambda_handler(api_event('POST', token_user_id, path_params={'id': str(user_id)}), None)
+
+
+@pytest.fixture
+def token(db):
+    result = issue()
+    assert result['statusCode'] == 201, result['body']
+    return json.loads(result['body'])['token']
+
+
+def fetch(token, **headers):
+    # Calendar apps send the token alone, without an Authorization header
+    return calendar_feed.lambda_handler({
+        'httpMethod': 'GET',
+        'headers': {name.replace('_', '-'): value for name, value in headers.items()},
+        'pathParameters': {'token': f'{token}.ics'}
+    }, None)
+
+
+def test_feed_lists_the_users_shifts(db, token):
+    shift_id = add_shift(db)
+
+    result = fetch(token)
+
+    assert result['statusCode'] == 200
+    assert result['headers']['Content-Type'] == 'text/calendar; charset=utf-8'
+    assert result['body'].startswith('BEGIN:VCALENDAR\r\n')
+    assert f'UID:shift-{shift_id}@wchat\r\n' in result['body']
+    assert 'SUMMARY:Shift: Kitchen\r\n' in result['body']
+
+
+def test_unchanged_feed_is_not_modified(db, token):
+    add_shift(db)
+    headers = fetch(token)['headers']
+
+    by_etag = fetch(token, If_None_Match=headers['ETag'])
+    by_date = fetch(token, If_Modified_Since=headers['Last-Modified'])
+
+    for result in (by_etag, by_date):
+        assert result['statusCode'] == 304
+        assert result['body'] == ''
+        assert result['headers']['ETag'] == headers['ETag']
+
+
+def test_if_none_match_takes_precedence(db, token):
+    headers = fetch(token)['headers']
+
+    result = fetch(token, If_None_Match='"stale"', If_Modified_Since=headers['Last-Modified'])
+
+    assert result['statusCode'] == 200
+
+
+def test_older_or_invalid_if_modified_since_gets_the_feed(db, token):
+    assert fetch(token, If_Modified_Since='Mon, 01 Jan 2001 00:00:00 GMT')['statusCode'] == 200
+    assert fetch(token, If_Modified_Since='yesterday')['statusCode'] == 200
+
+
+def test_shift_change_changes_the_etag(db, token):
+    etag = fetch(token)['headers']['ETag']
+
+    shift_id = add_shift(db)
+    result = fetch(token, If_None_Match=etag)
+
+    assert result['statusCode'] == 200
+    assert f'UID:shift-{shift_id}@wchat' in result['body']
+    assert result['headers']['ETag'] != etag
+
+
+def test_reissued_or_revoked_token_stops_working(db, token):
+    assert issue(token_user_id=4)['statusCode'] == 403
+
+    new_token = json.loads(issue()['body'])['token']
+    assert fetch(token)['statusCode'] == 404
+    assert fetch(new_token)['statusCode'] == 200
+
+    revoked = calendar_feed.lambda_handler(api_event('DELETE', USER_ID, path_params={'id': str(USER_ID)}), None)
+    assert revoked['statusCode'] == 200
+    assert fetch(new_token)['statusCode'] == 404
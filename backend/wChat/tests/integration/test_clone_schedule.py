@@ -0,0 +1,106 @@
+"""
+Copying a week of shifts classifies each copied assignment against the user's
+time off, other shifts and availability
+"""
+import json
+
+import pytest
+
+from functions.shift import clone_schedule
+from tests.integration.support import api_event
+
+# Source week, Monday to Sunday; copies land a week later
+SOURCE_WEEK = ('2030-03-04', '2030-03-10')
+
+
+@pytest.fixture
+def source_shifts(db):
+    """ Kitchen shifts keyed by what should happen to their copy """
+    shifts = {
+        'time_off': ('2030-03-04', 2, 'scheduled'),
+        'already_scheduled': ('2030-03-05', 3, 'scheduled'),
+        'unavailable': ('2030-03-06', 4, 'scheduled'),
+        'clean': ('2030-03-07', 4, 'scheduled'),
+        'open': ('2030-03-08', None, 'scheduled'),
+        'cancelled': ('2030-03-09', 3, 'cancelled'),
+    }
+    ids = {}
+    with db.cursor() as cur:
+        for name, (day, user_id, status) in shifts.items():
+            cur.execute("""
+                INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+                VALUES ((%s::date + time '09:00') AT TIME ZONE 'UTC', (%s::date + time '17:00') AT TIME ZONE 'UTC', 1, 1, %s, %s)
+                RETURNING id
+            """, (day, day, user_id, status))
+            ids[name] = cur.fetchone()[0]
+
+        # User 2 is off on the Monday the copy lands on
+        cur.execute("""
+            INSERT INTO time_off_request (user_id, start_date, end_date, request_type, status)
+            VALUES (2, '2030-03-11', '2030-03-11', 'vacation', 'approved')
+        """)
+        # User 3 already works part of the Tuesday
+        cur.execute("""
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+            VALUES ('2030-03-12 10:00+00', '2030-03-12 12:00+00', 1, 1, 3, 'scheduled')
+        """)
+        # User 4 is only available Wednesday afternoons and recorded nothing for Thursday
+        cur.execute("""
+            INSERT INTO availability (user_id, day, is_available, start_time, end_time)
+            VALUES (4, 3, true, '12:00', '20:00')
+        """)
+    return ids
+
+
+def clone():
+    result = clone_schedule.lambda_handler(api_event('POST', 1, body={
+        'department_id': 1,
+        'start_date': SOURCE_WEEK[0],
+        'end_date': SOURCE_WEEK[1],
+        'days': 7,
+        'scheduled_by_id': 1
+    }), None)
+    assert result['statusCode'] == 201, result['body']
+    return json.loads(result['body'])
+
+
+def test_conflicts_are_classified(db, source_shifts):
+    result = clone()
+
+    assert result['created'] == 5
+    reasons = {skipped['source_shift_id']: skipped['reason'] for skipped in result['skipped']}
+    assert reasons == {
+        source_shifts['time_off']: 'time_off',
+        source_shifts['already_scheduled']: 'already_scheduled',
+        source_shifts['unavailable']: 'unavailable',
+    }
+
+    with db.cursor() as cur:
+        cur.execute("SELECT cloned_from_id, user_id FROM shift WHERE cloned_from_id IS NOT NULL")
+        assignments = dict(cur.fetchall())
+    # Conflicting copies are left open; the rest keep their user
+    assert assignments == {
+        source_shifts['time_off']: None,
+        source_shifts['already_scheduled']: None,
+        source_shifts['unavailable']: None,
+        source_shifts['clean']: 4,
+        source_shifts['open']: None,
+    }
+
+
+def test_cancelled_shifts_are_not_copied(db, source_shifts):
+    clone()
+
+    with db.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM shift WHERE cloned_from_id = %s", (source_shifts['cancelled'],))
+        assert cur.fetchone()[0] == 0
+
+
+def test_repeating_a_clone_creates_nothing(db, source_shifts):
+    first = clone()
+    second = clone()
+
+    assert second == {'created': 0, 'ids': [], 'skipped': []}
+    with db.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM shift WHERE cloned_from_id IS NOT NULL")
+        assert cur.fetchone()[0] == first['created']
@@ -0,0 +1,119 @@
+""" The stored department week schedule, kept current by the shift triggers, and its ETag revalidation """
+import json
+
+from functions.shift import department_schedule
+from tests.integration.support import api_event
+
+WEEK_START = '2030-03-04'
+
+
+def add_shift(db, start, user_id=3):
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, role_id, user_id, status)
+            VALUES (%s, %s::timestamptz + interval '8 hours', 1, 1, 1, %s, 'scheduled')
+            RETURNING id
+        """, (start, start, user_id))
+        return cur.fetchone()[0]
+
+
+def cached(db, department_id=1, week_start=WEEK_START):
+    with db.cursor() as cur:
+        cur.execute("""
+            SELECT document, etag
+            FROM cached_department_week_schedule(%s, %s)
+        """, (department_id, week_start))
+        return cur.fetchone()
+
+
+def schedule(user_id=2, department_id=1, etag=None, week='2030-03-06'):
+    headers = {'If-None-Match': etag} if etag else None
+    return department_schedule.lambda_handler(api_event(
+        'GET', user_id, path_params={'id': str(department_id)}, query={'week': week}, headers=headers), None)
+
+
+def test_cached_schedule_is_built_on_first_read(db):
+    shift_id = add_shift(db, '2030-03-05 09:00+00')
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM department_week_schedule")
+
+    document, etag = cached(db)
+
+    assert [shift['id'] for shift in json.loads(document)['shifts']] == [shift_id]
+    assert cached(db) == (document, etag)
+    assert cached(db, department_id=99) is None
+
+
+def test_shift_writes_refresh_the_week(db):
+    first = add_shift(db, '2030-03-05 09:00+00')
+    _, etag = cached(db)
+
+    second = add_shift(db, '2030-03-07 09:00+00')
+    document, changed = cached(db)
+    assert changed != etag
+    assert [shift['id'] for shift in json.loads(document)['shifts']] == [first, second]
+
+    # Moving a shift to the next week refreshes both weeks
+    with db.cursor() as cur:
+        cur.execute("""
+            UPDATE shift
+            SET start_time = start_time + interval '7 days', end_time = end_time + interval '7 days'
+            WHERE id = %s
+        """, (second,))
+    assert [shift['id'] for shift in json.loads(cached(db)[0])['shifts']] == [first]
+    assert [shift['id'] for shift in json.loads(cached(db, week_start='2030-03-11')[0])['shifts']] == [second]
+
+
+def test_shift_in_another_week_leaves_the_etag(db):
+    add_shift(db, '2030-03-05 09:00+00')
+    _, etag = cached(db)
+
+    add_shift(db, '2030-03-12 09:00+00')
+
+    assert cached(db)[1] == etag
+
+
+def test_renaming_a_user_rebuilds_the_week(db):
+    add_shift(db, '2030-03-05 09:00+00')
+    _, etag = cached(db)
+    with db.cursor() as cur:
+        cur.execute("""UPDATE "user" SET first_name = 'Renamed' WHERE id = 3""")
+
+    document, changed = cached(db)
+    assert changed != etag
+    assert json.loads(document)['shifts'][0]['user_first_name'] == 'Renamed'
+
+
+def test_renaming_a_role_rebuilds_the_week(db):
+    add_shift(db, '2030-03-05 09:00+00')
+    _, etag = cached(db)
+    with db.cursor() as cur:
+        cur.execute("UPDATE role SET name = 'Chef' WHERE id = 1")
+
+    document, changed = cached(db)
+    assert changed != etag
+    assert json.loads(document)['shifts'][0]['role'] == 'Chef'
+
+
+def test_unchanged_schedule_is_not_modified(db):
+    add_shift(db, '2030-03-05 09:00+00')
+    result = schedule()
+    assert result['statusCode'] == 200
+    assert json.loads(result['body'])['week_start'] == WEEK_START
+    etag = result['headers']['ETag']
+
+    result = schedule(etag=etag)
+    assert result['statusCode'] == 304
+    assert result['body'] == ''
+
+    add_shift(db, '2030-03-06 09:00+00', user_id=4)
+    result = schedule(etag=etag)
+    assert result['statusCode'] == 200
+    assert result['headers']['ETag'] != etag
+
+
+def test_schedule_is_only_shown_to_members_and_managers(db):
+    assert schedule(user_id=5)['statusCode'] == 403
+    assert schedule(user_id=1, department_id=2)['statusCode'] == 200
+    assert schedule(department_id=99)['statusCode'] == 404
+    assert schedule(week='next week')['statusCode'] == 400
@@ -0,0 +1,97 @@
+""" Marking notifications read through the per-user read watermark """
+import json
+
+from psycopg2.extras import RealDictCursor
+
+from functions.notifications import notification_functions
+from functions.notifications.python.notification_service import COUNTED_INSERT, NotificationService
+from tests.integration.support import api_event
+
+USER_ID = 2
+
+
+def notify(count):
+    service = NotificationService()
+    return [service.create_notification(USER_ID, f'Notification {n}') for n in range(count)]
+
+
+def mark_read(**body):
+    result = notification_functions.lambda_handler(
+        api_event('PUT', USER_ID, body={'userId': USER_ID, **body}), None)
+    assert result['statusCode'] == 200, result['body']
+    return json.loads(result['body'])
+
+
+def unread():
+    # (unread count, ids of the unread notifications, newest first)
+    result = notification_functions.lambda_handler(
+        api_event('GET', USER_ID, query={'userId': str(USER_ID), 'unreadOnly': 'true'}), None)
+    assert result['statusCode'] == 200, result['body']
+    body = json.loads(result['body'])
+    return body['unreadCount'], [n['id'] for n in body['notifications']]
+
+
+def test_mark_all_moves_watermark_past_everything(db):
+    ids = notify(3)
+
+    result = mark_read()
+
+    assert result['markedCount'] == 3
+    assert result['readWatermark'] == max(ids)
+    assert unread() == (0, [])
+
+
+def test_mark_up_to_leaves_later_notifications_unread(db):
+    ids = notify(3)
+
+    result = mark_read(upToId=ids[1])
+
+    assert result['markedCount'] == 2
+    assert result['readWatermark'] == ids[1]
+    assert unread() == (1, [ids[2]])
+
+
+def test_up_to_id_is_capped_at_the_newest_notification(db):
+    ids = notify(2)
+
+    result = mark_read(upToId=max(ids) + 1000)
+    later = notify(1)
+
+    assert result['readWatermark'] == max(ids)
+    assert unread() == (1, later)
+
+
+def test_mark_specific_ids_only_counts_unread_rows(db):
+    ids = notify(3)
+
+    assert mark_read(notificationIds=[ids[1]])['updatedIds'] == [ids[1]]
+    assert mark_read(notificationIds=[ids[1]])['updatedIds'] == []
+    assert unread() == (2, [ids[2], ids[0]])
+
+
+def test_ids_below_the_watermark_are_not_counted_twice(db):
+    ids = notify(2)
+    mark_read()
+
+    assert mark_read(notificationIds=ids)['updatedIds'] == []
+    assert unread() == (0, [])
+
+
+def test_notification_committed_after_mark_all_is_not_left_unread(db):
+    # Its id is drawn before the newest notification's, but it commits after
+    # the mark-all-read that moved the watermark past it
+    with db.cursor() as cur:
+        cur.execute("SELECT nextval(pg_get_serial_sequence('notification', 'id'))")
+        late_id = cur.fetchone()[0]
+    notify(1)
+    mark_read()
+
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(COUNTED_INSERT.format(insert="""
+            INSERT INTO notification (id, user_id, content, time_stamp)
+            VALUES (%s, %s, 'Late', CURRENT_TIMESTAMP)
+        """), (late_id, USER_ID))
+
+    assert unread() == (0, [])
+    assert mark_read()['markedCount'] == 0
+    assert unread() == (0, [])
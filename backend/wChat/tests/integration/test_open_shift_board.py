@@ -0,0 +1,63 @@
+""" The open-shift board and its ETag revalidation """
+import json
+
+import pytest
+
+from functions.shift import department_available_shifts
+from tests.integration.support import api_event
+
+
+@pytest.fixture
+def open_shift(db):
+    """ An unassigned kitchen shift ahead of now, and an assigned one """
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+            VALUES (CURRENT_TIMESTAMP + interval '1 day', CURRENT_TIMESTAMP + interval '1 day 8 hours', 1, 1, NULL, 'scheduled'),
+                   (CURRENT_TIMESTAMP + interval '2 days', CURRENT_TIMESTAMP + interval '2 days 8 hours', 1, 1, 3, 'scheduled')
+            RETURNING id
+        """)
+        return cur.fetchone()[0]
+
+
+def board(user_id=2, department_id=1, etag=None):
+    headers = {'If-None-Match': etag} if etag else None
+    return department_available_shifts.lambda_handler(
+        api_event('GET', user_id, path_params={'id': str(department_id)}, headers=headers), None)
+
+
+def test_board_lists_open_shifts_with_an_etag(open_shift):
+    result = board()
+
+    assert result['statusCode'] == 200
+    assert result['headers']['ETag'].startswith('"')
+    document = json.loads(result['body'])
+    assert document['department_name'] == 'Kitchen'
+    assert [shift['id'] for shift in document['shifts']] == [open_shift]
+
+
+def test_unchanged_board_is_not_modified(open_shift):
+    etag = board()['headers']['ETag']
+
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        result = board(etag=if_none_match)
+        assert result['statusCode'] == 304
+        assert result['body'] == ''
+        assert result['headers']['ETag'] == etag
+
+
+def test_etag_changes_with_the_board(db, open_shift):
+    etag = board()['headers']['ETag']
+    with db.cursor() as cur:
+        cur.execute("UPDATE shift SET user_id = 3 WHERE id = %s", (open_shift,))
+
+    result = board(etag=etag)
+    assert result['statusCode'] == 200
+    assert result['headers']['ETag'] != etag
+    assert json.loads(result['body'])['shifts'] == []
+
+
+def test_board_is_only_shown_to_members_and_managers(open_shift):
+    assert board(user_id=5)['statusCode'] == 403
+    assert board(user_id=1, department_id=2)['statusCode'] == 200
+    assert board(department_id=99)['statusCode'] == 404
@@ -0,0 +1,229 @@
+"""
+Plan checks for the hot queries, run on a scratch database filled with a
+synthetic dataset (see conftest.py for the server they need).
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from functions.message.message_functions import CONVERSATION_MESSAGES
+from functions.notifications.notification_functions import (
+    HOT_WINDOW_DAYS, feed_query, mark_all_read_query)
+from functions.notifications.python.websocket_service import (
+    CHANNELS_CONNECTIONS, USERS_CONNECTIONS)
+from functions.shift.all_shifts import SHIFTS_PAGE, shift_filters
+from functions.shift.department_available_shifts import OPEN_SHIFT_BOARD
+from functions.shift.department_schedule import DEPARTMENT_WEEK_SCHEDULE
+from functions.shift.shift_exchange import AVAILABLE_SHIFTS
+from functions.shift.shift_functions import SHIFT_CONFLICT
+from functions.shift.user_shifts import user_shifts_query
+from functions.websockets.broadcast import USER_CONNECTIONS
+from functions.websockets.presence_sweeper import (
+    BATCH_SIZE, CONNECTION_EXPIRY_MINUTES, SWEEP_BATCH)
+from tests.integration.support import connect
+
+SEED_SQL = """
+    INSERT INTO role (name) VALUES ('Staff');
+
+    INSERT INTO department (name)
+    SELECT 'Department ' || d FROM generate_series(1, 20) d;
+
+    INSERT INTO "user" (first_name, last_name, email, role_id, is_manager, password)
+    SELECT 'First' || u, 'Last' || u, 'user' || u || '@example.com', 1, u % 50 = 0, 'x'
+    FROM generate_series(1, 2000) u;
+
+    INSERT INTO department_group (department_id, user_id)
+    SELECT (u % 20) + 1, u FROM generate_series(1, 2000) u;
+
+    INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+    SELECT start_time, start_time + interval '8 hours', 50, (s % 20) + 1,
+           CASE WHEN s % 10 = 0 THEN NULL ELSE (s % 2000) + 1 END,
+           CASE WHEN s % 25 = 0 THEN 'available_for_exchange' ELSE 'scheduled' END
+    FROM (
+        SELECT s, CURRENT_TIMESTAMP - interval '365 days' + (s % 730) * interval '1 day' AS start_time
+        FROM generate_series(1, 100000) s
+    ) shifts;
+
+    INSERT INTO message (content, time_stamp, sent_by_user_id, received_by_user_id)
+    SELECT 'Message ' || m, CURRENT_TIMESTAMP - m * interval '1 minute',
+           (m % 2000) + 1, ((m * 7) % 2000) + 1
+    FROM generate_series(1, 200000) m;
+
+    SELECT ensure_notification_partitions((CURRENT_TIMESTAMP - interval '200 days')::date, CURRENT_DATE);
+
+    INSERT INTO notification (user_id, content, time_stamp, is_read)
+    SELECT (n % 2000) + 1, 'Notification ' || n, CURRENT_TIMESTAMP - n * interval '1 minute', n % 5 <> 0
+    FROM generate_series(1, 200000) n;
+
+    INSERT INTO notification_broadcast (department_id, content, time_stamp)
+    SELECT (b % 20) + 1, 'Broadcast ' || b, CURRENT_TIMESTAMP - b * interval '1 hour'
+    FROM generate_series(1, 2000) b;
+
+    INSERT INTO notification_delivery (user_id, broadcast_id)
+    SELECT g.user_id, b.id
+    FROM notification_broadcast b
+    JOIN department_group g ON g.department_id = b.department_id;
+
+    INSERT INTO connections (connection_id, user_id, last_seen)
+    SELECT 'conn-' || c, (c % 2000) + 1, CURRENT_TIMESTAMP - (c % 600) * interval '1 minute'
+    FROM generate_series(1, 3000) c;
+
+    INSERT INTO connection_channel (channel, connection_id)
+    SELECT 'department:' || g.department_id, c.connection_id
+    FROM connections c
+    JOIN department_group g ON g.user_id = c.user_id;
+"""
+
+NOW = datetime.now(timezone.utc)
+
+# (description, table that must be read through an index, query, params), with
+# the SQL taken from the handlers themselves
+HANDLER_QUERIES = [
+    ('get_messages', 'message', CONVERSATION_MESSAGES, (1, 8, 8, 1)),
+    ('get_notifications page', 'notification', feed_query(unread_only=False, hot_window=True), {
+        'user_id': 42, 'window': 50, 'limit': 50, 'offset': 0,
+        'since': NOW - timedelta(days=HOT_WINDOW_DAYS), 'watermark': 0
+    }),
+    ('get_notifications unread page', 'notification', feed_query(unread_only=True, hot_window=True), {
+        'user_id': 42, 'window': 50, 'limit': 50, 'offset': 0,
+        'since': NOW - timedelta(days=HOT_WINDOW_DAYS), 'watermark': 0
+    }),
+    ('get_notifications broadcasts', 'notification_delivery', feed_query(unread_only=False, hot_window=True), {
+        'user_id': 42, 'window': 50, 'limit': 50, 'offset': 0,
+        'since': NOW - timedelta(days=HOT_WINDOW_DAYS), 'watermark': 0
+    }),
+    ('mark all notifications read', 'notification', mark_all_read_query(up_to=False),
+     {'user_id': 42, 'up_to_id': None}),
+    ('get_user_shifts page', 'shift', *user_shifts_query(
+        42, NOW - timedelta(days=30), NOW + timedelta(days=30), (NOW - timedelta(days=7), 0), 101)),
+    ('all_shifts by department and status', 'shift',
+     SHIFTS_PAGE.format(filters=shift_filters(department_id=3, status='available_for_exchange', start_date=NOW)[0]),
+     shift_filters(department_id=3, status='available_for_exchange', start_date=NOW)[1] + [100, 0]),
+    ('shift conflict probe', 'shift', SHIFT_CONFLICT, (42, NOW, NOW + timedelta(hours=8), None)),
+    ('open shift board', 'shift', OPEN_SHIFT_BOARD, {'department_id': 3, 'user_id': 42}),
+    ('department week schedule', 'department_week_schedule', DEPARTMENT_WEEK_SCHEDULE, {
+        'department_id': 3, 'user_id': 42, 'week_start': NOW.date() - timedelta(days=NOW.weekday())
+    }),
+    ('send_websocket_message connections', 'connections', USER_CONNECTIONS, (42,)),
+    ('outbox fan-out connections', 'connections', USERS_CONNECTIONS, ([42, 43],)),
+    ('send_to_channels connections', 'connection_channel', CHANNELS_CONNECTIONS, (['department:3'],)),
+    ('online_user', 'connections', 'SELECT user_id FROM online_user', ()),
+    ('presence sweep batch', 'connections', SWEEP_BATCH, (CONNECTION_EXPIRY_MINUTES, BATCH_SIZE)),
+    ('get_available_shifts', 'shift', AVAILABLE_SHIFTS, (42,)),
+]
+
+# EXPLAIN can't see into plpgsql functions, so the queries inside them are
+# copied here and must be kept in step with the migration named
+SQL_FUNCTION_QUERIES = [
+    ('cached_user_schedule next shift (0020)', 'shift', """
+        SELECT jsonb_build_object(
+            'id', s.id,
+            'start_time', s.start_time,
+            'end_time', s.end_time,
+            'status', s.status,
+            'department_name', d.name
+        )
+        FROM shift s
+        JOIN department d ON s.department_id = d.id
+        WHERE s.user_id = %s AND s.start_time > CURRENT_TIMESTAMP
+        ORDER BY s.start_time ASC
+        LIMIT 1
+    """, (42,)),
+    ('refresh_department_week_schedule (0022)', 'shift', """
+        SELECT jsonb_build_object(
+            'department_id', d.id,
+            'department_name', d.name,
+            'week_start', %(week_start)s::date,
+            'shifts', COALESCE(jsonb_agg(jsonb_build_object(
+                'id', s.id,
+                'start_time', s.start_time,
+                'end_time', s.end_time,
+                'status', s.status,
+                'role', r.name,
+                'user_id', s.user_id,
+                'user_first_name', u.first_name,
+                'user_last_name', u.last_name,
+                'scheduled_by_id', s.scheduled_by_id,
+                'scheduled_by_first_name', sb.first_name,
+                'scheduled_by_last_name', sb.last_name
+            ) ORDER BY s.start_time, s.id) FILTER (WHERE s.id IS NOT NULL), '[]'::jsonb)
+        )::text AS document
+        FROM department d
+        LEFT JOIN shift s ON s.department_id = d.id
+            AND s.start_time >= %(week_start)s::date::TIMESTAMP AT TIME ZONE 'UTC'
+            AND s.start_time < (%(week_start)s::date + 7)::TIMESTAMP AT TIME ZONE 'UTC'
+        LEFT JOIN role r ON r.id = s.role_id
+        LEFT JOIN "user" u ON u.id = s.user_id
+        LEFT JOIN "user" sb ON sb.id = s.scheduled_by_id
+        WHERE d.id = %(department_id)s
+        GROUP BY d.id, d.name
+    """, {'department_id': 3, 'week_start': NOW.date() - timedelta(days=NOW.weekday())}),
+]
+
+
+def reads_table(node, table):
+    # Partitioned tables show up as their monthly partitions, e.g. notification_2026_10
+    relation = node.get('Relation Name')
+    return relation == table or re.fullmatch(rf'{table}_\d{{4}}_\d{{2}}', relation or '') is not None
+
+
+def iter_plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+
+@pytest.fixture(scope='module')
+def seeded_connection(scratch_database):
+    """ The scratch database loaded with the synthetic dataset """
+    conn = connect(scratch_database)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SEED_SQL)
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute('VACUUM ANALYZE')
+        yield conn
+    finally:
+        conn.close()
+
+
+class TestQueryPlans:
+
+    @pytest.mark.parametrize('description,table,query,params', HANDLER_QUERIES + SQL_FUNCTION_QUERIES,
+                             ids=[q[0] for q in HANDLER_QUERIES + SQL_FUNCTION_QUERIES])
+    def test_handler_query_uses_index(self, seeded_connection, description, table, query, params):
+        """ Every hot handler query reads its table through an index, never a sequential scan """
+        with seeded_connection.cursor() as cur:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + query, params)
+            plan = cur.fetchone()[0][0]['Plan']
+
+            # A sequential scan of an empty (future) partition costs nothing and is expected
+            cur.execute("SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples = 0")
+            empty = {row[0] for row in cur.fetchall()}
+
+        scans = [node for node in iter_plan_nodes(plan)
+                 if reads_table(node, table) and node['Relation Name'] not in empty]
+
+        assert scans, f"{description} does not read {table}"
+        assert all(node['Node Type'] != 'Seq Scan' for node in scans), \
+            f"{description} sequentially scans {table}"
+
+    def test_get_notifications_is_partition_pruned(self, seeded_connection):
+        """ The handler's hot-window page only reads the partitions that overlap the window """
+        since = datetime.now(timezone.utc) - timedelta(days=HOT_WINDOW_DAYS)
+        with seeded_connection.cursor() as cur:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + feed_query(unread_only=False, hot_window=True), {
+                'user_id': 42, 'window': 50, 'limit': 50, 'offset': 0, 'since': since, 'watermark': 0
+            })
+            plan = cur.fetchone()[0][0]['Plan']
+            cur.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'notification'::regclass")
+            partition_count = cur.fetchone()[0]
+        first_needed = f"notification_{since:%Y_%m}"
+
+        scanned = {node['Relation Name'] for node in iter_plan_nodes(plan) if reads_table(node, 'notification')}
+
+        assert scanned and len(scanned) < partition_count
+        assert all(partition >= first_needed for partition in scanned)
@@ -0,0 +1,106 @@
+""" Picking up open shifts through pickup_shift, including while another pickup holds the shift """
+import json
+
+from functions.shift import shift_exchange
+from tests.integration.support import api_event
+
+
+def add_shift(db, user_id=None, status='scheduled', department_id=1, start='2030-03-04 09:00+00',
+              end='2030-03-04 17:00+00'):
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO shift (start_time, end_time, scheduled_by_id, department_id, user_id, status)
+            VALUES (%s, %s, 1, %s, %s, %s)
+            RETURNING id
+        """, (start, end, department_id, user_id, status))
+        return cur.fetchone()[0]
+
+
+def assigned_user(db, shift_id):
+    with db.cursor() as cur:
+        cur.execute("SELECT user_id FROM shift WHERE id = %s", (shift_id,))
+        return cur.fetchone()[0]
+
+
+def pickup(user_id, shift_id):
+    result = shift_exchange.lambda_handler(
+        api_event('POST', user_id, body={'shift_id': shift_id}, path='/shifts/pickup'), None)
+    return result['statusCode'], json.loads(result['body'])
+
+
+def test_open_shift_is_picked_up(db):
+    shift_id = add_shift(db)
+
+    assert pickup(3, shift_id) == (200, {'message': 'Shift successfully picked up', 'outcome': 'picked_up'})
+    assert assigned_user(db, shift_id) == 3
+
+
+def test_shift_held_by_another_pickup_is_contended(db, other_db):
+    shift_id = add_shift(db)
+    with other_db.cursor() as cur:
+        cur.execute("SELECT id FROM shift WHERE id = %s FOR UPDATE", (shift_id,))
+
+    status, body = pickup(3, shift_id)
+    assert status == 409
+    assert body['outcome'] == 'contended'
+    assert assigned_user(db, shift_id) is None
+
+    other_db.rollback()
+    assert pickup(3, shift_id)[0] == 200
+
+
+def test_second_pickup_finds_the_shift_taken(db):
+    shift_id = add_shift(db)
+    pickup(3, shift_id)
+
+    status, body = pickup(4, shift_id)
+    assert status == 409
+    assert body['outcome'] == 'not_available'
+    assert assigned_user(db, shift_id) == 3
+
+
+def test_overlapping_shift_is_a_conflict(db):
+    shift_id = add_shift(db)
+    own_shift_id = add_shift(db, user_id=3, start='2030-03-04 16:00+00', end='2030-03-04 20:00+00')
+
+    status, body = pickup(3, shift_id)
+    assert status == 409
+    assert body['outcome'] == 'conflict'
+    assert body['conflicting_shift_id'] == own_shift_id
+    assert assigned_user(db, shift_id) is None
+
+
+def test_picker_outside_the_department_is_refused(db):
+    shift_id = add_shift(db)
+
+    status, body = pickup(5, shift_id)
+    assert status == 403
+    assert body['outcome'] == 'not_in_department'
+
+
+def test_offered_shift_moves_to_the_picker(db):
+    shift_id = add_shift(db, user_id=4, status='available_for_exchange')
+
+    assert pickup(3, shift_id)[0] == 200
+    assert assigned_user(db, shift_id) == 3
+    with db.cursor() as cur:
+        cur.execute("SELECT content FROM notification WHERE user_id = 4")
+        assert [row[0] for row in cur.fetchall()] == ['Your shift on March 04, 2030 has been picked up']
+
+
+def schedule_updates(db):
+    with db.cursor() as cur:
+        cur.execute("SELECT payload FROM outbox WHERE event_type = 'channel' ORDER BY id")
+        return [(row[0]['channel'], row[0]['message']['shift_ids'], row[0]['message']['action'])
+                for row in cur.fetchall()]
+
+
+def test_pickup_and_relinquish_update_the_department_schedule(db):
+    shift_id = add_shift(db)
+
+    pickup(3, shift_id)
+    result = shift_exchange.lambda_handler(
+        api_event('POST', 3, body={'shift_id': shift_id}, path='/shifts/relinquish'), None)
+
+    assert result['statusCode'] == 200, result['body']
+    assert schedule_updates(db) == [('department:1', [shift_id], 'updated')] * 2
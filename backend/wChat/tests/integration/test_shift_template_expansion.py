@@ -0,0 +1,121 @@
+""" The daily shift template expansion only materializes days a template hasn't been expanded for """
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from functions.shift import shift_template_expansion, shift_templates
+from tests.integration.support import api_event
+
+HEADCOUNT = 2
+
+
+@pytest.fixture
+def template_id(db):
+    """ A template for two kitchen shifts every day, 09:00 to 17:00 UTC """
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO shift_template (department_id, role_id, weekdays, start_time, end_time, headcount, created_by_id)
+            VALUES (1, 1, ARRAY[1, 2, 3, 4, 5, 6, 7], '09:00', '17:00', %s, 1)
+            RETURNING id
+        """, (HEADCOUNT,))
+        return cur.fetchone()[0]
+
+
+def expand():
+    result = shift_template_expansion.lambda_handler({}, None)
+    assert result['statusCode'] == 200, result['body']
+    return json.loads(result['body'])['created']
+
+
+def expand_range(start_date, end_date):
+    # The manual /expand endpoint, as the manager
+    result = shift_templates.lambda_handler(api_event(
+        'POST', 1, body={'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()},
+        path='/shift-templates/expand'), None)
+    assert result['statusCode'] == 200, result['body']
+    return json.loads(result['body'])['created']
+
+
+def template_state(db, template_id):
+    with db.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM shift WHERE template_id = %s", (template_id,))
+        count = cur.fetchone()[0]
+        cur.execute("SELECT materialized_through FROM shift_template WHERE id = %s", (template_id,))
+        return count, cur.fetchone()[0]
+
+
+def today():
+    return datetime.now(timezone.utc).date()
+
+
+def test_expanding_twice_creates_nothing_new(db, template_id):
+    days = shift_template_expansion.EXPAND_AHEAD_DAYS + 1
+
+    assert expand() == days * HEADCOUNT
+    assert expand() == 0
+    assert template_state(db, template_id) == (days * HEADCOUNT, today() + timedelta(days=days - 1))
+
+
+def test_deleted_and_moved_shifts_are_not_recreated(db, template_id):
+    expand()
+    with db.cursor() as cur:
+        cur.execute("SELECT id FROM shift WHERE template_id = %s ORDER BY start_time, id LIMIT 2", (template_id,))
+        deleted, moved = [row[0] for row in cur.fetchall()]
+        cur.execute("DELETE FROM shift WHERE id = %s", (deleted,))
+        cur.execute("""
+            UPDATE shift
+            SET start_time = start_time + interval '1 hour', end_time = end_time + interval '1 hour'
+            WHERE id = %s
+        """, (moved,))
+    count, _ = template_state(db, template_id)
+
+    assert expand() == 0
+    assert template_state(db, template_id)[0] == count
+
+
+def test_only_days_after_materialized_through_are_added(db, template_id):
+    expand()
+    through = today() + timedelta(days=shift_template_expansion.EXPAND_AHEAD_DAYS)
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM shift WHERE template_id = %s AND start_time >= %s",
+                    (template_id, datetime.combine(through - timedelta(days=2), datetime.min.time(), timezone.utc)))
+        cur.execute("UPDATE shift_template SET materialized_through = %s WHERE id = %s",
+                    (through - timedelta(days=1), template_id))
+
+    # Of the three days removed only the one past materialized_through comes back
+    assert expand() == HEADCOUNT
+    assert template_state(db, template_id)[1] == through
+
+
+def test_template_starting_later_waits_for_valid_from(db, template_id):
+    valid_from = today() + timedelta(days=shift_template_expansion.EXPAND_AHEAD_DAYS + 7)
+    with db.cursor() as cur:
+        cur.execute("UPDATE shift_template SET valid_from = %s WHERE id = %s", (valid_from, template_id))
+
+    assert expand() == 0
+    assert template_state(db, template_id) == (0, None)
+
+
+def test_expanding_a_later_range_fills_the_gap(db, template_id):
+    expand()
+    _, through = template_state(db, template_id)
+
+    # A range starting ten days past materialized_through covers those days too
+    assert expand_range(through + timedelta(days=11), through + timedelta(days=20)) == 20 * HEADCOUNT
+    assert template_state(db, template_id)[1] == through + timedelta(days=20)
+    with db.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(DISTINCT start_time)
+            FROM shift
+            WHERE template_id = %s AND start_time >= %s
+        """, (template_id, datetime.combine(through + timedelta(days=1), datetime.min.time(), timezone.utc)))
+        assert cur.fetchone()[0] == 20
+
+
+def test_first_expansion_of_a_later_range_starts_today(db, template_id):
+    start = today() + timedelta(days=10)
+
+    assert expand_range(start, start + timedelta(days=4)) == 15 * HEADCOUNT
+    assert template_state(db, template_id)[1] == start + timedelta(days=4)
+    assert expand() == (shift_template_expansion.EXPAND_AHEAD_DAYS - 14) * HEADCOUNT
@@ -0,0 +1,64 @@
+""" Broadcasts to department and manager channels, sent as the connection's user """
+import json
+from unittest import mock
+
+import pytest
+
+from functions.websockets import broadcast
+
+
+@pytest.fixture
+def connections(db, scratch_database, monkeypatch):
+    """ One connection per user, subscribed to their channels as $connect would """
+    monkeypatch.setattr(broadcast, 'DB_NAME', scratch_database)
+    with db.cursor() as cur:
+        cur.execute("INSERT INTO connections (connection_id, user_id) SELECT 'c' || id, id FROM \"user\"")
+        cur.execute("""
+            INSERT INTO connection_channel (channel, connection_id)
+            SELECT 'department:' || department_id, 'c' || user_id FROM department_group
+            UNION ALL
+            SELECT 'managers', 'c' || id FROM "user" WHERE is_manager
+        """)
+
+
+def send(connection_id, **frame):
+    # (status code, {connection_id: decoded frame}) for a broadcast frame
+    client = mock.Mock()
+    with mock.patch.object(broadcast.boto3, 'client', return_value=client):
+        result = broadcast.lambda_handler({
+            'requestContext': {'connectionId': connection_id, 'domainName': 'example.com', 'stage': 'test'},
+            'body': json.dumps({'type': 'broadcast', 'content': 'Hello', **frame})
+        }, None)
+    posted = {call.kwargs['ConnectionId']: json.loads(call.kwargs['Data'])
+              for call in client.post_to_connection.call_args_list}
+    return result['statusCode'], posted
+
+
+def test_member_broadcasts_to_their_department(connections):
+    status, posted = send('c5', channel='department:2', sender_id=1)
+
+    assert status == 200
+    assert set(posted) == {'c2', 'c5', 'c6'}
+    # The sender is the connection's user, whatever the frame claims
+    assert {frame['sender_id'] for frame in posted.values()} == {5}
+    assert {frame['channel'] for frame in posted.values()} == {'department:2'}
+
+
+@pytest.mark.parametrize('connection_id,channel', [
+    ('c5', 'department:1'),
+    ('c5', 'managers'),
+    ('c5', None),
+    ('c5', 'department:x'),
+])
+def test_other_channels_are_refused(connections, connection_id, channel):
+    assert send(connection_id, channel=channel) == (403, {})
+
+
+def test_manager_broadcasts_anywhere(connections):
+    assert set(send('c1', channel='department:2')[1]) == {'c2', 'c5', 'c6'}
+    assert set(send('c1', channel='managers')[1]) == {'c1'}
+    assert set(send('c1')[1]) == {f'c{n}' for n in range(1, 7)}
+
+
+def test_unknown_connection_is_refused(connections):
+    assert send('gone', channel='department:2') == (404, {})
@@ -0,0 +1,96 @@
+""" Replaying missed WebSocket frames from the delivery log, or telling the client to resync """
+import json
+from unittest import mock
+
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from functions.notifications.python import delivery_log
+from functions.websockets import replay
+
+USER_ID = 2
+CONNECTION_ID = 'replay-connection'
+
+
+@pytest.fixture
+def frames(db):
+    """ Logs three frames for the user, seq 1 to 3, on a registered connection """
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("INSERT INTO connections (connection_id, user_id) VALUES (%s, %s)", (CONNECTION_ID, USER_ID))
+        return delivery_log.record(cur, [(USER_ID, {'type': 'notification', 'n': n}) for n in range(3)])
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    """ The frames posted to API Gateway, decoded """
+    client = mock.Mock()
+    monkeypatch.setattr(replay.boto3, 'client', mock.Mock(return_value=client))
+    return lambda: [json.loads(call.kwargs['Data']) for call in client.post_to_connection.call_args_list]
+
+
+def replay_from(last_seq, connection_id=CONNECTION_ID):
+    return replay.lambda_handler({
+        'requestContext': {'connectionId': connection_id, 'domainName': 'example.com', 'stage': 'test'},
+        'body': json.dumps({'action': 'replay', 'last_seq': last_seq})
+    }, None)
+
+
+def test_replays_frames_after_last_seq(frames, posted):
+    assert replay_from(1)['statusCode'] == 200
+
+    [frame] = posted()
+    assert [event['seq'] for event in frame['events']] == [2, 3]
+    assert [event['n'] for event in frame['events']] == [1, 2]
+    assert frame['last_seq'] == 3
+    assert frame['complete'] is True
+    assert frame['resync'] is False
+
+
+def test_cold_client_only_learns_last_seq(frames, posted):
+    replay_from(0)
+
+    [frame] = posted()
+    assert frame['events'] == []
+    assert frame['last_seq'] == 3
+    assert frame['resync'] is False
+
+
+def test_up_to_date_client_gets_nothing(frames, posted):
+    replay_from(3)
+
+    [frame] = posted()
+    assert frame['events'] == []
+    assert frame['resync'] is False
+
+
+def test_client_ahead_of_server_resyncs(frames, posted):
+    replay_from(7)
+
+    [frame] = posted()
+    assert frame['events'] == []
+    assert frame['last_seq'] == 3
+    assert frame['resync'] is True
+
+
+def test_client_missing_expired_frames_resyncs(db, frames, posted):
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            UPDATE delivery_log
+            SET created_at = CURRENT_TIMESTAMP - make_interval(days => %s)
+            WHERE user_id = %s AND seq <= 2
+        """, (delivery_log.RETENTION_DAYS + 1, USER_ID))
+        assert delivery_log.expire(cur, 100) == 2
+
+    replay_from(2)
+    replay_from(1)
+
+    caught_up, missing = posted()
+    assert [event['seq'] for event in caught_up['events']] == [3]
+    assert caught_up['resync'] is False
+    assert missing['events'] == []
+    assert missing['resync'] is True
+
+
+def test_unknown_connection(frames, posted):
+    assert replay_from(1, connection_id='unknown')['statusCode'] == 404
+    assert posted() == []
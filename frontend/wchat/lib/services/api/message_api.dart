@@ -1,4 +1,5 @@
 import 'dart:convert';
+import 'dart:math';
 // import 'dart:ffi';
 import 'package:http/http.dart' as http;
 import 'package:flutter/services.dart' show rootBundle;
@@ -66,6 +67,14 @@ class MessageApi {
     }
   }
 
+  // Attempts per send; retries reuse the client key so the server stores the message once
+  static const int _sendAttempts = 3;
+
+  String _newClientKey() {
+    final random = Random.secure();
+    return List.generate(16, (_) => random.nextInt(256).toRadixString(16).padLeft(2, '0')).join();
+  }
+
   // Send a new message
   Future<Message> sendMessage(String content, String receivedByUserId) async {
     if (baseUrl == null) {
@@ -73,21 +82,36 @@ class MessageApi {
     }
 
     int? receivedByUserIdParsed = int.tryParse(receivedByUserId);
-
-    final response = await http.post(
-      Uri.parse('$baseUrl/messages'),
-      headers: await _getAuthHeaders(),
-      body: jsonEncode({
-        'content': content,
-        'received_by_user_id': receivedByUserIdParsed,
-      }),
-    );
-
-    if (response.statusCode == 201) {
-      final Map<String, dynamic> data = json.decode(response.body);
-      return Message.fromJson(data);
-    } else {
-      throw Exception('Failed to send message: ${response.statusCode}');
+    final clientKey = _newClientKey();
+
+    for (int attempt = 1; ; attempt++) {
+      http.Response response;
+      try {
+        response = await http.post(
+          Uri.parse('$baseUrl/messages'),
+          headers: await _getAuthHeaders(),
+          body: jsonEncode({
+            'content': content,
+            'received_by_user_id': receivedByUserIdParsed,
+            'client_key': clientKey,
+          }),
+        );
+      } catch (e) {
+        // Network failure: the message may or may not have been stored
+        if (attempt == _sendAttempts) rethrow;
+        await Future.delayed(Duration(milliseconds: 500 * attempt));
+        continue;
+      }
+
+      // 200 means an earlier attempt already went through
+      if (response.statusCode == 201 || response.statusCode == 200) {
+        final Map<String, dynamic> data = json.decode(response.body);
+        return Message.fromJson(data);
+      }
+      if (response.statusCode < 500 || attempt == _sendAttempts) {
+        throw Exception('Failed to send message: ${response.statusCode}');
+      }
+      await Future.delayed(Duration(milliseconds: 500 * attempt));
     }
   }
 
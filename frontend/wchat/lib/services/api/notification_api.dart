@@ -63,10 +63,12 @@ class NotificationApi {
     }
   }
 
-  // Mark specific notifications as read
-  Future<List<int>> markNotificationsRead({
+  // Mark specific notifications as read, or everything up to upToId (everything,
+  // without either). Returns how many notifications became read.
+  Future<int> markNotificationsRead({
     required int userId,
     List<int>? notificationIds,
+    int? upToId,
   }) async {
     if (baseUrl == null) await _loadUrl();
     final headers = await _getHeaders();
@@ -77,12 +79,16 @@ class NotificationApi {
       body: json.encode({
         'userId': userId,
         if (notificationIds != null) 'notificationIds': notificationIds,
+        if (upToId != null) 'upToId': upToId,
       }),
     );
 
     if (response.statusCode == 200) {
       final data = json.decode(response.body);
-      return List<int>.from(data['updatedIds']);
+      if (data.containsKey('updatedIds')) {
+        return (data['updatedIds'] as List).length;
+      }
+      return data['markedCount'] as int;
     } else {
       throw Exception('Failed to mark notifications as read');
     }
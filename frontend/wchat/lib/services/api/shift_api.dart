@@ -142,7 +142,10 @@ class ShiftApi {
     }
   }
 
-  Future<List<Shift>> getUserAvailableShifts() async {
+  /// The user's shifts starting in [from, to), following the server's page
+  /// cursor until the window is complete.
+  Future<List<Shift>> getUserAvailableShifts(
+      {DateTime? from, DateTime? to}) async {
     if (baseUrl == null) await _loadUrl();
     final headers = await _getHeaders();
 
@@ -154,17 +157,31 @@ class ShiftApi {
         throw Exception('User ID not found in JWT token');
       }
 
-      final response = await http.get(
-        Uri.parse('$baseUrl/shifts/user/$userId'),
-        headers: headers,
-      );
+      final shifts = <Shift>[];
+      String? cursor;
+      do {
+        final queryParameters = {
+          if (from != null) 'start_date': from.toUtc().toIso8601String(),
+          if (to != null) 'end_date': to.toUtc().toIso8601String(),
+          if (cursor != null) 'cursor': cursor,
+        };
+        final response = await http.get(
+          Uri.parse('$baseUrl/shifts/user/$userId')
+              .replace(queryParameters: queryParameters),
+          headers: headers,
+        );
 
-      if (response.statusCode == 200) {
-        final List<dynamic> shiftsJson = json.decode(response.body);
-        return shiftsJson.map((json) => Shift.fromJson(json)).toList();
-      } else {
-        throw Exception('Failed to load user available shifts');
-      }
+        if (response.statusCode != 200) {
+          throw Exception('Failed to load user available shifts');
+        }
+
+        final Map<String, dynamic> data = json.decode(response.body);
+        shifts.addAll(
+            (data['shifts'] as List).map((json) => Shift.fromJson(json)));
+        cursor = data['pagination']['next_cursor'];
+      } while (cursor != null);
+
+      return shifts;
     } catch (e) {
       throw Exception('Error getting user available shifts: $e');
     }
@@ -186,6 +203,128 @@ class ShiftApi {
     }
   }
 
+  // Last open-shift board per department with its ETag, so unchanged boards
+  // are revalidated with a 304 instead of downloaded again
+  static final Map<int, String> _boardEtags = {};
+  static final Map<int, Map<String, dynamic>> _boards = {};
+
+  Future<Map<String, dynamic>> getDepartmentOpenShifts(int departmentId) async {
+    if (baseUrl == null) await _loadUrl();
+    final headers = await _getHeaders();
+    final etag = _boardEtags[departmentId];
+    if (etag != null && _boards.containsKey(departmentId)) {
+      headers['If-None-Match'] = etag;
+    }
+
+    final response = await http.get(
+      Uri.parse('$baseUrl/shifts/department/$departmentId'),
+      headers: headers,
+    );
+
+    if (response.statusCode == 304) {
+      return _boards[departmentId]!;
+    } else if (response.statusCode == 200) {
+      final Map<String, dynamic> board = json.decode(response.body);
+      final newEtag = response.headers['etag'];
+      if (newEtag != null) {
+        _boardEtags[departmentId] = newEtag;
+        _boards[departmentId] = board;
+      }
+      return board;
+    } else {
+      throw Exception('Failed to load open shifts');
+    }
+  }
+
+  // Last week schedule per department and week with its ETag, revalidated the
+  // same way as the open-shift boards
+  static final Map<String, String> _scheduleEtags = {};
+  static final Map<String, Map<String, dynamic>> _schedules = {};
+
+  /// The department's shifts for the week (Monday to Sunday, UTC) containing
+  /// [week].
+  Future<Map<String, dynamic>> getDepartmentWeekSchedule(
+      int departmentId, DateTime week) async {
+    if (baseUrl == null) await _loadUrl();
+    final headers = await _getHeaders();
+    final utc = week.toUtc();
+    final monday = DateTime.utc(utc.year, utc.month, utc.day - (utc.weekday - 1));
+    final day = monday.toIso8601String().substring(0, 10);
+    final key = '$departmentId/$day';
+    final etag = _scheduleEtags[key];
+    if (etag != null && _schedules.containsKey(key)) {
+      headers['If-None-Match'] = etag;
+    }
+
+    final response = await http.get(
+      Uri.parse('$baseUrl/shifts/department/$departmentId/schedule')
+          .replace(queryParameters: {'week': day}),
+      headers: headers,
+    );
+
+    if (response.statusCode == 304) {
+      return _schedules[key]!;
+    } else if (response.statusCode == 200) {
+      final Map<String, dynamic> schedule = json.decode(response.body);
+      final newEtag = response.headers['etag'];
+      if (newEtag != null) {
+        _scheduleEtags[key] = newEtag;
+        _schedules[key] = schedule;
+      }
+      return schedule;
+    } else {
+      throw Exception('Failed to load department schedule');
+    }
+  }
+
+  /// Creates the user's calendar feed, or replaces its link, and returns the
+  /// webcal:// URL to subscribe to in a calendar app.
+  Future<String> createCalendarFeed() async {
+    if (baseUrl == null) await _loadUrl();
+    final headers = await _getHeaders();
+
+    final tokenData = await JwtDecoder.decode();
+    final userId = tokenData['user_id'];
+
+    if (userId == null) {
+      throw Exception('User ID not found in JWT token');
+    }
+
+    final response = await http.post(
+      Uri.parse('$baseUrl/shifts/user/$userId/calendar'),
+      headers: headers,
+    );
+
+    if (response.statusCode == 201) {
+      final Map<String, dynamic> data = json.decode(response.body);
+      final feedUrl = Uri.parse('$baseUrl${data['path']}');
+      return feedUrl.replace(scheme: 'webcal').toString();
+    } else {
+      throw Exception('Failed to create calendar feed');
+    }
+  }
+
+  Future<void> revokeCalendarFeed() async {
+    if (baseUrl == null) await _loadUrl();
+    final headers = await _getHeaders();
+
+    final tokenData = await JwtDecoder.decode();
+    final userId = tokenData['user_id'];
+
+    if (userId == null) {
+      throw Exception('User ID not found in JWT token');
+    }
+
+    final response = await http.delete(
+      Uri.parse('$baseUrl/shifts/user/$userId/calendar'),
+      headers: headers,
+    );
+
+    if (response.statusCode != 200) {
+      throw Exception('Failed to revoke calendar feed');
+    }
+  }
+
   Future<void> pickupShift(int shiftId) async {
     if (baseUrl == null) await _loadUrl();
     final headers = await _getHeaders();
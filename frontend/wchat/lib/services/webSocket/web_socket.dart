@@ -1,4 +1,5 @@
 import 'dart:async';
+import 'dart:collection';
 import 'dart:convert';
 import 'package:web_socket_channel/web_socket_channel.dart';
 import 'package:web_socket_channel/status.dart' as status;
@@ -11,6 +12,47 @@ class WebSocketService {
   String? webSocketUrl;
   final _messageController = StreamController<Map<String, dynamic>>.broadcast();
   bool _isConnected = false;
+  Timer? _heartbeatTimer;
+  // Highest delivery sequence received; sent on reconnect to replay what was missed
+  int _lastSeq = 0;
+  // Recently received sequences, as live frames can overtake a replay in flight
+  final SplayTreeSet<int> _recentSeqs = SplayTreeSet<int>();
+  static const int _recentSeqLimit = 1000;
+
+  // Frames arrive with short keys (the server's 'compact' encoding); see COMPACT_KEYS
+  static const Map<String, String> _compactKeys = {
+    't': 'type',
+    'e': 'events',
+    'm': 'message',
+    'n': 'notification',
+    'i': 'id',
+    'q': 'seq',
+    'c': 'content',
+    'ts': 'time_stamp',
+    'tm': 'timestamp',
+    'r': 'is_read',
+    'rp': 'replaces',
+    'u': 'unread_count',
+    'sb': 'sent_by_user_id',
+    'rb': 'received_by_user_id',
+    'sf': 'sender_first_name',
+    'sl': 'sender_last_name',
+    'si': 'sender_id',
+    'rd': 'reader_id',
+    'mi': 'message_id',
+    'ty': 'is_typing',
+    'x': 'expires_in',
+    'ch': 'channel',
+    'd': 'department_id',
+    'sh': 'shift_id',
+    'a': 'action',
+    'ls': 'last_seq',
+    'rs': 'resync',
+    'cp': 'complete',
+  };
+
+  // Keeps this connection marked online and stops the server sweeping it
+  static const Duration heartbeatInterval = Duration(seconds: 60);
   
   // Singleton pattern
   factory WebSocketService() {
@@ -42,7 +84,7 @@ class WebSocketService {
       final baseUri = Uri.parse(webSocketUrl!);
 
       final wsUri = baseUri.replace(
-        queryParameters: {'user_id': userId.toString()}
+        queryParameters: {'user_id': userId.toString(), 'encoding': 'compact'}
       );
       
       print('Attempting to connect to WebSocket at: $wsUri'); 
@@ -54,11 +96,19 @@ class WebSocketService {
       _isConnected = true;
       print('WebSocket connected successfully');
 
+      _heartbeatTimer = Timer.periodic(heartbeatInterval, (_) {
+        if (_isConnected) {
+          _channel?.sink.add(json.encode({'action': 'heartbeat'}));
+        }
+      });
+
+      _channel?.sink.add(json.encode({'action': 'replay', 'last_seq': _lastSeq}));
+
       _channel?.stream.listen(
         (dynamic message) {
           print('Received WebSocket message: $message'); 
-          final decodedMessage = json.decode(message as String);
-          _messageController.add(decodedMessage);
+          final decodedMessage = _expand(json.decode(message as String));
+          _handleMessage(decodedMessage);
         },
         onError: (error) {
           print('WebSocket Error: $error');
@@ -77,6 +127,55 @@ class WebSocketService {
     }
 }
 
+  dynamic _expand(dynamic value) {
+    if (value is Map) {
+      return value.map<String, dynamic>(
+          (key, item) => MapEntry(_compactKeys[key] ?? key, _expand(item)));
+    }
+    if (value is List) {
+      return value.map(_expand).toList();
+    }
+    return value;
+  }
+
+  void _handleMessage(Map<String, dynamic> message) {
+    if (message['type'] == 'batch') {
+      // Several frames for this connection posted together
+      for (final event in message['events']) {
+        _handleMessage(Map<String, dynamic>.from(event));
+      }
+      return;
+    }
+
+    if (message['type'] == 'replay') {
+      if (message['resync'] == true) {
+        // Missed frames have expired; listeners reload from the REST API
+        _lastSeq = message['last_seq'];
+        _messageController.add({'type': 'resync'});
+        return;
+      }
+      for (final event in message['events']) {
+        _handleMessage(Map<String, dynamic>.from(event));
+      }
+      // A client starting at 0 gets no events, only the sequence to continue from
+      if (message['complete'] == true && message['last_seq'] > _lastSeq) {
+        _lastSeq = message['last_seq'];
+      }
+      return;
+    }
+
+    final seq = message['seq'];
+    if (seq is int) {
+      // Already delivered live or by an earlier replay
+      if (!_recentSeqs.add(seq)) return;
+      if (_recentSeqs.length > _recentSeqLimit) {
+        _recentSeqs.remove(_recentSeqs.first);
+      }
+      if (seq > _lastSeq) _lastSeq = seq;
+    }
+    _messageController.add(message);
+  }
+
   void sendMessage(Map<String, dynamic> message) {
     if (!_isConnected) {
       throw Exception('WebSocket not connected');
@@ -88,6 +187,8 @@ class WebSocketService {
 
   void _handleDisconnect() {
     _isConnected = false;
+    _heartbeatTimer?.cancel();
+    _heartbeatTimer = null;
     _channel?.sink.close(status.goingAway);
     _channel = null;
   }
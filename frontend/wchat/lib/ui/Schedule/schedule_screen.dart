@@ -74,7 +74,13 @@ class _ScheduleScreenState extends State<ScheduleScreen> {
 
   Future<void> _fetchShifts() async {
     try {
-      final shifts = await _shiftApi.getUserAvailableShifts();
+      // The focused month plus the adjacent days the calendar shows
+      final from = DateTime(_focusedDay.year, _focusedDay.month, 1)
+          .subtract(const Duration(days: 7));
+      final to = DateTime(_focusedDay.year, _focusedDay.month + 1, 1)
+          .add(const Duration(days: 7));
+      final shifts =
+          await _shiftApi.getUserAvailableShifts(from: from, to: to);
       setState(() {
         _events = _groupShiftsByDay(shifts);
       });
@@ -165,6 +171,7 @@ class _ScheduleScreenState extends State<ScheduleScreen> {
           },
           onPageChanged: (focusedDay) {
             _focusedDay = focusedDay;
+            _fetchShifts();
           },
           eventLoader: _getEventsForDay,
           calendarStyle: CalendarStyle(